@@ -1,26 +1,17 @@
 # Converts json output from etherscan API to standard solc input json.
 
-import os
 import json
 
-def find_sol_files(input_directory):
-    sol_files = []
-    for root, dirs, files in os.walk(input_directory):
-        for file in files:
-            if file.endswith(".sol"):
-                sol_files.append(os.path.join(root, file))
-    return sol_files
+from solc_json_parser.etherscan import parse_etherscan_file
 
 OUTPUT_SELECT_ALL = {'*': {'*': [ '*' ], '': ['ast']}}
 
 def generate_solc_json(input_file, output_file):
-    with open(input_file, 'r') as f:
-        api_json = json.load(f)
+    contract = parse_etherscan_file(input_file)
+    solc_input = contract.input_json
+    solc_input.setdefault("settings", {})["outputSelection"] = OUTPUT_SELECT_ALL
 
-    solc_input = json.loads(api_json["SourceCode"].replace('{{', '{').replace('}}', '}'))
-    solc_input["settings"] = {"outputSelection": OUTPUT_SELECT_ALL}
-
-    print('Compiler version: ', api_json["CompilerVersion"])
+    print('Compiler version: ', contract.version)
 
     with open(output_file, 'w') as file:
         json.dump(solc_input, file, indent=2)
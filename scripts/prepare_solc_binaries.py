@@ -1,54 +1,23 @@
-# Download all solc versions from github
-
-import json
-import requests
-import os
-import stat
-import requests
-
-list_json_url = "https://raw.githubusercontent.com/ethereum/solc-bin/gh-pages/linux-amd64/list.json"
-
-def make_executable(file_path):
-    st = os.stat(file_path)
-    os.chmod(file_path, st.st_mode | stat.S_IEXEC)
-
-
-def download_github_file(url, output_file):
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        with open(output_file, 'wb') as f:
-            f.write(response.content)
-        print(f"Downloaded file: {output_file}")
-    else:
-        print(f"Error downloading file: {output_file}")
-
-
-base_url = "https://raw.githubusercontent.com/ethereum/solc-bin/gh-pages/linux-amd64/{}"
-
-folder = os.path.expanduser("~/.solcx/")
-os.makedirs(folder, exist_ok=True)
-
-# with open('solc.json', 'r') as f:
-#     data = json.load(f)
-
-resp = requests.get(list_json_url)
-data = resp.json()
-
-for build in data['builds']:
-    version = build['version']
-    path = build['path']
-    download_url = base_url.format(path)
-    solc_bin = os.path.join(folder, f"solc-v{version}")
-    if os.path.exists(solc_bin):
-        make_executable(solc_bin)
-        continue
-
-    response = requests.get(download_url)
-    if response.status_code == 200:
-        with open(solc_bin, "wb") as f:
-            f.write(response.content)
-        make_executable(solc_bin)
-        print(f"Downloaded and saved {path} as v{version}")
-    else:
-        print(f"Error downloading {path} from {download_url}")
+# Download all solc versions from solc-bin
+
+import argparse
+
+from solc_json_parser.solc_manager import DEFAULT_BASE_URL, DEFAULT_INSTALL_DIR, SolcManager
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Download and verify solc binaries')
+    parser.add_argument('versions', nargs='*', help='Versions to install, all release builds by default')
+    parser.add_argument('--install-dir', default=DEFAULT_INSTALL_DIR, help='Directory to install binaries to')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='solc-bin url of the platform')
+    parser.add_argument('--mirror-dir', help='Local directory with list.json and binaries to install from')
+    parser.add_argument('--list-json', help='Local list.json to use, e.g. solc.json')
+    parser.add_argument('--workers', type=int, default=8, help='Number of concurrent downloads')
+    args = parser.parse_args()
+
+    manager = SolcManager(install_dir=args.install_dir, base_url=args.base_url, mirror_dir=args.mirror_dir,
+                          list_json=args.list_json, max_workers=args.workers)
+    for version, result in manager.install_many(args.versions or None).items():
+        if isinstance(result, Exception):
+            print(f'Error installing v{version}: {result}')
+        else:
+            print(f'Installed v{version} at {result}')
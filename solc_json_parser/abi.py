@@ -69,49 +69,174 @@
 # 	// Block ends with conditional jump to 0x031b, if 0x18160ddd == stack[-1]
 
 
-from typing import Set
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Set, Union
 try:
     from solc_json_parser import opcodes
 except:
     import opcodes
 
-def abi_from_binary(binary: str, window_size=20) -> Set[str]:
+# what `abi_from_binary` does with each of the 256 byte values
+_UNKNOWN, _OTHER, _PUSH, _EQ, _JUMPI = range(5)
+_OPCODE_KINDS = bytes(
+    _UNKNOWN if b not in opcodes.byte_to_name
+    else _PUSH if opcodes.push_width[b] or b == opcodes.name_to_byte['PUSH0']
+    else _EQ if b == opcodes.name_to_byte['EQ']
+    else _JUMPI if b == opcodes.name_to_byte['JUMPI']
+    else _OTHER
+    for b in range(256)
+)
+
+# batches smaller than this are processed in the current process
+BATCH_MIN_SIZE = 64
+
+
+def abi_from_binary(binary: Union[str, bytes], window_size=20) -> Set[str]:
+    """
+    Guess function selectors from a contract binary, given as a hex string (with or without 0x) or raw bytes.
+    `window_size` is the max distance, in hex characters, between a PUSH4 and the EQ / JUMPI that uses it.
+    """
+    code = opcodes.hex_to_bytes(binary)
+    kinds = _OPCODE_KINDS
+    push_width = opcodes.push_width
     results = set()
-    length = len(binary)
+    length = len(code)
     i = 0
-    window_start, confidence, candidate = (0, 0, '')
+    window_start, confidence, candidate = (0, 0, b'')
 
     while i < length:
-        # get opcode string
-        opcode = opcodes.byte_to_name.get(int(binary[i:i+2], 16))
-        i += 2
+        kind = kinds[code[i]]
+        i += 1
 
         # ignore unknown opcode
-        if not opcode:
+        if kind == _UNKNOWN:
             continue
 
         # for push opcode, skip data bytes
-        if opcode.startswith('PUSH'):
-            datasize = int(opcode[4:]) * 2
+        if kind == _PUSH:
+            datasize = push_width[code[i - 1]]
 
-            # for push4, record the 4 byte hex string which might be a function signature
-            if datasize == 8:
-                candidate = binary[i: i + datasize]
+            # for push4, record the 4 bytes which might be a function signature
+            if datasize == 4:
+                candidate = code[i: i + datasize]
                 window_start = i
                 confidence += 1
 
             i += datasize
-        elif opcode == 'EQ' and window_start:
+        elif kind == _EQ and window_start:
             confidence += 1
-        elif opcode == 'JUMPI' and window_start:
+        elif kind == _JUMPI and window_start:
             if confidence > 1:
                 results.add(candidate)
-            window_start, confidence, candidate = (0, 0, '')
+            window_start, confidence, candidate = (0, 0, b'')
 
-
-        if i - window_start > window_size:
+        if 2 * (i - window_start) > window_size:
             window_start = 0
 
-    if 'ffffffff' in results:
-        results.remove('ffffffff')
-    return results
+    results.discard(b'\xff\xff\xff\xff')
+    return {r.hex() for r in results}
+
+
+def abi_from_binaries(binaries: Iterable[Union[str, bytes]], window_size=20,
+                      max_workers: Optional[int] = None, chunksize: int = 16) -> List[Set[str]]:
+    """
+    Guess function selectors for many binaries, returns one selector set per input in the input order.
+    Large batches are spread across a process pool of `max_workers` processes (defaults to the number of CPUs).
+    """
+    binaries = list(binaries)
+    find = partial(abi_from_binary, window_size=window_size)
+    if len(binaries) < BATCH_MIN_SIZE or max_workers == 1:
+        return [find(b) for b in binaries]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(find, binaries, chunksize=chunksize))
+
+
+_DUP1, _DUP2 = opcodes.name_to_byte['DUP1'], opcodes.name_to_byte['DUP2']
+_EQ_OP, _JUMPI_OP, _JUMPDEST = opcodes.name_to_byte['EQ'], opcodes.name_to_byte['JUMPI'], opcodes.name_to_byte['JUMPDEST']
+_PUSH0, _PUSH4, _CALLDATALOAD = opcodes.name_to_byte['PUSH0'], opcodes.name_to_byte['PUSH4'], opcodes.name_to_byte['CALLDATALOAD']
+# instructions ending a path through the dispatcher
+_HALTS = {opcodes.name_to_byte[name] for name in ('STOP', 'JUMP', 'RETURN', 'REVERT', 'INVALID', 'SELFDESTRUCT')}
+
+# dispatch tables of the most recently analyzed codes, by hash of the code
+DISPATCH_CACHE_SIZE = 1024
+_dispatch_tables: 'OrderedDict[bytes, Dict[str, int]]' = OrderedDict()
+_dispatch_tables_lock = threading.Lock()
+
+
+def _selector_load(dis: opcodes.Disassembly) -> int:
+    '''Index of the `CALLDATALOAD` of calldata offset 0 the selector is extracted from, 0 if there is none'''
+    ops = dis.opcodes
+    for i in range(1, len(ops)):
+        if ops[i] == _CALLDATALOAD and (ops[i - 1] == _PUSH0 or opcodes.push_width[ops[i - 1]]) and not any(dis.operand(i - 1)):
+            return i
+    return 0
+
+
+def _compared_selector(dis: opcodes.Disassembly, i: int) -> Optional[bytes]:
+    '''
+    Selector of a `JUMPI` at `i` comparing it, `DUP1 PUSH4 <selector> EQ PUSHn <target> JUMPI`
+    or `PUSH4 <selector> DUP2 EQ PUSHn <target> JUMPI`
+    '''
+    ops = dis.opcodes
+    if i < 4 or ops[i - 2] != _EQ_OP:
+        return None
+    if ops[i - 3] == _PUSH4 and ops[i - 4] == _DUP1:
+        return dis.operand(i - 3)
+    if ops[i - 3] == _DUP2 and ops[i - 4] == _PUSH4:
+        return dis.operand(i - 4)
+    return None
+
+
+def _dispatch_table(code: bytes) -> Dict[str, int]:
+    dis = opcodes.disassemble(code)
+    ops, pcs = dis.opcodes, dis.pcs
+    index_by_jumpdest = {pc: i for i, (pc, op) in enumerate(zip(pcs, ops)) if op == _JUMPDEST}
+    table: Dict[str, int] = {}
+    n = len(ops)
+    # Walk the dispatcher from the selector extraction. Jumps of selector comparisons lead to the functions and are
+    # not followed, other jumps are the LT / GT branches of binary search dispatchers and are followed, so
+    # comparisons of 4-byte constants in function bodies, e.g. interface ids, are not taken for selectors.
+    pending, visited = [_selector_load(dis)], set()
+    while pending:
+        i = pending.pop()
+        while i < n and i not in visited:
+            visited.add(i)
+            op = ops[i]
+            if op == _JUMPI_OP and i > 0 and opcodes.push_width[ops[i - 1]]:
+                target = int.from_bytes(dis.operand(i - 1), 'big')
+                selector = _compared_selector(dis, i)
+                if target not in index_by_jumpdest:
+                    pass
+                elif selector is not None:
+                    table.setdefault(selector.hex(), target)
+                else:
+                    pending.append(index_by_jumpdest[target])
+            elif op in _HALTS:
+                break
+            i += 1
+    return table
+
+
+def dispatch_table(binary: Union[str, bytes]) -> Dict[str, int]:
+    """
+    Extract the selector dispatch table of a runtime binary: 4-byte selector in hex -> entry PC of the function.
+    Results are cached by hash of the binary.
+    """
+    code = opcodes.hex_to_bytes(binary)
+    key = hashlib.blake2b(code, digest_size=16).digest()
+    with _dispatch_tables_lock:
+        table = _dispatch_tables.get(key)
+        if table is not None:
+            _dispatch_tables.move_to_end(key)
+    if table is None:
+        table = _dispatch_table(code)
+        with _dispatch_tables_lock:
+            _dispatch_tables[key] = table
+            if len(_dispatch_tables) > DISPATCH_CACHE_SIZE:
+                _dispatch_tables.popitem(last=False)
+    return dict(table)
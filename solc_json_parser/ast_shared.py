@@ -8,9 +8,14 @@ import warnings
 import json
 import os
 import re
-from typing import Dict, Optional, List, Any, Tuple, Union
-from functools import reduce, wraps
+from typing import Dict, Iterable, Iterator, Optional, List, Any, Tuple, Union
+from functools import cache, reduce, wraps
+from collections import OrderedDict
+import hashlib
+import threading
 from Crypto.Hash import keccak
+from array import array
+from .fields import SourceMap
 
 SOLC_JSON_AST_FOLDER = "./solc_json_ast"
 PARSED_JSON = "./parsed_json"
@@ -29,6 +34,10 @@ INSTALLABLE_VERSION = sorted([Version(v) for v in INSTALLABLE_VERSION])
 
 INTERFACE_OR_LIB_KIND = set(['interface', 'library'])
 
+# library placeholders in unlinked bytecode, e.g. `__$53aea86b7d70b31448b230b20ae141a537$__` (solc >= 0.5.0)
+# or `__contracts/Lib.sol:Lib______________` (older versions)
+LINK_PLACEHOLDER_RE = re.compile(r'__.{36}__')
+
 DEPLOY_START_OPCODES = [
     # For solidity 0.4.23 and above
     [
@@ -53,6 +62,90 @@ def keccak256(s: str) -> str:
     k.update(s.encode())
     return k.hexdigest()
 
+def placeholder_hash(qualified_name: str) -> str:
+    '''34 character hash of a fully qualified library name, as in `__$<hash>$__` placeholders'''
+    return keccak256(qualified_name)[:34]
+
+
+def _placeholder_bodies(qualified_name: str) -> Tuple[str, str]:
+    # the 36 characters between `__` and `__` of a placeholder, for solc >= 0.5.0 and older versions
+    return f'${placeholder_hash(qualified_name)}$', qualified_name[:36].ljust(36, '_')
+
+
+def link_bytecode(bytecode: str, libraries: Dict[str, str], link_references: Optional[dict] = None) -> str:
+    '''
+    Replace library placeholders of an unlinked bytecode (hex) in one pass.
+    - `libraries`: fully qualified library name (`path/to/file.sol:Lib`) to address
+    - `link_references`: `linkReferences` of the bytecode, i.e. `{file: {library: [{start, length}]}}`. When given,
+      placeholders are replaced at these byte offsets instead of being searched for.
+    Placeholders of libraries not in `libraries` are kept.
+    '''
+    addresses = {}
+    for name, address in libraries.items():
+        address = address[2:] if address[:2].lower() == '0x' else address
+        if len(address) != 40:
+            raise ValueError(f'Invalid address of library {name}: {address}')
+        addresses[name] = address.lower()
+
+    if link_references is not None:
+        ranges = []
+        for filename, libs in link_references.items():
+            for lib, refs in libs.items():
+                address = addresses.get(f'{filename}:{lib}')
+                if address is not None:
+                    ranges.extend((ref['start'] * 2, ref['length'] * 2, address) for ref in refs)
+        parts, last = [], 0
+        for start, length, address in sorted(ranges):
+            parts += [bytecode[last:start], address[-length:]]
+            last = start + length
+        parts.append(bytecode[last:])
+        return ''.join(parts)
+
+    by_body = {}
+    for name, address in addresses.items():
+        for body in _placeholder_bodies(name):
+            by_body[body] = address
+    return LINK_PLACEHOLDER_RE.sub(lambda m: by_body.get(m.group(0)[2:-2], m.group(0)), bytecode)
+
+
+_DATA_LOCATION_PATTERN = re.compile(r' (memory|calldata|storage ref|storage pointer|storage)\b')
+
+def canonical_abi_type(type_string: str) -> Optional[str]:
+    '''
+    Convert a solc type string to the type used in ABI signatures.
+    Returns None for types which cannot be resolved without the full AST, e.g. structs.
+    Example: `contract IERC20` -> `address`, `uint256[] memory` -> `uint256[]`
+    '''
+    t = _DATA_LOCATION_PATTERN.sub('', type_string.strip())
+    if t.startswith('struct ') or t.startswith('function ') or t.startswith('mapping('):
+        return None
+    t = re.sub(r'\b(contract|interface) [\w.]+', 'address', t)
+    t = re.sub(r'\benum [\w.]+', 'uint8', t)
+    return t.replace('address payable', 'address')
+
+def canonical_signature(signature: str) -> Optional[str]:
+    '''Canonical ABI signature from a signature built with solc type strings, e.g. `f(contract A, uint256[] memory)`'''
+    if not signature or '(' not in signature:
+        return None
+    name, params = signature.split('(', 1)
+    params = params[:-1]
+    if not params:
+        return f'{name}()'
+    types = [canonical_abi_type(p) for p in params.split(', ')]
+    if None in types:
+        return None
+    return f'{name}({",".join(types)})'
+
+def selector_from_signature(signature: str) -> Optional[str]:
+    '''4-byte function selector as hex string, or None if the signature cannot be canonicalized'''
+    sig = canonical_signature(signature)
+    return keccak256(sig)[:8] if sig else None
+
+def topic_from_signature(signature: str) -> Optional[str]:
+    '''32-byte event topic as hex string, or None if the signature cannot be canonicalized'''
+    sig = canonical_signature(signature)
+    return keccak256(sig) if sig else None
+
 def get_by_index(lst: Union[List, Tuple], idx: int):
     '''Get by index from a list, returns None if the index is out of range '''
     if len(lst) > idx:
@@ -106,17 +199,53 @@ def version_str_from_line(line) -> Optional[str]:
     return None
 
 
-def version_str_from_source(source_or_source_file: str) -> Optional[str]:
-    inputs = source_or_source_file.split('\n') if '\n' in source_or_source_file else open(source_or_source_file, 'r')
+# lines which may hold a pragma directive, found without splitting the whole source
+_PRAGMA_LINE_RE = re.compile(r'^[ \t\r\f\v]*pragma\b.*$', re.M)
+
+# pragma version strings of the most recently seen sources, by hash of the source
+VERSION_CACHE_SIZE = 4096
+_source_versions: 'OrderedDict[bytes, Optional[str]]' = OrderedDict()
+_source_versions_lock = threading.Lock()
+_NOT_CACHED = object()
+
+
+def _version_str_from_text(text: str) -> Optional[str]:
+    key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    with _source_versions_lock:
+        version = _source_versions.get(key, _NOT_CACHED)
+        if version is not _NOT_CACHED:
+            _source_versions.move_to_end(key)
+            return version
 
     # Get version part from `pragma solidity ***;` lines
-    versions = [version_str_from_line(line) for line in inputs if line.strip().startswith('pragma') and 'solidity' in line]
+    versions = {version_str_from_line(m.group()) for m in _PRAGMA_LINE_RE.finditer(text) if 'solidity' in m.group()}
+    version = ' '.join(sorted(versions)) if versions else None
 
-    if not versions:
+    with _source_versions_lock:
+        _source_versions[key] = version
+        if len(_source_versions) > VERSION_CACHE_SIZE:
+            _source_versions.popitem(last=False)
+    return version
+
+
+def version_str_from_source(source_or_source_file: str) -> Optional[str]:
+    if '\n' in source_or_source_file:
+        text = source_or_source_file
+    else:
+        with open(source_or_source_file, 'r') as f:
+            text = f.read()
+
+    version = _version_str_from_text(text)
+    if not version:
         logging.warning('No pragma directive found in source code')
-        return None
+    return version
+
+
+@cache
+def _candidates_by_spec(merged_version: str) -> Tuple[str, ...]:
+    spec = semantic_version.NpmSpec(merged_version)
+    return tuple(str(v) for v in spec.filter(get_all_installable_versions()))
 
-    return ' '.join(set(versions))
 
 def get_solc_candidates(source_or_source_file: str) -> List[str]:
     merged_version = version_str_from_source(source_or_source_file)
@@ -124,8 +253,19 @@ def get_solc_candidates(source_or_source_file: str) -> List[str]:
     if not merged_version:
         return []
 
-    spec = semantic_version.NpmSpec(merged_version)
-    return [str(v) for v in spec.filter(get_all_installable_versions())]
+    return list(_candidates_by_spec(merged_version))
+
+
+def group_by_solc_version(sources: Iterable[str]) -> Dict[Optional[str], List[str]]:
+    '''
+    Group sources or source files by the solc version `detect_solc_version` picks for them, so that a corpus can be
+    compiled with one solc binary per group. Sources without a usable pragma are grouped under `None`.
+    '''
+    groups: Dict[Optional[str], List[str]] = {}
+    for source in sources:
+        groups.setdefault(detect_solc_version(source), []).append(source)
+    return groups
+
 
 def detect_solc_version(source_or_source_file: str) -> Optional[str]:
     '''
@@ -184,31 +324,70 @@ def skip_deploys(opcodes, deploy_sig_idx=0):
     return skip_deploys(opcodes, deploy_sig_idx+1)
 
 
-def parse_src_mapping(srcmap: str):
-    def _reduce_fn(accumulator, current_value):
-        last, *tlist = accumulator
-        return [
-            {
-                's': int(current_value['s'] or last['s']),
-                'l': int(current_value['l'] or last['l']),
-                'f': int(current_value['f'] or last['f']),
-            },
-            last,
-            *tlist
-        ]
-
-    parsed = srcmap.split(";")
-    parsed = [l.split(':') for l in parsed]
-    t = []
-    for l in parsed:
-        if len(l) >= 3:
-            t.append(l[:3])
-        else:
-            t.append(l + [None] * (3 - len(l)))
-    parsed = [{'s': s if s != "" else None, 'l': l, 'f': f} for s, l, f in t]
-    parsed = reduce(_reduce_fn, parsed, [{}])
-    parsed = list(reversed(parsed[:-1]))
-    return parsed
+def iter_src_mapping(srcmap: str) -> Iterator[Tuple[int, int, int, str, int]]:
+    '''
+    Decode a compressed source map lazily, yields `(s, l, f, j, m)` of each instruction.
+    Empty fields are taken from the previous entry.
+    '''
+    start, length, fid, jump, depth = 0, 0, -1, '-', 0
+    for entry in srcmap.split(';'):
+        if entry:
+            parts = entry.split(':')
+            n = len(parts)
+            if parts[0]:
+                start = int(parts[0])
+            if n > 1 and parts[1]:
+                length = int(parts[1])
+            if n > 2 and parts[2]:
+                fid = int(parts[2])
+            if n > 3 and parts[3]:
+                jump = parts[3]
+            if n > 4 and parts[4]:
+                depth = int(parts[4])
+        yield start, length, fid, jump, depth
+
+
+def decode_src_mapping(srcmap: str) -> SourceMap:
+    '''Decode a compressed source map into parallel arrays'''
+    if not srcmap:
+        return SourceMap()
+    entries = srcmap.split(';')
+    # most entries are empty, i.e. same as the previous one, so values are appended per run of entries
+    changes = [i for i, entry in enumerate(entries) if entry]
+    if not changes or changes[0] != 0:
+        changes.insert(0, 0)
+    changes.append(len(entries))
+
+    starts, lengths, fids, jumps, depths = [], [], [], [], []
+    start, length, fid, jump, depth = 0, 0, -1, '-', 0
+    for i, end in zip(changes, changes[1:]):
+        entry = entries[i]
+        if entry:
+            parts = entry.split(':')
+            n = len(parts)
+            if parts[0]:
+                start = int(parts[0])
+            if n > 1 and parts[1]:
+                length = int(parts[1])
+            if n > 2 and parts[2]:
+                fid = int(parts[2])
+            if n > 3 and parts[3]:
+                jump = parts[3]
+            if n > 4 and parts[4]:
+                depth = int(parts[4])
+        run = end - i
+        starts += [start] * run
+        lengths += [length] * run
+        fids += [fid] * run
+        jumps.append(jump * run)
+        depths += [depth] * run
+
+    return SourceMap(array('i', starts), array('i', lengths), array('i', fids),
+                     bytearray(''.join(jumps).encode()), array('i', depths))
+
+
+def parse_src_mapping(srcmap: str) -> List[Dict[str, int]]:
+    return [{'s': start, 'l': length, 'f': fid} for start, length, fid, *_ in iter_src_mapping(srcmap)]
 
 
 def process_literal_node(literals_nodes, only_value):
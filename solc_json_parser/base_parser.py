@@ -1,11 +1,18 @@
 from semantic_version import Version
-from typing import Dict, Optional, List, Union, Any
+from typing import Collection, Dict, Optional, List, Union, Any
 from functools import cached_property, cache
-from .fields import Field, Function, ContractData, Modifier, Event, Literal
+from .fields import Field, Function, ContractData, ContractIndex, DispatchEntry, LiteralIndex, Modifier, Event, Literal, PcAttribution, SourceMap
 from .version_cfg import v_keys
 from . import ast_shared as s
 from .ast_shared import SolidityAstError
+from .abi import dispatch_table
+from . import opcodes
+from .opcodes import CodeBitmap
+from .storage_layout import StorageLayout, SlotValue
+from .normalized_ast import AstNode, normalize_ast
+import bisect
 import copy
+import dataclasses
 
 def add_inherited_function_fields(data_dict: Dict[int, ContractData]):
     for contract_id, contract in data_dict.items():
@@ -40,6 +47,15 @@ class BaseParser():
         self.file_path = None # to be overridden by CombinedJsonParser
         self.pc2opcode = {}
         self.cwd = None
+        self.contract_indexes: Dict[int, ContractIndex] = {} # contract id -> hash indexes, see `_build_indexes`
+        self._filtered_views: Dict[tuple, tuple] = {}
+        self._processed_literals: Dict[tuple, dict] = {}
+        self._own_contracts: Dict[str, List[ContractData]] = {} # source id -> contracts without inherited fields and functions
+        self._storage_layouts: Dict[str, Optional[StorageLayout]] = {}
+        self._opcode2pcs: Dict[tuple, Dict[str, set]] = {}
+        self._source_maps: Dict[tuple, Optional[SourceMap]] = {}
+        self._code_bitmaps: Dict[tuple, Optional[CodeBitmap]] = {}
+        self._pc_attributions: Dict[tuple, Optional[PcAttribution]] = {}
 
     def build(self):
         raise NotImplementedError
@@ -74,78 +90,44 @@ class BaseParser():
 
         self.solc_compile_outputs = outputs
 
-    def _get_base_contracts(self, data: List[Dict]) -> List:
-        base_contracts = []
-        for base_contract in data:
-            if base_contract is None: # this is to handle [null] in json
+    @cached_property
+    def normalized_asts(self) -> Dict[str, AstNode]:
+        """
+        Version independent AST of every source unit, with the same keys as `solc_json_ast`.
+        Built once, all AST queries run on this representation.
+        """
+        normalized = {}
+        by_root = {} # for combined json, contracts in the same file share one source unit
+        for key, unit in self.solc_json_ast.items():
+            root = unit.get('ast')
+            if not root:
                 continue
-            base_contracts.append(base_contract['baseName']['referencedDeclaration'])
-        return base_contracts
-
-    def get_raw_from_src(self, node):
-        line_number_range_raw = list(map(int, node.get('src').split(':')))
-        start, offset, source_file_idx = line_number_range_raw
-        line_number_range, source = self.get_line_number_range_and_source(line_number_range_raw)
+            node = by_root.get(id(root))
+            if node is None:
+                node = normalize_ast(root, self.v8)
+                by_root[id(root)] = node
+            normalized[key] = node
+        return normalized
+
+    def get_raw_from_src(self, node: AstNode):
+        start, offset, _ = node.src
+        line_number_range, source = self.get_line_number_range_and_source(node.src)
         raw = source.encode()[start: start+offset].decode()
         return raw, line_number_range
 
-    def get_signature(self, function_name, parameters, kind='function') -> str:
+    def get_signature(self, function_name, parameters: AstNode, kind='function') -> str:
         if kind in ['constructor']:
             return ''
 
-        signature = "" + function_name + "("
-        param_type_str = ""
-        if self.v8:
-            for param in parameters['parameters']:
-                param_type_str += param['typeDescriptions']['typeString'] + ", "
-        else:  # v4, v5, v6, v7
-            for param in parameters['children']:
-                param_type_str += param['attributes']['type'] + ", "
-
-        param_type_str = param_type_str[:-2]  # remove the last ", "
-        signature += param_type_str + ")"
-        return signature
-
-    def _process_function(self, node: Dict) -> Function:
-        def _get_modifiers(node: Dict) -> List[str]:
-            modifiers = []
-            if self.v8:
-                for modifier in node['modifiers']:
-                    modifiers.append(modifier['modifierName']['name'])
-                return modifiers
-            else:
-                # if None in node['modifiers']:
-                #     return []
-                # else:
-                # if no modifiers, will return []
-                for child in node['modifiers']:
-                    if s.get_in(child, 'children', 0, 'attributes', 'type') == "modifier ()":
-                        modifiers.append(child['children'][0]['attributes']['value'])
-            return modifiers
+        param_types = [param.get('type') for param in parameters.children]
+        return f"{function_name}({', '.join(param_types)})"
 
+    def _process_function(self, node: AstNode, source_id: Optional[str]) -> Function:
         # line number range is the same for all versions
         raw, line_number_range = self.get_raw_from_src(node)
-        if self.v8:
-            parameters = node.get('parameters')
-            return_type = node.get('returnParameters')
-            modifier_nodes = node
-        else:  # v4, v5, v6, v7
-            parameters  = None
-            return_type = None
-            for i in range(len(node.get('children'))):
-                if node.get('children')[i].get('name') == "ParameterList":
-                    parameters  = node.get('children')[i]
-                    return_type = node.get('children')[i+1]
-                    break
-
-            if node.get("attributes").get("modifiers") is None:
-                modifier_nodes = {"modifiers": node.get('children')[2:-1]}
-            else:
-                modifier_nodes = {"modifiers": []}
-            node = node.get("attributes") # get attributes, the structure is different
+        # the first parameter list is for parameters, the second one is for return values
+        parameters, return_type = node.children_by_type('ParameterList')[:2]
 
-        assert parameters  is not None
-        assert return_type is not None
         visibility = node.get('visibility')
         if node.get('name') is None or node.get('name') == "":
             name = node.get("kind") # for constructor v5, v6, v7, v8
@@ -154,22 +136,38 @@ class BaseParser():
 
             # anonymous fallback function
             name = name or ''
-            # assert name, "Constructor name is None or empty"
         else:
             name = node.get('name') # function name
 
         inherited_from = ""
         abstract  = not node.get('implemented')
-        modifiers = _get_modifiers(modifier_nodes)
+        modifiers = [m.get('modifier') for m in node.children_by_type('ModifierInvocation') if m.get('modifier')]
         kind = node.get('kind')
         state_mutability = node.get('stateMutability')
 
         signature = self.get_signature(name, parameters, kind)
         return_signature = self.get_signature("", return_type, kind)
+        selector = node.get('functionSelector') or self._legacy_selector(node, signature)
         return Function(inherited_from=inherited_from, abstract=abstract, visibility=visibility, raw=raw,
                         signature=signature, name=name, return_signature=return_signature, kind=kind,
                         modifiers=modifiers, line_num=line_number_range, state_mutability=state_mutability,
-                        source_id=node.get("source_id"))
+                        source_id=source_id, selector=selector)
+
+    @staticmethod
+    def _legacy_selector(node: AstNode, signature: str) -> Optional[str]:
+        '''
+        Selector of a function node without `functionSelector` (solc < 0.6), computed from its signature.
+        Only externally callable functions have one: not internal or private functions, not constructors
+        (`isConstructor` of old-style constructors named after their contract) and not unnamed fallback functions.
+        '''
+        if node.get('visibility') not in ('public', 'external') or node.get('isConstructor') or not node.get('name'):
+            return None
+        if node.get('kind') not in (None, 'function'):
+            return None
+        # storage parameters of public library functions are encoded differently in selectors
+        if ' storage' in signature:
+            return None
+        return s.selector_from_signature(signature)
 
     def get_yul_lines(self, contract_name: str, deploy: Optional[bool]=False) -> List[str]:
         if not self.v8:
@@ -180,98 +178,64 @@ class BaseParser():
         else:
             return self.solc_json_ast.get(contract_name).get('generated-sources-runtime')[0]['contents'].split("\n")
 
-
-
-
-    def _process_field(self, node: Dict) -> Field:
+    def _process_field(self, node: AstNode, source_id: Optional[str]) -> Field:
         # line number range is the same for all versions
-        line_number_range_raw = list(map(int, node.get('src').split(':')))
-        line_number_range, _ = self.get_line_number_range_and_source(line_number_range_raw)
-
-        if self.v8:
-            pass
-        else:  # v4, v5, v6, v7
-            node = node.get("attributes")
+        line_number_range, _ = self.get_line_number_range_and_source(node.src)
         visibility = node.get('visibility')
         name = node.get('name')
         inherited_from = ""
-        return Field(inherited_from=inherited_from, visibility=visibility, name=name, line_num=line_number_range, source_id=node.get("source_id"))
+        return Field(inherited_from=inherited_from, visibility=visibility, name=name, line_num=line_number_range, source_id=source_id)
 
-    def _process_event(self, node: Dict) -> Event:
+    def _process_event(self, node: AstNode, source_id: Optional[str]) -> Event:
         raw, line_number_range = self.get_raw_from_src(node)
-        if self.v8:
-            parameters = node.get('parameters')
-        else:  # v4, v5, v6, v7
-            parameters = None
-            for i in range(len(node.get('children'))):
-                if node.get('children')[i].get('name') == "ParameterList":
-                    parameters = node.get('children')[i]
-                    break
-            node = node.get("attributes")
-
+        parameters = node.children_by_type('ParameterList')[0]
         name = node.get('name')
         anonymous = node.get('anonymous')
 
         signature = self.get_signature(name, parameters, "event")
-        return Event(raw=raw, name=name, anonymous=anonymous, line_num=line_number_range, signature=signature, source_id=node.get("source_id"))
+        return Event(raw=raw, name=name, anonymous=anonymous, line_num=line_number_range, signature=signature, source_id=source_id)
 
-    def _process_modifier(self, node: Dict) -> Modifier:
-        if self.v8:
-            pass
-        else:  # v4, v5, v6, v7
-            node = node.get("attributes")
+    def _process_modifier(self, node: AstNode) -> Modifier:
         visibility = node.get('visibility')
         name = node.get('name')
         return Modifier(visibility=visibility, name=name)
 
-    def _get_contract_meta_data(self, node: Dict) -> tuple:
+    def _get_contract_meta_data(self, node: AstNode) -> tuple:
         # line number range is the same for all versions
-        line_number_range_raw = list(map(int, node.get('src').split(':')))
-        line_number_range, _ = self.get_line_number_range_and_source(line_number_range_raw)
-        contract_id = node.get('id')
-
-        if self.v8:
-            pass  # do nothing
-        else:  # v4, v5, v6, v7
-            node = node.get("attributes")
-            node["abstract"] = not node.get('fullyImplemented')
+        line_number_range, _ = self.get_line_number_range_and_source(node.src)
+        contract_id = node.id
 
+        # `abstract` is missing in compact ASTs generated by solc < 0.6 with standard json
         assert node.get('name') is not None
-        assert node.get('abstract') is not None
-        # assert node.get('baseContracts') is not None
 
         contract_kind = node.get('contractKind')
-
         is_abstract = node.get('abstract')
 
-        if node.get('baseContracts') is not None:
-            base_contracts = self._get_base_contracts(node.get('baseContracts'))
-        else:
+        base_contracts = node.get('baseContracts')
+        if base_contracts is None:
             base_contracts = node.get('contractDependencies')
         contract_name = node.get('name')
 
         return contract_id, contract_kind, is_abstract, contract_name, base_contracts, line_number_range
 
-    def _process_contract(self, node: Dict) -> ContractData:
+    def _process_contract(self, node: AstNode, source_id: str = "") -> ContractData:
         contract_meta_data = self._get_contract_meta_data(node)
-        source_id = node.get("source_id", "")
         contract_id, contract_kind, is_abstract, contract_name, base_contracts, line_number_range = contract_meta_data
 
         functions = []
         fields = []
         modifiers = []
         events = []
-        keys = self.keys
-        for node in node.get(keys.children, []):
-            node["source_id"] = source_id
-            if node[keys.name] == "FunctionDefinition":
-                functions.append(self._process_function(node))
-            elif node[keys.name] == "VariableDeclaration":
-                fields.append(self._process_field(node))
-            elif node[keys.name] == "ModifierDefinition":
-                modifiers.append(self._process_modifier(node))
-            elif node[keys.name] == "EventDefinition":
-                events.append(self._process_event(node))
+        for child in node.children:
+            child.raw["source_id"] = source_id
+            if child.node_type == "FunctionDefinition":
+                functions.append(self._process_function(child, source_id))
+            elif child.node_type == "VariableDeclaration":
+                fields.append(self._process_field(child, source_id))
+            elif child.node_type == "ModifierDefinition":
+                modifiers.append(self._process_modifier(child))
+            elif child.node_type == "EventDefinition":
+                events.append(self._process_event(child, source_id))
             else:
                 # not implemented for other types
                 pass
@@ -279,35 +243,6 @@ class BaseParser():
         return ContractData(is_abstract, contract_name, contract_kind, base_contracts, fields, functions, modifiers, source_id, line_number_range, contract_id, events)
 
 
-    def fields_in_contract(self, contract: ContractData,
-                           name_only: bool = False,
-                           field_visibility: Optional[frozenset] = None,
-                           parent_field_visibility: Optional[frozenset] = FIELD_VISIBILITY_NON_PRIVATE,
-                           with_base_fields=False) -> List[Field]:
-        fields = contract.fields
-        if (field_visibility is not None) and not (field_visibility == self.FIELD_VISIBILITY_ALL):
-            fields = [n for n in fields if n.visibility in field_visibility]
-
-        # contract.fields has already included the base fields
-        if not with_base_fields:
-            fields = [n for n in fields if n.inherited_from == ''] # remove all base fields
-        else:
-            temp = []
-            for field in fields:
-                # fields contains all, so if inherited_from is not '', it is inherited and
-                # we need to check the visibility(e.g. sometimes private can not be included here)
-                if field.inherited_from != '':
-                    if field.visibility in parent_field_visibility:
-                        temp.append(field)
-                else:
-                    temp.append(field)
-            # base_contract_names = contract.base_contracts
-            # base_fields = [f for c in base_contract_names
-            #                for f in self.fields_in_contract_by_name(c, field_visibility=parent_field_visibility)]
-            fields = temp
-
-        return [f.name if name_only else f for f in fields]
-
     def pruned_contracts(self) -> List[ContractData]:
         contracts = self.all_contracts()
         base_contracts_name = self.base_contract_names
@@ -322,37 +257,118 @@ class BaseParser():
         return [c.name for c in self.pruned_contracts()]
 
 
-    def _parse(self) -> Dict:
-        # todo record source file location
-
+    def _parse_source_unit(self, ast: AstNode, source_id: str) -> List[ContractData]:
+        if ast.node_type != "SourceUnit" or not ast.children:
+            raise SolidityAstError("Invalid AST")
+
+        contracts = []
+        for node in ast.children:
+            node.raw["source_id"] = source_id
+            if node.node_type == "ContractDefinition":
+                contract = self._process_contract(node, source_id)
+                assert contract.contract_id > 0, 'Missing contract_id in contract'
+                contracts.append(contract)
+        return contracts
+
+    def _parse(self, reusable_units: Collection[str] = ()) -> Dict:
+        '''
+        Parse all source units into a dict from contract id to `ContractData`.
+        - `reusable_units`: source ids whose contracts parsed previously can be reused as is
+        '''
         data_dict = {}
-        # use version key to get the correct version cfg
-        keys = self.keys
-        unique_file = set()
+        own_contracts = {}
 
         self.id_to_symbols = {v: k for k, v in self.exported_symbols.items()}
 
-        for ast_key in self.solc_json_ast.keys():
+        for ast_key, ast in self.normalized_asts.items():
             source_id = ast_key.split(':')[0]
-            if source_id in unique_file:
+            if source_id in own_contracts:
                 continue
 
-            unique_file.add(source_id)
-            ast = self.solc_json_ast.get(ast_key).get('ast')
-            if ast[keys.name] != "SourceUnit" or ast[keys.children] is None:
-                raise SolidityAstError("Invalid AST")
+            if source_id in reusable_units and source_id in self._own_contracts:
+                contracts = self._own_contracts[source_id]
+            else:
+                contracts = self._parse_source_unit(ast, source_id)
+            own_contracts[source_id] = contracts
 
-            for i, node in enumerate(ast[keys.children]):
-                node["source_id"] = source_id
-                if node[keys.name] == "PragmaDirective":
-                    continue
-                elif node[keys.name] == "ContractDefinition":
-                    contract = self._process_contract(node)
-                    data_dict[contract.contract_id] = contract
-                    assert contract.contract_id > 0, 'Missing contract_id in contract'
+            # inherited fields and functions are added to copies, own contracts are kept for reuse
+            for contract in contracts:
+                data_dict[contract.contract_id] = dataclasses.replace(contract, fields=list(contract.fields), functions=list(contract.functions))
+
+        self._own_contracts = own_contracts
         add_inherited_function_fields(data_dict)
         return data_dict
 
+    def _reset_derived_caches(self):
+        '''Drop everything derived from the compilation output, called before re-parsing an updated output'''
+        for name in ('normalized_asts', 'exported_symbols', 'literal_index', 'all_contract_names', 'all_abstract_contract_names',
+                     'base_contract_names', 'pruned_contract_names', 'all_libraries_names', 'placeholder_index',
+                     'definition_ranges'):
+            self.__dict__.pop(name, None)
+        self._processed_literals = {}
+        self._storage_layouts = {}
+        self._opcode2pcs = {}
+        self._source_maps = {}
+        self._code_bitmaps = {}
+        self._pc_attributions = {}
+
+    def _build_indexes(self) -> Dict[int, ContractIndex]:
+        '''
+        Build name, selector and event topic indexes for all contracts in `contracts_dict`.
+        Should be called once after `_parse()`, filtered views are reset as well.
+        '''
+        indexes = {}
+        for contract_id, contract in self.contracts_dict.items():
+            index = ContractIndex()
+            # functions of the contract itself come before the inherited ones, first one wins
+            for fn in contract.functions:
+                index.functions_by_name.setdefault(fn.name, []).append(fn)
+                if fn.selector:
+                    index.functions_by_selector.setdefault(fn.selector, fn)
+            for ev in contract.events:
+                index.events_by_name.setdefault(ev.name, []).append(ev)
+                # the signature hash of an anonymous event is not logged as a topic
+                if ev.anonymous:
+                    continue
+                topic = s.topic_from_signature(ev.signature)
+                if topic:
+                    index.events_by_topic.setdefault(topic, ev)
+            for m in contract.modifiers:
+                index.modifiers_by_name.setdefault(m.name, m)
+            indexes[contract_id] = index
+
+        self.contract_indexes = indexes
+        self._filtered_views = {}
+        return indexes
+
+    def contract_index(self, contract: Union[ContractData, str]) -> ContractIndex:
+        '''Get the hash indexes of a contract by contract object or contract name'''
+        if isinstance(contract, str):
+            contract = self.contract_by_name(contract)
+        return self.contract_indexes[contract.contract_id]
+
+    def function_by_selector(self, contract_name: str, selector: str) -> Optional[Function]:
+        '''Return a function by its 4-byte selector in hex, with or without `0x` prefix'''
+        selector = selector[2:] if selector[:2].lower() == '0x' else selector
+        return self.contract_index(contract_name).functions_by_selector.get(selector.lower())
+
+    def event_by_topic(self, contract_name: str, topic: str) -> Optional[Event]:
+        '''Return a non-anonymous event by its topic (keccak256 hash of the event signature) in hex'''
+        topic = topic[2:] if topic[:2].lower() == '0x' else topic
+        return self.contract_index(contract_name).events_by_topic.get(topic.lower())
+
+    def modifier_by_name(self, contract_name: str, modifier_name: str) -> Optional[Modifier]:
+        '''Return a modifier defined in the contract by name'''
+        return self.contract_index(contract_name).modifiers_by_name.get(modifier_name)
+
+    def _filtered_view(self, key: tuple, build) -> list:
+        '''A filtered list cached per key, returned as a copy so that callers can modify it'''
+        view = self._filtered_views.get(key)
+        if view is None:
+            view = tuple(build())
+            self._filtered_views[key] = view
+        return list(view)
+
     def all_contracts(self) -> List[ContractData]:
         # dict to list
         return list(self.contracts_dict.values())
@@ -386,6 +402,14 @@ class BaseParser():
                            field_visibility: Optional[frozenset] = None,
                            parent_field_visibility: Optional[frozenset] = FIELD_VISIBILITY_NON_PRIVATE,
                            with_base_fields=False) -> List[Field]:
+        """
+        Return fields of the contract filtered by visibility. Results are cached per filter.
+        """
+        key = ('fields', contract.contract_id, name_only, field_visibility, parent_field_visibility, with_base_fields)
+        return self._filtered_view(key, lambda: self.__fields_in_contract(contract, name_only, field_visibility,
+                                                                          parent_field_visibility, with_base_fields))
+
+    def __fields_in_contract(self, contract: ContractData, name_only, field_visibility, parent_field_visibility, with_base_fields) -> list:
         fields = contract.fields
         if (field_visibility is not None) and not (field_visibility == self.FIELD_VISIBILITY_ALL):
             fields = [n for n in fields if n.visibility in field_visibility]
@@ -403,9 +427,6 @@ class BaseParser():
                         temp.append(field)
                 else:
                     temp.append(field)
-            # base_contract_names = contract.base_contracts
-            # base_fields = [f for c in base_contract_names
-            #                for f in self.fields_in_contract_by_name(c, field_visibility=parent_field_visibility)]
             fields = temp
 
         return [f.name if name_only else f for f in fields]
@@ -423,7 +444,11 @@ class BaseParser():
                               function_visibility: Optional[frozenset] = None,
                               check_base_contract=True) -> List[Union[Function, str]]:
         # filter and return all functions for a given contract object of type `ContractData`
+        # results are cached per filter
+        key = ('functions', contract.contract_id, name_only, function_visibility, check_base_contract)
+        return self._filtered_view(key, lambda: self.__functions_in_contract(contract, name_only, function_visibility, check_base_contract))
 
+    def __functions_in_contract(self, contract: ContractData, name_only, function_visibility, check_base_contract) -> list:
         # by default, base contract's functions are included
         # different from fields, we don't check parent function visibility
         functions = contract.functions
@@ -454,9 +479,7 @@ class BaseParser():
 
     def function_by_name(self, contract_name: str, function_name: str) -> Function:
         """return a function for a given "contract name"(str) and "function name"(str)"""
-        contract = self.contract_by_name(contract_name)
-        funcs    = self.functions_in_contract(contract)
-        return next(fn for fn in funcs if fn.name == function_name)
+        return next(iter(self.contract_index(contract_name).functions_by_name.get(function_name, ())))
 
     def events_in_contract(self, contract: ContractData, name_only: bool = False) -> List[Union[str, Event]]:
         """return all events for a given contract object of type `ContractData`"""
@@ -472,9 +495,7 @@ class BaseParser():
 
     def event_by_name(self, contract_name: str, event_name: str) -> Event:
         """return an event for a given "contract name"(str) and "event name"(str)"""
-        contract = self.contract_by_name(contract_name)
-        events    = self.events_in_contract(contract)
-        return next(ev for ev in events if ev.name == event_name)
+        return next(iter(self.contract_index(contract_name).events_by_name.get(event_name, ())))
 
     def all_libraries(self) -> List[ContractData]:
         return [contract for contract in self.all_contracts() if contract.kind == "library"]
@@ -484,43 +505,230 @@ class BaseParser():
         return [lib.name for lib in self.all_libraries()]
 
 
-    def _traverse_nodes(self, node, literals_nodes):
-        if not isinstance(node, dict):
-            return
-
-        if node.get(self.keys.name) == 'Literal':
-            if self.v8 and node.get('typeDescriptions'):
-                literals_nodes.add(Literal(
-                    hex_value=node.get('hexValue'),
-                    str_value=node.get('value'),
-                    sub_type=node.get('typeDescriptions').get('typeString'),
-                    token_type=node.get('kind', ),
-                ))
-            elif not self.v8 and node.get('attributes'):
-                literals_nodes.add(Literal(
-                    hex_value=node.get('attributes').get('hexvalue'),
-                    str_value=node.get('attributes').get('value'),
-                    sub_type=node.get('attributes').get('type'),
-                    token_type=node.get('attributes').get('token'),
-                ))
-        else:
-            for k, v in node.items():
-                if isinstance(v, dict):
-                    self._traverse_nodes(v, literals_nodes)
-                if isinstance(v, list):
-                    for c in v:
-                        if isinstance(c, dict):
-                            self._traverse_nodes(c, literals_nodes)
+    def _literal_from_node(self, node: AstNode) -> Literal:
+        return Literal(
+            hex_value=node.get('hexValue'),
+            str_value=node.get('value'),
+            sub_type=node.get('type'),
+            token_type=node.get('token'),
+        )
+
+    @cached_property
+    def literal_index(self) -> LiteralIndex:
+        '''
+        Literals of all contracts, collected in one iterative traversal over all source units.
+        '''
+        index = LiteralIndex()
+        seen_units = set()
+        for root in self.normalized_asts.values():
+            # for combined json, contracts in the same file share one source unit
+            if id(root) in seen_units:
+                continue
+            seen_units.add(id(root))
+
+            to_visit = [(root, None)]
+            while to_visit:
+                node, contract_id = to_visit.pop()
+                if node.node_type == 'Literal':
+                    if contract_id is not None:
+                        index.literals[contract_id].add(self._literal_from_node(node))
+                    continue
+
+                if node.node_type == 'ContractDefinition':
+                    contract_id = node.id
+                    index.literals[contract_id] = set()
+                    index.contract_ids.setdefault(node.get('name'), contract_id)
+                    index.linearized_bases[contract_id] = node.get('linearizedBaseContracts') or [contract_id]
+
+                to_visit.extend((c, contract_id) for c in node.children)
+        return index
+
+    def get_literals(self, contract_name: str, only_value=False, with_base_contracts=False) -> dict:
+        """
+        Get all literals(number, address, string, other) in the contract.
+        for 'other' type, if only_value is True, return the string value
+        - `contract_name`: contract_name in string
+        - `only_value`: set to true to get only values, otherwise get all literal objects
+        - `with_base_contracts`: set to true to include literals of all base contracts
+        """
+        key = (contract_name, only_value, with_base_contracts)
+        literals = self._processed_literals.get(key)
+        if literals is None:
+            index = self.literal_index
+            contract_id = index.contract_ids.get(contract_name)
+            contract_ids = index.linearized_bases.get(contract_id, []) if with_base_contracts else [contract_id]
+            literals_nodes = set().union(*(index.literals.get(i, ()) for i in contract_ids))
+            literals = s.process_literal_node(literals_nodes, only_value)
+            self._processed_literals[key] = literals
+        return {k: set(v) for k, v in literals.items()}
+
+    def all_literals(self, only_value=False, with_base_contracts=False) -> Dict[str, dict]:
+        """
+        Get literals of all contracts keyed by contract name, see `get_literals`
+        """
+        return {name: self.get_literals(name, only_value, with_base_contracts) for name in self.literal_index.contract_ids}
 
     def pc2opcode_by_contract(self, contract_name: str, deploy) -> Dict[int, str]:
         # to be implemented by child classes
         ...
 
-    @cache
-    def opcode2pcs_by_contract(self, contract_name: str, deploy) -> Dict[str, set[int]]:
-        pc2opcode = self.pc2opcode_by_contract(contract_name, deploy=deploy)
+    def _raw_storage_layout(self, contract_name: str) -> Optional[Union[dict, str]]:
+        # to be implemented by child classes
+        ...
+
+    def storage_layout(self, contract_name: str) -> Optional[StorageLayout]:
+        """
+        Storage layout of a contract indexed by slot, returns None if the layout is not
+        available, e.g. compiled with solc < 0.6.5
+        """
+        if contract_name not in self._storage_layouts:
+            layout = self._raw_storage_layout(contract_name)
+            self._storage_layouts[contract_name] = StorageLayout(layout) if layout else None
+        return self._storage_layouts[contract_name]
+
+    def _raw_source_map(self, contract_name: str, deploy: bool) -> Optional[str]:
+        # to be implemented by child classes
+        ...
+
+    def source_map(self, contract_name: str, deploy=False) -> Optional[SourceMap]:
+        '''
+        Decoded source map of a contract, one entry per instruction of the runtime (or deployment) code.
+        Returns None if the source map is not available.
+        '''
+        key = (contract_name, deploy)
+        if key not in self._source_maps:
+            srcmap = self._raw_source_map(contract_name, deploy)
+            self._source_maps[key] = s.decode_src_mapping(srcmap) if srcmap else None
+        return self._source_maps[key]
+
+    def _raw_binary(self, contract_name: str, deploy: bool) -> Optional[str]:
+        # to be implemented by child classes
+        ...
+
+    def _binary_code(self, contract_name: str, deploy: bool) -> Optional[bytes]:
+        # binary as bytes, with unlinked library placeholders zeroed
+        binary = self._raw_binary(contract_name, deploy)
+        return opcodes.hex_to_bytes(s.LINK_PLACEHOLDER_RE.sub('0' * 40, binary)) if binary else None
+
+    def code_bitmap(self, contract_name: str, deploy=False) -> Optional[CodeBitmap]:
+        '''
+        Bitmaps of instruction starts and valid JUMPDESTs of the runtime (or deployment) code, see `opcodes.CodeBitmap`.
+        Returns None if the contract has no code.
+        '''
+        key = (contract_name, deploy)
+        if key not in self._code_bitmaps:
+            code = self._binary_code(contract_name, deploy)
+            self._code_bitmaps[key] = opcodes.code_bitmap(code) if code else None
+        return self._code_bitmaps[key]
+
+    def dispatch_table(self, contract_name: str) -> List[DispatchEntry]:
+        '''
+        Selector dispatch table of the runtime binary of a contract, in dispatcher order.
+        Entries are linked to the functions of the contract by selector.
+        '''
+        code = self._binary_code(contract_name, deploy=False)
+        if not code:
+            return []
+        functions = self.contract_index(contract_name).functions_by_selector
+        table = dispatch_table(code)
+        return [DispatchEntry(selector, pc, functions.get(selector)) for selector, pc in table.items()]
+
+    @cached_property
+    def definition_ranges(self) -> Dict[int, tuple]:
+        '''
+        Source index -> (function / modifier definitions, contract definitions) of the source unit,
+        each as `(starts, ends, nodes)` sorted by start. Definitions of the same kind do not overlap.
+        '''
         out = {}
-        for pc, opcode in pc2opcode.items():
-            out.setdefault(opcode, set()).add(pc)
+        for root in {id(node): node for node in self.normalized_asts.values()}.values():
+            if root.src is None:
+                continue
+            functions, contracts = [], []
+            for node in root.walk():
+                if node.src is None:
+                    continue
+                if node.node_type in ('FunctionDefinition', 'ModifierDefinition'):
+                    functions.append(node)
+                elif node.node_type == 'ContractDefinition':
+                    contracts.append(node)
+            ranges = []
+            for nodes in (functions, contracts):
+                nodes.sort(key=lambda n: n.src[0])
+                ranges.append(([n.src[0] for n in nodes], [n.src[0] + n.src[1] for n in nodes], nodes))
+            out[root.src[2]] = tuple(ranges)
+        return out
 
+    def pc_attribution(self, contract_name: str, deploy=False) -> Optional[PcAttribution]:
+        '''
+        Table of the enclosing FunctionDefinition / ModifierDefinition of every PC of the runtime (or deployment)
+        code, built once from the bytecode, the source map and AST source ranges.
+        Returns None if the code or the source map is not available.
+        '''
+        key = (contract_name, deploy)
+        if key in self._pc_attributions:
+            return self._pc_attributions[key]
+
+        code = self._binary_code(contract_name, deploy)
+        srcmap = self.source_map(contract_name, deploy)
+        out = None
+        if code and srcmap:
+            out = PcAttribution()
+            dis = opcodes.disassemble(code, split_metadata=False)
+            # the source map only covers instructions, not data and metadata appended to the code
+            n = min(len(dis), len(srcmap))
+            out.pcs = dis.pcs[:n]
+            ranges = self.definition_ranges
+            attributed: Dict[tuple, int] = {}
+            for i in range(n):
+                location = (srcmap.starts[i], srcmap.lengths[i], srcmap.file_ids[i])
+                function_id = attributed.get(location)
+                if function_id is None:
+                    function_id = self.__attribute(location, ranges, out.definitions)
+                    attributed[location] = function_id
+                out.function_ids.append(function_id)
+        self._pc_attributions[key] = out
         return out
+
+    @staticmethod
+    def __attribute(location: tuple, ranges: Dict[int, tuple], definitions: Dict[int, dict]) -> int:
+        start, length, fid = location
+        if fid < 0:
+            return PcAttribution.UNKNOWN
+        if fid not in ranges:
+            return PcAttribution.YUL_HELPER
+        end = start + length
+        for kind, (starts, ends, nodes) in enumerate(ranges[fid]):
+            i = bisect.bisect_right(starts, start) - 1
+            if i >= 0 and ends[i] >= end:
+                if kind == 1:
+                    return PcAttribution.CONTRACT
+                definitions[nodes[i].id] = nodes[i].raw
+                return nodes[i].id
+        return PcAttribution.UNKNOWN
+
+    def function_unit_id_by_pc(self, contract_name: str, pc: int, deploy=False) -> int:
+        '''
+        AST id of the function or modifier definition containing a PC, or one of the `PcAttribution` codes
+        '''
+        attribution = self.pc_attribution(contract_name, deploy)
+        return attribution.function_id(pc) if attribution else PcAttribution.UNKNOWN
+
+    def decode_storage(self, contract_name: str, storage: Dict[SlotValue, SlotValue]) -> Dict[str, Any]:
+        """
+        Decode a raw storage dump `{slot: value}` of a contract to `{variable label: value}`,
+        see `StorageLayout.decode`
+        """
+        layout = self.storage_layout(contract_name)
+        if layout is None:
+            raise SolidityAstError(f'Storage layout is not available for contract {contract_name} with solc version {self.exact_version}')
+        return layout.decode(storage)
+
+    def opcode2pcs_by_contract(self, contract_name: str, deploy) -> Dict[str, set[int]]:
+        key = (contract_name, deploy)
+        if key not in self._opcode2pcs:
+            pc2opcode = self.pc2opcode_by_contract(contract_name, deploy=deploy)
+            out = {}
+            for pc, opcode in pc2opcode.items():
+                out.setdefault(opcode, set()).add(pc)
+            self._opcode2pcs[key] = out
+        return self._opcode2pcs[key]
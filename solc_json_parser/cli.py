@@ -1,17 +1,87 @@
 #!/usr/bin/env python3
 import argparse
+import json
+import sys
+from typing import IO, Iterator
 from . import opcodes
 
+# hex characters read at a time from a file
+READ_SIZE = 1 << 20
+
+
+def read_hex_chunks(f: IO[str]) -> Iterator[bytes]:
+    '''Read a hex file as chunks of bytes, whitespace and a leading 0x are ignored'''
+    first, rest = True, ''
+    while True:
+        text = f.read(READ_SIZE)
+        if not text:
+            break
+        text = rest + ''.join(text.split())
+        if first and text:
+            if text[:2].lower() == '0x':
+                text = text[2:]
+            first = False
+        cut = len(text) & ~1
+        rest = text[cut:]
+        yield bytes.fromhex(text[:cut])
+
+
+def write_text(blocks: Iterator[opcodes.Disassembly], out: IO[str]):
+    for block in blocks:
+        lines = [opcodes.format_instruction(op, operand) for _, op, operand in block]
+        if block.metadata:
+            lines.append(f"METADATA 0x{block.metadata.hex()}")
+        if lines:
+            out.write('\n'.join(lines) + '\n')
+
+
+def write_json(blocks: Iterator[opcodes.Disassembly], out: IO[str]):
+    out.write('{"instructions": [')
+    sep, metadata = '', b''
+    for block in blocks:
+        items = []
+        for pc, op, operand in block:
+            item = {'pc': pc, 'opcode': opcodes.byte_to_name.get(op, f'0x{op:02x}')}
+            if opcodes.push_width[op]:
+                item['operand'] = f'0x{operand.hex()}'
+            items.append(json.dumps(item))
+        if items:
+            out.write(sep + ', '.join(items))
+            sep = ', '
+        metadata += block.metadata
+    out.write(f'], "metadata": {json.dumps("0x" + metadata.hex() if metadata else None)}}}\n')
+
+
 def main():
     parser = argparse.ArgumentParser(description='CLI tool description.')
     subparsers = parser.add_subparsers(dest='command', help='Subcommands')
     decode_parser = subparsers.add_parser('decode_binary', aliases=['dp'], help='Decode binary data')
-    decode_parser.add_argument('data', type=str, help='Binary data to decode')
+    decode_parser.add_argument('data', type=str, help='Binary data to decode, or a file containing it with -f')
+    decode_parser.add_argument('-f', '--file', action='store_true', help='Read binary data from a file, - for stdin')
+    decode_parser.add_argument('--json', action='store_true', help='Print instructions as json')
+    decode_parser.add_argument('--keep-metadata', action='store_true', help='Decode the metadata trailer as instructions')
+    encode_parser = subparsers.add_parser('encode_binary', aliases=['ep'], help='Encode opcodes to binary data')
+    encode_parser.add_argument('data', type=str, help='Opcodes to encode, one instruction per line, or a file containing them with -f')
+    encode_parser.add_argument('-f', '--file', action='store_true', help='Read opcodes from a file, - for stdin')
 
     args = parser.parse_args()
 
     if args.command in ['decode_binary', 'dp']:
-        opcodes.decode_and_print(args.data)
+        split_metadata = not args.keep_metadata
+        write = write_json if args.json else write_text
+        if args.file:
+            f = sys.stdin if args.data == '-' else open(args.data, 'r')
+            with f:
+                write(opcodes.disassemble_stream(read_hex_chunks(f), split_metadata), sys.stdout)
+        else:
+            write(iter([opcodes.disassemble(opcodes.hex_to_bytes(args.data), split_metadata)]), sys.stdout)
+    elif args.command in ['encode_binary', 'ep']:
+        if args.file:
+            f = sys.stdin if args.data == '-' else open(args.data, 'r')
+            with f:
+                opcodes.encode_and_print(f.read())
+        else:
+            opcodes.encode_and_print(args.data)
     else:
         parser.print_help()
 
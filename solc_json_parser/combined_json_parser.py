@@ -4,17 +4,37 @@ from semantic_version import Version
 import addict
 import solcx
 import os
-from typing import Collection, Dict, Optional, List, Any, Union
+import json
+from typing import Callable, Collection, Dict, Optional, List, Any, Union
 from functools import cached_property, cache
 
 from .fields import Field, Function, ContractData, Modifier, Event, Literal
 from .version_cfg import v_keys
 from . import ast_shared as s
 from .base_parser import BaseParser, SolidityAstError
+from .solc_process import SolcLimitError, SolcLimits, run_solc, solc_command
+
+# options of py-solc-x compile functions which are not solc flags
+NON_FLAG_OPTIONS = ('output_values', 'solc_binary', 'solc_version', 'allow_empty', 'output_dir', 'overwrite')
+
+
+def parse_combined_json_output(output: str) -> Dict[str, dict]:
+    '''Contracts of a `--combined-json` output with their source unit ASTs, the same result as py-solc-x compile functions'''
+    output_json = json.loads(output)
+    contracts = output_json.get('contracts', {})
+    sources = output_json.get('sources', {})
+    for path_str, data in contracts.items():
+        if 'abi' in data and isinstance(data['abi'], str):
+            data['abi'] = json.loads(data['abi'])
+        key = path_str.rsplit(':', maxsplit=1)[0]
+        if 'AST' in sources.get(key, {}):
+            data['ast'] = sources[key]['AST']
+    return contracts
 
 
 class CombinedJsonParser(BaseParser):
-    def __init__(self, contract_source_path: str, version=None, retry_num=None, solc_options={}, lazy=False, solc_outputs=None, try_install_solc=False):
+    def __init__(self, contract_source_path: str, version=None, retry_num=None, solc_options={}, lazy=False, solc_outputs=None, try_install_solc=False,
+                 solc_bin_resolver: Callable[[str], str] = s.solc_bin, solc_limits: Optional[SolcLimits] = None):
         super().__init__()
         self.file_path = None
         self.root_path = None
@@ -28,12 +48,14 @@ class CombinedJsonParser(BaseParser):
             else:
                 self.compile_type = 'file'
                 self.file_path = os.path.abspath(contract_source_path)
-                self.root_path = os.path.dirname(contract_source_path)
+                self.root_path = os.path.dirname(self.file_path)
                 with open(contract_source_path, 'r') as f:
                     self.source = f.read()
 
         self.original_compilation_output :Optional[Dict] = None
         self.try_install_solc = try_install_solc
+        self.solc_bin_resolver = solc_bin_resolver
+        self.solc_limits = solc_limits
         self.solc_outputs = solc_outputs
         self.solc_options = solc_options
         self.import_remappings = solc_options.get('import_remappings')
@@ -55,13 +77,12 @@ class CombinedJsonParser(BaseParser):
     def build(self):
         self.compile()
         self.contracts_dict: Dict = self._parse()
+        self._build_indexes()
 
     @cached_property
     def exported_symbols(self) -> Dict[str, int]:
-        if self.v8:
-            return s.symbols_to_ids_from_ast_v8(self.solc_json_ast)
-        else:
-            return s.symbols_to_ids_from_ast_v7(self.solc_json_ast)
+        syms = [ast.get('exportedSymbols') for ast in self.normalized_asts.values()]
+        return {k: v[0] for m in syms for k, v in m.items()}
 
 
     @cached_property
@@ -70,27 +91,37 @@ class CombinedJsonParser(BaseParser):
 
 
     def compile(self):
-        current_working_dir = os.getcwd()
+        '''
+        Compile with the solc binary of `exact_version` in `root_path`. The binary and the working directory are
+        passed to the solc process only, so parsers can compile concurrently in threads.
+        '''
         try:
-            if self.try_install_solc:
+            solc = self.solc_bin_resolver(self.exact_version)
+            if self.try_install_solc and not os.path.isfile(solc):
                 solcx.install_solc(self.exact_version)
-            solcx.set_solc_version(self.exact_version)
-            if self.root_path:
-                os.chdir(self.root_path)
-                self.root_path = os.getcwd()
+            if not os.path.isfile(solc):
+                raise SolidityAstError(f'solc not found at: {solc}, please install solc {self.exact_version} or provide your `solc_bin_resolver` function')
 
             compiler_options = dict(self.solc_options)
             overwritten_options = dict(base_path=self.base_path,
                                        import_remappings=self.import_remappings,
-                                       output_values=self.solc_outputs or self.solc_compile_outputs,
-                                       solc_version=self.exact_version)
+                                       combined_json=self.solc_outputs or self.solc_compile_outputs)
             compiler_options.update(overwritten_options)
-            if self.compile_type == "file":
-                out = solcx.compile_files(self.file_path, **compiler_options)
-            else:
-                out = solcx.compile_source(self.source, **compiler_options)
+            allow_empty = compiler_options.get('allow_empty')
+            for k in NON_FLAG_OPTIONS:
+                compiler_options.pop(k, None)
+
+            source_files = [self.file_path] if self.compile_type == "file" else None
+            command = solc_command(solc, source_files, **compiler_options)
+            stdin = None if source_files else self.source
+            out = parse_combined_json_output(run_solc(command, input=stdin, cwd=self.root_path, limits=self.solc_limits))
+            if not out and not allow_empty:
+                raise SolidityAstError(f'No contracts found in the compilation output of: {" ".join(command)}')
             self.original_compilation_output = out
             self.solc_json_ast = {k.split(':')[-1]: v for k, v in out.items()}
+        except SolcLimitError:
+            # another version would most likely hit the same limit
+            raise
         except Exception as e:
             if self.retry_num > 0:
                 self.retry_num -= 1
@@ -100,8 +131,6 @@ class CombinedJsonParser(BaseParser):
                 self.compile()
             else:
                 raise SolidityAstError(f"Compile failed with solc version {self.exact_version}, err msg: {e}")
-        finally:
-            os.chdir(current_working_dir)
 
 
 
@@ -204,8 +233,8 @@ class CombinedJsonParser(BaseParser):
         yul_support_flag = False
         for contract_name in self.solc_json_ast.keys():
             absolute_path = self.source_path_by_contract(contract_name)
-            idx = s.get_in(self.solc_json_ast, contract_name, 'ast', 'src').split(':')[-1]
-            idx2path[int(idx)] = absolute_path
+            idx = self.normalized_asts[contract_name].src[2]
+            idx2path[idx] = absolute_path
             if self.solc_json_ast.get(contract_name).get('generated-sources') and \
                     self.solc_json_ast.get(contract_name).get('generated-sources-runtime'):
                 yul_support_flag = True
@@ -227,11 +256,8 @@ class CombinedJsonParser(BaseParser):
         return (start_line, end_line), source_code_bytes.decode()
 
     def source_path_by_contract(self, contract_name) -> Optional[str]:
-        path = None
-        if self.v8:
-            path = s.get_in(self.solc_json_ast, contract_name, 'ast', 'absolutePath')
-        else:
-            path = s.get_in(self.solc_json_ast, contract_name, 'ast', 'attributes', 'absolutePath')
+        ast = self.normalized_asts.get(contract_name)
+        path = ast and ast.get('absolutePath')
 
         base_path = self.base_path or self.root_path
         return None if (not path) or path == '<stdin>' else os.path.join(base_path, path)
@@ -305,10 +331,8 @@ class CombinedJsonParser(BaseParser):
         if part.get('source') is not None:
             source_idx = part['source']
         else:
-            src_mapping = self.solc_json_ast[contract_name]['srcmap-runtime']
-            parsed_mapping = s.parse_src_mapping(src_mapping)
             mapping_idx = list(pc2idx.values()).index(pc_idx)
-            source_idx = parsed_mapping[mapping_idx].get('f')
+            source_idx = self.source_map(contract_name, deploy).file_ids[mapping_idx]
 
         begin, end = itemgetter('begin', 'end')(part)
         source_idx = source_idx if source_idx is not None else list(self.solc_json_ast.keys()).index(contract_name)
@@ -337,38 +361,35 @@ class CombinedJsonParser(BaseParser):
         '''Get any value by keys from the original compiled ast data'''
         return s.get_in(self.original_compilation_output, *keys)
 
+    def _raw_storage_layout(self, contract_name: str) -> Optional[Union[dict, str]]:
+        return s.get_in(self.solc_json_ast, contract_name, 'storage-layout')
+
+    def _raw_source_map(self, contract_name: str, deploy: bool) -> Optional[str]:
+        return s.get_in(self.solc_json_ast, contract_name, 'srcmap' if deploy else 'srcmap-runtime')
+
+    def _raw_binary(self, contract_name: str, deploy: bool) -> Optional[str]:
+        return s.get_in(self.solc_json_ast, contract_name, 'bin' if deploy else 'bin-runtime')
+
     def get_deploy_bin_by_contract_name(self, contract_name: str) -> Optional[str]:
         return s.get_in(self.solc_json_ast, contract_name, 'bin')
 
+    @cached_property
+    def placeholder_index(self) -> Dict[str, str]:
+        '''34 character hash of fully qualified names -> fully qualified name, for all contracts'''
+        return {s.placeholder_hash(full_name): full_name for full_name in self.original_compilation_output.keys()}
+
     def qualified_name_from_hash(self, hsh: str)->str:
-        '''Get fully qualified contract name from 34 character hash'''
-        return next(full_name for full_name in self.original_compilation_output.keys() if s.keccak256(full_name)[:34] == hsh)
+        '''Get fully qualified contract name from 34 character hash, raises KeyError if not found'''
+        return self.placeholder_index[hsh]
+
+    def link_binary(self, contract_name: str, libraries: Dict[str, str], deploy=True) -> Optional[str]:
+        '''
+        Link the deployment (or runtime) binary of a contract with `libraries`, a dict from fully qualified library
+        name (`path/to/file.sol:Lib`) to address
+        '''
+        binary = s.get_in(self.solc_json_ast, contract_name, 'bin' if deploy else 'bin-runtime')
+        return s.link_bytecode(binary, libraries) if binary else binary
 
     def get_deploy_bin_by_hash(self, hsh: str) -> Optional[str]:
         '''Get deployment binary by hash of fully qualified contract / library name'''
         return self.get_any(self.qualified_name_from_hash(hsh), 'bin')
-
-    def get_literals(self, contract_name: str, only_value=False) -> dict:
-        """
-        Get all literals(number, address, string, other) in the contract.
-        for 'other' type, if only_value is True, return the string value
-        - `contract_name`: contract_name in string
-        - `only_value`: set to true to get only values, otherwise get all literal objects
-        """
-
-        literals_nodes = set() # save data here
-        root_node = self.solc_json_ast[contract_name]['ast']
-        contract_node = None
-        for i, node in enumerate(root_node[self.keys.children]):
-            if node[self.keys.name] == "ContractDefinition":
-                info_node = node if self.v8 else node.get('attributes')
-                if info_node['name'] == contract_name:
-                    contract_node = node
-                    break
-
-        # traverse the dictionary and get all the literals recursively
-        self._traverse_nodes(contract_node, literals_nodes)
-
-        literals = s.process_literal_node(literals_nodes, only_value)
-
-        return literals
@@ -0,0 +1,152 @@
+# Compile each distinct input of a corpus once.
+#
+# Contract corpora, e.g. downloaded from Etherscan, contain many identical sources and standard json inputs.
+# `DedupCompiler` hashes each compilation input and hands all duplicates of an input the parser (or the compilation
+# error) of its first occurrence. Inputs are hashed as compiled, source contents are never rewritten, so that
+# source locations of a shared parser are valid for all of its duplicates.
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .fields import CorpusStats
+from .flatten import parse_imports, split_lines
+from .solc_process import SolcLimitError
+from .standard_json_parser import StandardJsonParser
+
+# settings `override_settings` replaces before compiling, they do not distinguish inputs
+OVERRIDDEN_SETTINGS = ('optimizer', 'outputSelection', 'metadata')
+
+# failures which may not happen again, e.g. a timeout under load, they are not cached and a later duplicate retries
+TRANSIENT_ERRORS = (SolcLimitError, OSError)
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        h.update(part.encode())
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def standard_input_key(input_json: dict, version: str) -> str:
+    '''
+    Hash of a standard json input, independent of key order, of source order and of the settings the parsers override
+    '''
+    sources = {name: source.get('content') if 'content' in source else source.get('urls')
+               for name, source in (input_json.get('sources') or {}).items()}
+    settings = {k: v for k, v in (input_json.get('settings') or {}).items() if k not in OVERRIDDEN_SETTINGS}
+    canonical = json.dumps({'language': input_json.get('language', 'Solidity'), 'sources': sources, 'settings': settings},
+                           sort_keys=True, separators=(',', ':'))
+    return _digest(version or '', canonical)
+
+
+def source_key(source_or_path: str, version: Optional[str]) -> str:
+    '''
+    Hash of a single source or source file. Files importing other files are also keyed by their location,
+    since the imported files can differ.
+    '''
+    if '\n' in source_or_path:
+        return _digest(version or '', source_or_path)
+    with open(source_or_path, 'r') as f:
+        content = f.read()
+    location = os.path.abspath(source_or_path) if parse_imports(split_lines(content)) else ''
+    return _digest(version or '', content, location)
+
+
+def input_key(input: Union[dict, str], version: Optional[str], kwargs: Dict[str, Any]) -> str:
+    '''Hash of a parser input, its version and the other parser arguments'''
+    if isinstance(input, dict):
+        key = standard_input_key(input, version or '')
+    else:
+        try:
+            key = standard_input_key(json.loads(input), version or '')
+        except (json.JSONDecodeError, AttributeError):
+            key = source_key(input, version)
+    return _digest(key, repr(sorted(kwargs.items())))
+
+
+class DedupCompiler():
+    '''
+    A parser factory compiling each distinct input only once, e.g.:
+
+        compiler = DedupCompiler()
+        parsers = compiler.parse_many((c.input_json, c.version) for c in contracts)
+        print(compiler.stats)
+
+    It is safe to call from many threads, concurrent requests of the same input wait for one compilation.
+    Compilation errors are cached like parsers, except `TRANSIENT_ERRORS` such as a solc timeout: these are raised
+    to the requests waiting at that time, and the next duplicate compiles the input again.
+    Use an instance as `parser_factory` of `etherscan.compile_etherscan_contracts` to de-duplicate a stream.
+    All parsers are kept while the compiler is alive.
+    '''
+    def __init__(self, parser_factory: Callable = StandardJsonParser, max_workers: Optional[int] = None):
+        self.parser_factory = parser_factory
+        self.max_workers = max_workers
+        self.stats = CorpusStats()
+        self._lock = threading.Lock()
+        # input key -> (future parser, compile seconds)
+        self._entries: Dict[str, Tuple[Future, List[float]]] = {}
+
+    def __call__(self, input: Union[dict, str], version: Optional[str], **kwargs):
+        '''Parser of an input, compiled by `parser_factory(input, version, **kwargs)` on its first occurrence'''
+        key = input_key(input, version, kwargs)
+        with self._lock:
+            self.stats.inputs += 1
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = (Future(), [0.0])
+                self.stats.unique += 1
+
+        future, seconds = entry
+        if not owner:
+            shared = True
+            try:
+                return future.result()
+            except TRANSIENT_ERRORS:
+                shared = False
+                raise
+            finally:
+                if shared:
+                    with self._lock:
+                        self.stats.duplicates += 1
+                        self.stats.saved_seconds += seconds[0]
+
+        start = time.perf_counter()
+        try:
+            parser = self.parser_factory(input, version, **kwargs)
+        except Exception as e:
+            seconds[0] = time.perf_counter() - start
+            with self._lock:
+                self.stats.compile_seconds += seconds[0]
+                if isinstance(e, TRANSIENT_ERRORS):
+                    self._entries.pop(key, None)
+                    self.stats.unique -= 1
+                else:
+                    self.stats.failed += 1
+            future.set_exception(e)
+            raise
+        seconds[0] = time.perf_counter() - start
+        with self._lock:
+            self.stats.compile_seconds += seconds[0]
+        future.set_result(parser)
+        return parser
+
+    def parse_many(self, inputs: Iterable[Tuple[Union[dict, str], Optional[str]]], **kwargs) -> List[Any]:
+        '''
+        Parsers of many `(input, version)` pairs in the input order, or the exception raised compiling an input.
+        Distinct inputs are compiled on a thread pool.
+        '''
+        def parse(item):
+            try:
+                return self(item[0], item[1], **kwargs)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(parse, inputs))
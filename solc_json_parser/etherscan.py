@@ -0,0 +1,166 @@
+# Convert contract source responses of the Etherscan `getsourcecode` API into solc standard json inputs.
+#
+# `SourceCode` of a response comes in three variants:
+# - a plain solidity source of a single file
+# - a json object of sources, `{"A.sol": {"content": ...}, ...}`, for multi-file contracts
+# - a standard json input wrapped in an extra pair of braces, `{{"language": ..., "sources": ...}}`
+#
+# Compiler settings of the first two variants are rebuilt from the other fields of the response.
+
+import json
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from .ast_shared import simplify_version
+from .fields import EtherscanContract
+from .standard_json_parser import StandardJsonParser
+
+EtherscanResponse = Union[dict, str]
+
+
+def _response_record(response: EtherscanResponse) -> dict:
+    '''The contract record of an API response, which can also be given as the record itself'''
+    if isinstance(response, str):
+        response = json.loads(response)
+    if 'result' in response:
+        result = response['result']
+        if not isinstance(result, list) or not result:
+            raise ValueError(f'No contract in Etherscan response: {str(result)[:100]}')
+        response = result[0]
+    if 'SourceCode' not in response:
+        raise ValueError('Not an Etherscan contract source response, `SourceCode` is missing')
+    return response
+
+
+def _parse_source_code(source_code: str) -> Optional[dict]:
+    '''Json object of the `SourceCode` field, None for a plain solidity source'''
+    code = source_code.strip()
+    if code.startswith('{{') and code.endswith('}}'):
+        code = code[1:-1]
+    if not code.startswith('{'):
+        return None
+    try:
+        return json.loads(code)
+    except json.JSONDecodeError:
+        # a solidity source can not start with `{`, but do not fail on malformed responses
+        return None
+
+
+def _libraries(record: dict, sources: Dict[str, dict]) -> Dict[str, Dict[str, str]]:
+    '''
+    Settings of the `Library` field, `Name:0xaddress;...`, a library is linked in the source file defining it
+    '''
+    out: Dict[str, Dict[str, str]] = {}
+    for entry in (record.get('Library') or '').split(';'):
+        name, _, address = entry.partition(':')
+        name, address = name.strip(), address.strip()
+        if not name or not address:
+            continue
+        address = address if address.startswith('0x') else f'0x{address}'
+        pattern = re.compile(rf'\blibrary\s+{re.escape(name)}\b')
+        for filename, source in sources.items():
+            if pattern.search(source.get('content') or ''):
+                out.setdefault(filename, {})[name] = address
+                break
+    return out
+
+
+def _settings(record: dict, sources: Dict[str, dict]) -> dict:
+    settings: dict = {'optimizer': {'enabled': record.get('OptimizationUsed') == '1'}}
+    runs = record.get('Runs')
+    if runs and str(runs).isdigit():
+        settings['optimizer']['runs'] = int(runs)
+    evm_version = record.get('EVMVersion')
+    if evm_version and evm_version.lower() != 'default':
+        settings['evmVersion'] = evm_version.lower()
+    libraries = _libraries(record, sources)
+    if libraries:
+        settings['libraries'] = libraries
+    return settings
+
+
+def parse_etherscan_response(response: EtherscanResponse) -> EtherscanContract:
+    '''
+    Convert an Etherscan `getsourcecode` response, the whole response or its result record, into a standard json input
+    and the compiler version, which can be passed to `StandardJsonParser` directly
+    '''
+    record = _response_record(response)
+    contract_name = record.get('ContractName') or ''
+    source_code = record['SourceCode']
+    parsed = _parse_source_code(source_code)
+
+    if parsed is not None and 'sources' in parsed:
+        # standard json input
+        input_json = parsed
+        input_json['language'] = input_json.get('language', 'Solidity')
+    else:
+        sources = parsed if parsed is not None else {f'{contract_name or "Contract"}.sol': {'content': source_code}}
+        input_json = {'language': 'Solidity', 'sources': sources, 'settings': _settings(record, sources)}
+
+    return EtherscanContract(
+        contract_name=contract_name,
+        version=simplify_version(record.get('CompilerVersion')),
+        input_json=input_json,
+        address=record.get('ContractAddress') or None,
+        implementation=record.get('Implementation') or None,
+    )
+
+
+def parse_etherscan_file(path: str) -> EtherscanContract:
+    with open(path, 'r') as f:
+        contract = parse_etherscan_response(f.read())
+    contract.path = path
+    return contract
+
+
+def iter_etherscan_dir(root: str, suffix: str = '.json') -> Iterator[EtherscanContract]:
+    '''
+    Lazily parse all Etherscan responses in a directory tree, files which are not Etherscan contract sources are
+    skipped with a warning
+    '''
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.endswith(suffix):
+                continue
+            path = os.path.join(dirpath, filename)
+            try:
+                yield parse_etherscan_file(path)
+            except (ValueError, KeyError, TypeError) as e:
+                logging.warning(f'Skip {path}: {e}')
+
+
+def compile_etherscan_contracts(contracts: Iterable[EtherscanContract], parser_factory: Optional[Callable] = None,
+                                max_workers: Optional[int] = None, **parser_kwargs
+                                ) -> Iterator[Tuple[EtherscanContract, Union[StandardJsonParser, Exception]]]:
+    '''
+    Compile a stream of contracts on a thread pool, e.g. from `iter_etherscan_dir`, yields `(contract, parser)` in the
+    input order, or `(contract, exception)` if the contract can not be compiled.
+    `parser_factory(input_json, version, **parser_kwargs)` defaults to `StandardJsonParser`. At most twice
+    `max_workers` contracts are read ahead, so that large corpora are not loaded into memory at once.
+    '''
+    parser_factory = parser_factory or StandardJsonParser
+    # same default as ThreadPoolExecutor
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+
+    def compile_one(contract: EtherscanContract):
+        try:
+            if contract.version is None:
+                raise ValueError(f'Unknown compiler version of {contract.contract_name}')
+            return parser_factory(contract.input_json, contract.version, **parser_kwargs)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque = deque()
+        for contract in contracts:
+            pending.append((contract, executor.submit(compile_one, contract)))
+            if len(pending) >= 2 * max_workers:
+                contract, future = pending.popleft()
+                yield contract, future.result()
+        for contract, future in pending:
+            yield contract, future.result()
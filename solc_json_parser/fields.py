@@ -1,5 +1,7 @@
-from dataclasses import dataclass
-from typing import List, Optional
+from array import array
+import bisect
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
 
 @dataclass
 class Field:
@@ -30,6 +32,7 @@ class Function:
     state_mutability: str
     source_id: Optional[str]
     line_num: tuple  # (start, end)
+    selector: Optional[str] = None # 4-byte function selector in hex, None if not callable externally
 
 
 @dataclass
@@ -69,3 +72,108 @@ class Literal:
     def __eq__(self, other):
         return isinstance(other, self.__class__) and self.str_value == other.str_value \
                                                  and self.sub_type == other.sub_type
+
+
+@dataclass
+class ContractIndex:
+    '''Hash indexes of a single contract, built once after parsing'''
+    functions_by_name:     Dict[str, List[Function]] = field(default_factory=dict)
+    functions_by_selector: Dict[str, Function] = field(default_factory=dict)  # 4-byte selector in hex
+    events_by_name:        Dict[str, List[Event]] = field(default_factory=dict)
+    events_by_topic:       Dict[str, Event] = field(default_factory=dict)     # 32-byte topic in hex
+    modifiers_by_name:     Dict[str, Modifier] = field(default_factory=dict)
+
+
+
+@dataclass
+class LiteralIndex:
+    '''Literals of all contracts in a compilation, collected in a single AST pass'''
+    literals:         Dict[int, Set[Literal]] = field(default_factory=dict) # contract id -> literals in the contract body
+    contract_ids:     Dict[str, int] = field(default_factory=dict)          # contract name -> contract id, first definition wins
+    linearized_bases: Dict[int, List[int]] = field(default_factory=dict)    # contract id -> linearized base contract ids, including itself
+
+
+@dataclass
+class StorageVariable:
+    label:    str  # variable name, members and static array elements are expanded, e.g. `s.owner`, `arr[1]`
+    slot:     int
+    offset:   int  # offset in bytes inside the slot, counted from the lowest-order byte
+    size:     int  # number of bytes
+    type:     str  # type label, e.g. `uint256`, `mapping(address => uint256)`
+    encoding: str  # `inplace`, `mapping`, `dynamic_array` or `bytes`
+    contract: Optional[str] = None # fully qualified name of the contract declaring the variable
+
+
+@dataclass
+class SourceMap:
+    '''Decoded source map, one entry per instruction in parallel arrays'''
+    starts:          array = field(default_factory=lambda: array('i'))  # s, byte offset in the source file
+    lengths:         array = field(default_factory=lambda: array('i'))  # l, byte length of the source range
+    file_ids:        array = field(default_factory=lambda: array('i'))  # f, source index, -1 for compiler generated code
+    jumps:           bytearray = field(default_factory=bytearray)       # j, one of b'i', b'o', b'-'
+    modifier_depths: array = field(default_factory=lambda: array('i'))  # m
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, i: int) -> Tuple[int, int, int, str, int]:
+        return self.starts[i], self.lengths[i], self.file_ids[i], chr(self.jumps[i]), self.modifier_depths[i]
+
+
+@dataclass
+class CodeFingerprint:
+    contract_name: str
+    filename:      Optional[str]
+    skeleton_hash: str  # hash of the runtime code without metadata, with all PUSH20 / PUSH32 operands zeroed
+    code_hash:     str  # hash of the runtime code without metadata, with `masks` zeroed
+    masks:         List[Tuple[int, int]] = field(default_factory=list) # (start, length) of immutables and library addresses
+    source:        Optional[str] = None # the compilation the contract comes from, e.g. path of a compilation output
+
+
+@dataclass
+class DispatchEntry:
+    selector: str  # 4-byte selector in hex
+    entry_pc: int  # jump target of the selector in the dispatcher
+    function: Optional[Function] = None # None if there is no function definition, e.g. getters of public state variables
+
+
+@dataclass
+class PcAttribution:
+    '''PC to enclosing function table of a contract code, `function_ids[i]` is the attribution of `pcs[i]`'''
+    # codes for PCs not in a function or modifier
+    UNKNOWN    = -1 # no source location, e.g. compiler generated code
+    CONTRACT   = -2 # inside a contract but not in a function, e.g. the dispatcher and public state variable getters
+    YUL_HELPER = -3 # in a generated Yul source
+
+    pcs:          array = field(default_factory=lambda: array('I'))  # sorted PCs of instructions
+    function_ids: array = field(default_factory=lambda: array('i'))  # AST id of the FunctionDefinition / ModifierDefinition
+    definitions:  Dict[int, dict] = field(default_factory=dict)      # AST id -> raw definition node
+
+    def function_id(self, pc: int) -> int:
+        '''Attribution of a PC, PCs inside PUSH data are attributed like their instruction'''
+        i = bisect.bisect_right(self.pcs, pc) - 1
+        return self.function_ids[i] if i >= 0 else PcAttribution.UNKNOWN
+
+
+@dataclass
+class EtherscanContract:
+    contract_name:  str
+    version:        Optional[str]           # e.g. 0.8.13, None if the compiler version is unknown
+    input_json:     dict                    # solc standard json input
+    address:        Optional[str] = None
+    implementation: Optional[str] = None    # implementation address of a proxy contract
+    path:           Optional[str] = None    # file the response was read from
+
+
+@dataclass
+class CorpusStats:
+    inputs:          int = 0    # parser requests
+    unique:          int = 0    # distinct inputs, each compiled once
+    duplicates:      int = 0    # requests served by the parser of an earlier identical input
+    failed:          int = 0    # distinct inputs which failed to compile
+    compile_seconds: float = 0  # time spent compiling distinct inputs
+    saved_seconds:   float = 0  # estimated time saved, the compile time of the shared input for each duplicate
+
+    def report(self) -> str:
+        return (f'{self.inputs} inputs, {self.unique} unique ({self.failed} failed), {self.duplicates} duplicates; '
+                f'compiled in {self.compile_seconds:.1f}s, saved about {self.saved_seconds:.1f}s')
@@ -0,0 +1,153 @@
+# Index of runtime bytecode fingerprints, to find the compiled contract a deployed code comes from.
+#
+# Deployed code differs from the compiled one in its metadata trailer, its immutable values and the addresses of
+# linked libraries. Immutables and library addresses are always PUSH32 / PUSH20 operands, so the lookup key is
+# the hash of the code without metadata and with all PUSH20 / PUSH32 operands zeroed. Candidates sharing a key are
+# then told apart by the hash of the code masked at exactly their own immutable and library ranges.
+
+import hashlib
+import json
+import dataclasses
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from . import ast_shared as s
+from . import opcodes
+from .fields import CodeFingerprint
+
+_MASKED_PUSH_WIDTHS = frozenset((20, 32))
+
+Code = Union[str, bytes]
+
+
+def _hash(code: bytes) -> str:
+    return hashlib.blake2b(code, digest_size=16).hexdigest()
+
+
+def _to_code(code: Code) -> bytes:
+    '''Runtime code as bytes without the metadata trailer, unlinked library placeholders are zeroed'''
+    if isinstance(code, str):
+        code = s.LINK_PLACEHOLDER_RE.sub('0' * 40, code)
+    code = opcodes.hex_to_bytes(code)
+    return code[:opcodes.metadata_start(code)]
+
+
+def _placeholder_ranges(code: str) -> List[Tuple[int, int]]:
+    '''`(start, length)` byte ranges of the unlinked library placeholders of a hex code'''
+    code = code[2:] if code[:2].lower() == '0x' else code
+    return [(m.start() // 2, 20) for m in s.LINK_PLACEHOLDER_RE.finditer(code)]
+
+
+def _masked(code: bytes, masks: Iterable[Tuple[int, int]]) -> bytearray:
+    out = bytearray(code)
+    for start, length in masks:
+        out[start: start + length] = bytes(len(out[start: start + length]))
+    return out
+
+
+def skeleton_hash(code: bytes) -> str:
+    '''Hash of a code (without metadata) with all PUSH20 and PUSH32 operands zeroed'''
+    dis = opcodes.disassemble(code, split_metadata=False)
+    masks = [(pc + 1, n) for pc, n in zip(dis.pcs, dis.operand_lengths) if n in _MASKED_PUSH_WIDTHS]
+    return _hash(bytes(_masked(code, masks)))
+
+
+def _ranges(references: Optional[dict]) -> List[Tuple[int, int]]:
+    # `immutableReferences`: {ast id: [{start, length}]}, `linkReferences`: {file: {library: [{start, length}]}}
+    out = []
+    for refs in (references or {}).values():
+        if isinstance(refs, dict):
+            out.extend(_ranges(refs))
+        else:
+            out.extend((r['start'], r['length']) for r in refs)
+    return out
+
+
+class FingerprintIndex():
+    def __init__(self, fingerprints: Iterable[CodeFingerprint] = ()) -> None:
+        self._by_skeleton: Dict[str, List[CodeFingerprint]] = {}
+        for fp in fingerprints:
+            self._by_skeleton.setdefault(fp.skeleton_hash, []).append(fp)
+
+    def __len__(self):
+        return sum(len(fps) for fps in self._by_skeleton.values())
+
+    def __iter__(self):
+        for fps in self._by_skeleton.values():
+            yield from fps
+
+    def add(self, code: Code, contract_name: str, filename: Optional[str] = None,
+            masks: Iterable[Tuple[int, int]] = (), source: Optional[str] = None) -> Optional[CodeFingerprint]:
+        '''
+        Add a compiled runtime code, `masks` are `(start, length)` byte ranges of immutables and library addresses.
+        Returns None for empty codes, e.g. interfaces and abstract contracts.
+        '''
+        code = _to_code(code)
+        if not code:
+            return None
+        masks = sorted(set(masks))
+        fp = CodeFingerprint(contract_name=contract_name, filename=filename, skeleton_hash=skeleton_hash(code),
+                             code_hash=_hash(bytes(_masked(code, masks))), masks=masks, source=source)
+        fps = self._by_skeleton.setdefault(fp.skeleton_hash, [])
+        if fp not in fps:
+            fps.append(fp)
+        return fp
+
+    def add_standard_output(self, output_json: dict, source: Optional[str] = None):
+        '''Add all contracts of a standard json output'''
+        for filename, contracts in (output_json.get('contracts') or {}).items():
+            for contract_name, contract in contracts.items():
+                bytecode = s.get_in(contract, 'evm', 'deployedBytecode') or {}
+                masks = _ranges(bytecode.get('immutableReferences')) + _ranges(bytecode.get('linkReferences'))
+                self.add(bytecode.get('object') or '', contract_name, filename, masks, source)
+
+    def add_combined_output(self, output: dict, source: Optional[str] = None):
+        '''
+        Add all contracts of a combined json output, with keys like `path/to/file.sol:Name`.
+        Library addresses are masked at their `__$...$__` placeholders. Combined json has no immutable references,
+        so contracts with immutables only match codes deployed with the same immutable values, usually none.
+        '''
+        for full_name, contract in output.items():
+            filename, _, contract_name = full_name.rpartition(':')
+            code = contract.get('bin-runtime') or ''
+            self.add(code, contract_name, filename or None, _placeholder_ranges(code), source)
+
+    def add_parser(self, parser, source: Optional[str] = None):
+        '''Add all contracts compiled by a `StandardJsonParser` or a `CombinedJsonParser`'''
+        if parser.is_standard_json:
+            self.add_standard_output(parser.output_json, source)
+        else:
+            self.add_combined_output(parser.original_compilation_output or {}, source)
+
+    def lookup(self, code: Code) -> List[CodeFingerprint]:
+        '''Get all compiled contracts matching a deployed runtime code'''
+        code = _to_code(code)
+        candidates = self._by_skeleton.get(skeleton_hash(code), [])
+        hashes: Dict[tuple, str] = {}
+        found = []
+        for fp in candidates:
+            key = tuple(fp.masks)
+            if key not in hashes:
+                hashes[key] = _hash(bytes(_masked(code, fp.masks)))
+            if hashes[key] == fp.code_hash:
+                found.append(fp)
+        return found
+
+    def resolve(self, code: Code) -> Optional[CodeFingerprint]:
+        '''Get the first compiled contract matching a deployed runtime code'''
+        return next(iter(self.lookup(code)), None)
+
+    def update(self, other: 'FingerprintIndex'):
+        for fp in other:
+            fps = self._by_skeleton.setdefault(fp.skeleton_hash, [])
+            if fp not in fps:
+                fps.append(fp)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump([dataclasses.asdict(fp) for fp in self], f)
+
+    @classmethod
+    def load(cls, path: str) -> 'FingerprintIndex':
+        with open(path, 'r') as f:
+            items = json.load(f)
+        return cls(CodeFingerprint(**{**item, 'masks': [tuple(m) for m in item['masks']]}) for item in items)
@@ -4,6 +4,8 @@
 import re
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
 
 def search_sol_in_lib_with_copying(cwd: str, file_name: str, lib_sol: str):
     if lib_sol.startswith('@'):
@@ -24,30 +26,39 @@ def search_sol_in_lib(cwd: str, lib_sol: str):
             return p
     return None
 
-def search_sol_by_filename(cwd, name, complete_sol, sols):
-    file_name = lambda p: p.split(os.path.sep)[-1]
+def strip_sol_prefix(fname: str) -> str:
+    # most of the filename has the format of `dd_dd_wwww.sol`
+    # but sometimes it can be `dd(d)_ddd_wwww.sol`, e.g. `101_155_ERC20.sol` or `10_155_ERC20.sol`
+
+    # find the position of second `_`
+    pos = fname.find('_', fname.find('_') + 1) + 1
+    return fname[pos:]
 
-    for f in sols:
-        fname = file_name(f)
-        # most of the filename has the format of `dd_dd_wwww.sol`
-        # but sometimes it can be `dd(d)_ddd_wwww.sol`, e.g. `101_155_ERC20.sol` or `10_155_ERC20.sol`
 
-        # find the position of second `_`
-        pos = fname.find('_', fname.find('_') + 1) + 1
+def build_filename_index(sols: Iterable[str]) -> Dict[str, str]:
+    '''
+    Index solidity files by file name and by file name without the `dd_dd_` prefix, the first file wins
+    '''
+    index: Dict[str, str] = {}
+    for f in sols:
+        fname = f.split(os.path.sep)[-1]
+        index.setdefault(fname, fname)
+        index.setdefault(strip_sol_prefix(fname), fname)
+    return index
 
-        if name in [fname, fname[pos:]]:
-            return fname
 
-    return search_sol_in_lib(cwd, complete_sol)
+def search_sol_by_filename(cwd, name, complete_sol, sols, index: Optional[Dict[str, str]] = None):
+    index = build_filename_index(sols) if index is None else index
+    return index.get(name) or search_sol_in_lib(cwd, complete_sol)
 
-def fix_import_line(f, line, sols):
+def fix_import_line(f, line, sols, index: Optional[Dict[str, str]] = None):
     # match = re.search(r'''['"].*/(\w+\.sol)['"];''', line)
     match = re.search(r'''["'](.*\.sol)["']''', line)
     cwd = os.path.dirname(f)
     if match:
         complete_sol = match.group(1)
         sol = complete_sol.split('/')[-1]
-        replacement = search_sol_by_filename(cwd, sol, complete_sol, sols)
+        replacement = search_sol_by_filename(cwd, sol, complete_sol, sols, index)
         if replacement:
             nline = f'import "./{replacement}";\n'
             # print(f'{line} -> {nline}')
@@ -56,24 +67,62 @@ def fix_import_line(f, line, sols):
     return line
 
 
-def fix_import(sol, sols):
+def fix_import(sol, sols, index: Optional[Dict[str, str]] = None, dry_run=False) -> Optional[str]:
+    '''
+    Fix the imports of a file, returns the rewritten content if anything changed.
+    The file is only written if `dry_run` is False.
+    '''
     lines = []
     with open(sol, 'r') as f:
         lines = list(f.readlines())
 
-    updated_lines = [fix_import_line(sol, line, sols) for line in lines]
-    if lines != updated_lines:
+    index = build_filename_index(sols) if index is None else index
+    updated_lines = [fix_import_line(sol, line, sols, index) for line in lines]
+    if lines == updated_lines:
+        return None
+
+    content = ''.join(updated_lines)
+    if not dry_run:
         with open(sol, 'w') as f:
-            f.write(''.join(updated_lines))
+            f.write(content)
+    return content
+
+
+def list_sols(root: str) -> List[str]:
+    return [os.path.join(root, f) for f in os.listdir(root) if f.endswith('.sol')]
+
+
+def fix_project(root: str, dry_run=False) -> Dict[str, str]:
+    '''
+    Fix imports of all solidity files in the `root` directory, returns the rewritten content of changed files by path
+    '''
+    sols = list_sols(root)
+    index = build_filename_index(sols)
+    out = {}
+    for f in sols:
+        content = fix_import(f, sols, index, dry_run)
+        if content is not None:
+            out[f] = content
+    return out
+
+
+def fix_projects(roots: Iterable[str], dry_run=False, max_workers: Optional[int] = None) -> Dict[str, Dict[str, str]]:
+    '''
+    Fix many project roots concurrently with a thread pool, returns the result of `fix_project` by root
+    '''
+    roots = list(roots)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(roots, executor.map(lambda root: fix_project(root, dry_run), roots)))
 
 
 
 if __name__ == '__main__':
     import argparse
     ap = argparse.ArgumentParser()
-    ap.add_argument("--root", type=str, help="Root directory of a single solidity project")
+    ap.add_argument("--root", type=str, action='append', required=True,
+                    help="Root directory of a single solidity project, can be repeated")
+    ap.add_argument("--dry-run", action='store_true', help="Print the files to be changed without writing them")
     args = ap.parse_args()
-    root = args.root
-    sols =  [os.path.join(root, f) for f in os.listdir(root) if f.endswith('.sol')]
-    for f in sols:
-        fix_import(f, sols)
+    for root, changed in fix_projects(args.root, dry_run=args.dry_run).items():
+        for f in changed:
+            print(f)
@@ -1,8 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from dataclasses import asdict
-from typing import List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+import bisect
 import os
-from pathlib import Path
+import threading
 from os.path import abspath
 from functools import cache
 import argparse
@@ -44,12 +47,300 @@ def replace_pragma(seen_meta, prag, head, tail=None) -> Optional[str]:
 get_file_name = lambda p: p.split(os.path.sep)[-1]
 quotes = '"\'' # solidity quote characters
 
+
+def split_lines(text: str) -> List[str]:
+    '''Split like iterating over a text file: on `\\n` only, keeping line breaks'''
+    parts = text.split('\n')
+    lines = [p + '\n' for p in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return lines
+
+
+def parse_imports(lines: Iterable[str]) -> List[str]:
+    '''Paths of the import statements of a solidity file as written, in import order'''
+    out = []
+    pending = False
+    for line in lines:
+        if pending:
+            if any(c in line for c in quotes):
+                out.append(re.split(r'[\'"]', line)[-2].strip(quotes))
+                pending = False
+            continue
+        segs = line.strip().split(maxsplit=1)
+        if not (segs and segs[0] == 'import'):
+            continue
+        if '{' in segs[1]:
+            if '"' in line:
+                out.append(line.split('"')[-2].strip('"'))
+            else:
+                # the path follows on another line
+                pending = True
+        else:
+            quote = segs[1][0]
+            out.append(segs[1][:-1].strip(quote))
+    return out
+
+
+class SourceFileCache():
+    '''
+    Import resolution and file contents cache which can be shared by many `FlattenSolidity` runs, also across threads.
+
+    Contents are re-read when the modification time or the size of a file changes. Existence checks and resolved
+    import paths are kept until `clear` is called, since files of a project are not expected to appear or vanish
+    while it is being flattened.
+    '''
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._is_file: Dict[str, bool] = {}
+        self._resolved: Dict[Tuple[str, str], Optional[str]] = {}
+        self._lines: Dict[str, Tuple[int, int, List[str]]] = {}
+        self._line_starts: Dict[str, Tuple[int, int, array]] = {}
+        self._imports: Dict[str, Tuple[int, int, List[str]]] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._is_file.clear()
+            self._resolved.clear()
+            self._lines.clear()
+            self._line_starts.clear()
+            self._imports.clear()
+
+    def is_file(self, path: str) -> bool:
+        found = self._is_file.get(path)
+        if found is None:
+            found = os.path.isfile(path)
+            with self._lock:
+                self._is_file[path] = found
+        return found
+
+    def resolve(self, path: str, include_paths: Iterable[str]) -> Optional[str]:
+        '''
+        Path of an imported file, the last include path containing it wins over the path itself.
+        Returns None if the import cannot be found.
+        '''
+        found = path if self.is_file(path) else None
+        for include_path in include_paths:
+            key = (include_path, path)
+            resolved = self._resolved.get(key, '')
+            if resolved == '':
+                candidate = include_path + '/' + path
+                resolved = candidate if self.is_file(candidate) else None
+                with self._lock:
+                    self._resolved[key] = resolved
+            found = resolved or found
+        return found
+
+    def _load(self, cache: dict, path: str, loader):
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        cached = cache.get(key)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        value = loader(key)
+        with self._lock:
+            cache[key] = (st.st_mtime_ns, st.st_size, value)
+        return value
+
+    def lines(self, path: str) -> List[str]:
+        '''Lines of a file with line breaks, do not modify the returned list'''
+        def load(key):
+            with open(key, 'r') as f:
+                return split_lines(f.read())
+        return self._load(self._lines, path, load)
+
+    def imports(self, path: str) -> List[str]:
+        '''Import paths of a file as written, do not modify the returned list'''
+        return self._load(self._imports, path, lambda key: parse_imports(self.lines(key)))
+
+    def line_starts(self, path: str) -> array:
+        '''Byte offsets of the lines of a file, followed by the file size'''
+        def load(key):
+            with open(key, 'rb') as f:
+                content = f.read()
+            starts = array('I', [0])
+            i = content.find(b'\n')
+            while i >= 0:
+                starts.append(i + 1)
+                i = content.find(b'\n', i + 1)
+            if starts[-1] != len(content):
+                starts.append(len(content))
+            return starts
+        return self._load(self._line_starts, path, load)
+
+
+@dataclass
+class ImportGraph():
+    '''
+    Import dependencies of a solidity file, keyed by absolute paths.
+    `imports` keeps the imported files of each file in import order, `stamps` the `(mtime_ns, size)` of each file
+    when the graph was built, for change detection.
+    '''
+    root:     str
+    imports:  Dict[str, List[str]] = field(default_factory=dict)
+    resolved: Dict[Tuple[str, str], str] = field(default_factory=dict)  # (file, import path as written) -> file
+    stamps:   Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+    def topological_order(self) -> List[str]:
+        '''All files with dependencies before the files importing them, import cycles are cut at the back edge'''
+        out: List[str] = []
+        done: Set[str] = set()
+        to_visit = [(self.root, False)]
+        while to_visit:
+            path, expanded = to_visit.pop()
+            if expanded:
+                out.append(path)
+                continue
+            if path in done:
+                continue
+            done.add(path)
+            to_visit.append((path, True))
+            to_visit.extend((p, False) for p in reversed(self.imports.get(path, [])) if p not in done)
+        return out
+
+    def dependents(self, paths: Iterable[str]) -> Set[str]:
+        '''Given files and all files importing them directly or indirectly'''
+        importers: Dict[str, List[str]] = {}
+        for path, imported in self.imports.items():
+            for p in imported:
+                importers.setdefault(p, []).append(path)
+        out = {abspath(p) for p in paths}
+        to_visit = list(out)
+        while to_visit:
+            for importer in importers.get(to_visit.pop(), []):
+                if importer not in out:
+                    out.add(importer)
+                    to_visit.append(importer)
+        return out
+
+    def changed_files(self) -> List[str]:
+        '''Files modified or removed since the graph was built'''
+        out = []
+        for path, stamp in self.stamps.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                out.append(path)
+                continue
+            if (st.st_mtime_ns, st.st_size) != stamp:
+                out.append(path)
+        return out
+
+
+def _read_imports(file_cache: 'SourceFileCache', path: str) -> Tuple[List[str], Tuple[int, int]]:
+    st = os.stat(path)
+    return file_cache.imports(path), (st.st_mtime_ns, st.st_size)
+
+
+def build_import_graph(file_path: str, include_paths: Optional[List[str]] = None,
+                       file_cache: Optional['SourceFileCache'] = None, max_workers: Optional[int] = None) -> ImportGraph:
+    '''
+    Resolve the imports of a solidity file transitively, reading each level of the graph concurrently.
+    An import is searched in the working directory, then the include paths, the directory of the root file and
+    the directory of the importing file, the last match wins.
+    '''
+    file_cache = file_cache or SourceFileCache()
+    include_paths = include_paths or []
+    if not file_cache.is_file(file_path):
+        raise FlattenError(f'Target is not a file: {file_path}')
+
+    root = abspath(file_path)
+    root_dir = os.path.dirname(root)
+    graph = ImportGraph(root=root)
+    frontier = [root]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while frontier:
+            for path, (imported, stamp) in zip(frontier, executor.map(lambda p: _read_imports(file_cache, p), frontier)):
+                if not path.lower().endswith('.sol'):
+                    raise FlattenError(f'Only solidity file is allowed: {path}')
+                graph.stamps[path] = stamp
+                graph.imports[path] = []
+                search_paths = include_paths + [root_dir, os.path.dirname(path)]
+                for import_path in imported:
+                    found = file_cache.resolve(import_path, search_paths)
+                    if found is None:
+                        raise FlattenError(f'Cannot find import file: {import_path}')
+                    found = abspath(found)
+                    graph.resolved[(path, import_path)] = found
+                    graph.imports[path].append(found)
+            frontier = list(dict.fromkeys(p for path in frontier for p in graph.imports[path] if p not in graph.imports))
+    return graph
+
+
+@dataclass
+class FlattenOffsetMap():
+    '''
+    Byte offset intervals of a flattened source, one per flattened line, mapping to the original files.
+    Offsets are byte offsets as in solc `src` fields, line numbers are zero-based.
+    '''
+    paths:          List[str]                                        # original file paths
+    target_starts:  array = field(default_factory=lambda: array('I'))  # byte offset of the line in the flattened source
+    path_ids:       array = field(default_factory=lambda: array('I'))  # index into `paths`
+    source_starts:  array = field(default_factory=lambda: array('I'))  # byte offset of the line in the original file
+    source_lengths: array = field(default_factory=lambda: array('I'))  # byte length of the line in the original file
+    line_nums:      array = field(default_factory=lambda: array('I'))  # line number in the original file
+    prefixes:       bytearray = field(default_factory=bytearray)     # bytes prepended to the original line, e.g. `// `
+
+    def _translate_line(self, i: int, offset: int) -> Tuple[str, int, int]:
+        delta = min(max(offset - self.target_starts[i] - self.prefixes[i], 0), self.source_lengths[i])
+        return self.paths[self.path_ids[i]], self.source_starts[i] + delta, self.line_nums[i]
+
+    def translate(self, offset: int) -> Tuple[str, int, int]:
+        '''Map a byte offset of the flattened source to `(original path, byte offset, line number)`'''
+        i = max(bisect.bisect_right(self.target_starts, offset) - 1, 0)
+        return self._translate_line(i, offset)
+
+    def translate_many(self, offsets: Iterable[int]) -> Dict[int, Tuple[str, int, int]]:
+        '''Translate many offsets with a single sweep over the sorted offsets'''
+        out = {}
+        starts = self.target_starts
+        i, n = 0, len(starts)
+        for offset in sorted(set(offsets)):
+            while i + 1 < n and starts[i + 1] <= offset:
+                i += 1
+            out[offset] = self._translate_line(i, offset)
+        return out
+
+    def translate_results(self, results: Iterable[Optional[dict]]) -> List[Optional[dict]]:
+        '''
+        Translate `source_by_pc` results of a compiled flattened source, `begin`, `end`, `linenums` and `source_path`
+        are replaced by their positions in the original files. Results spanning several original files are
+        cut at the end of the file containing `begin`.
+        '''
+        results = list(results)
+        offsets = []
+        for r in results:
+            if r is not None:
+                offsets.append(r['begin'])
+                offsets.append(max(r['end'] - 1, r['begin']))
+        translated = self.translate_many(offsets)
+
+        out: List[Optional[dict]] = []
+        for r in results:
+            if r is None:
+                out.append(None)
+                continue
+            path, begin, line_start = translated[r['begin']]
+            end_path, last, line_end = translated[max(r['end'] - 1, r['begin'])]
+            if end_path != path:
+                last, line_end = begin, line_start
+            end = last + 1 if r['end'] > r['begin'] else begin
+            # match `source_by_pc`, which counts the line following a trailing line break
+            line_end += (r.get('fragment') or '').endswith('\n')
+            out.append({**r, 'begin': begin, 'end': end, 'linenums': [line_start + 1, line_end + 1], 'source_path': path})
+        return out
+
+
 class FlattenSolidity():
-    def __init__(self, file_path: str, include_paths: List[str] = []) -> None:
+    def __init__(self, file_path: str, include_paths: List[str] = [], file_cache: Optional[SourceFileCache] = None,
+                 max_workers: Optional[int] = None) -> None:
         self.file_path = file_path
         self.seen = set()
         self.seen_meta = set()
         self.include_paths = include_paths or []
+        # pass the same cache to flatten many files sharing dependencies
+        self.file_cache = file_cache or SourceFileCache()
+        self.max_workers = max_workers
         self.targetLineNum = 0
         self.content = []
         self.isImport = False
@@ -60,18 +351,11 @@ class FlattenSolidity():
                 return True
         return False
 
-    def searchAndFlatten(self, path):
-        found_import = False
-        if os.path.isfile(path):
-            found_import = True
-        for include_path in self.include_paths:
-            if os.path.isfile(include_path+'/'+path):
-                path = include_path + '/' + path
-                found_import = True
-        if not found_import:
+    def searchAndFlatten(self, path, importer):
+        found = self.import_graph().resolved.get((abspath(importer), path))
+        if found is None:
             raise FlattenError(f'Cannot find import file: {path}')
-        # path = abspath(os.path.join(Path(file_path).parent, path))
-        self.flatten(path)
+        self.flatten(found)
 
     def appendFlattenLine(self, path, filename, srcLineNum, srcLine, targetLine):
         fline = FlattenLine(path, filename, srcLineNum, srcLine, self.targetLineNum, targetLine)
@@ -87,10 +371,9 @@ class FlattenSolidity():
         if not self.hasQuote(line):
             return True
         else:
-            # path = line.split('"')[-2].strip('"')
-            path = re.split(r'[\'"]', line)[-2].strip(quotes)
+            import_path = re.split(r'[\'"]', line)[-2].strip(quotes)
             self.isImport = False
-            self.searchAndFlatten(path)
+            self.searchAndFlatten(import_path, path)
             return True
 
     def handleImport(self, line, path, filename, linenum) -> bool:
@@ -100,8 +383,8 @@ class FlattenSolidity():
 
         if '{' in segs[1]:
             if '"' in line:
-                path = line.split('"')[-2].strip('"')
-                self.searchAndFlatten(path)
+                import_path = line.split('"')[-2].strip('"')
+                self.searchAndFlatten(import_path, path)
                 return True
             else:
                 self.isImport = True
@@ -109,9 +392,9 @@ class FlattenSolidity():
                 return True
         else:
             quote = segs[1][0]
-            path = segs[1][:-1].strip(quote)
+            import_path = segs[1][:-1].strip(quote)
             self.appendFlattenLine(abspath(path), filename, linenum, line, f"// {line}")
-            self.searchAndFlatten(path)
+            self.searchAndFlatten(import_path, path)
             return True
 
     def handleLine(self, line, path, filename, linenum) -> bool:
@@ -138,32 +421,38 @@ class FlattenSolidity():
         Note all line numbers here are zero-based
         '''
         seen = self.seen
-        include_paths = self.include_paths
-
-        file_name = get_file_name(os.path.abspath(file_path))
+        file_path = abspath(file_path)
+        file_name = get_file_name(file_path)
 
-        if file_name in seen:
+        # files are identified by absolute paths, same named files at different places are different files
+        if file_path in seen:
             return
 
-        if not os.path.isfile(file_path):
+        if not self.file_cache.is_file(file_path):
             raise FlattenError(f'Target is not a file: {file_path}')
 
         if not file_path.lower().endswith('.sol'):
             raise FlattenError(f'Only solidity file is allowed: {file_path}')
-        include_paths.append(abspath(os.path.join(Path(file_path).parent)))
-        # NOTE here we assume same file name at different places on the file system represent the same file
-        seen.add(file_name)
+        seen.add(file_path)
 
-        with open(file_path, 'r') as f:
-            for linenum, line in enumerate(f):
-                args = [line, file_path, file_name, linenum]
-                _ = self.handlePendingImport(*args) or self.handleImport(*args) or self.handleLine(*args)
+        for linenum, line in enumerate(self.file_cache.lines(file_path)):
+            args = [line, file_path, file_name, linenum]
+            _ = self.handlePendingImport(*args) or self.handleImport(*args) or self.handleLine(*args)
+
+    @cache
+    def import_graph(self) -> ImportGraph:
+        '''
+        Import dependency graph of the flattened file
+        '''
+        return build_import_graph(self.file_path, self.include_paths, self.file_cache, self.max_workers)
 
     @cache
     def flatten_result(self) -> FlattenSourceResult:
         '''
         Flattened lines containing line number and file paths mapping information between input and output lines
         '''
+        # resolve and read all files first, each imported file is then inlined at its first import
+        self.import_graph()
         self.flatten(self.file_path)
         return self.content
 
@@ -174,12 +463,55 @@ class FlattenSolidity():
         '''
         return ''.join(c.targetLine for c in self.flatten_result())
 
+    @cache
+    def offset_map(self) -> FlattenOffsetMap:
+        '''
+        Byte offset mapping from the flattened source code back to the original files
+        '''
+        out = FlattenOffsetMap(paths=[])
+        path_ids: Dict[str, int] = {}
+        target_start = 0
+        for fl in self.flatten_result():
+            path_id = path_ids.get(fl.path)
+            if path_id is None:
+                path_id = path_ids[fl.path] = len(out.paths)
+                out.paths.append(fl.path)
+            starts = self.file_cache.line_starts(fl.path)
+            source_start = starts[fl.sourceLineNum]
+            out.target_starts.append(target_start)
+            out.path_ids.append(path_id)
+            out.source_starts.append(source_start)
+            out.source_lengths.append(starts[fl.sourceLineNum + 1] - source_start)
+            out.line_nums.append(fl.sourceLineNum)
+            # commented out import lines
+            out.prefixes.append(3 if fl.targetLine == f'// {fl.sourceLine}' else 0)
+            target_start += len(fl.targetLine.encode())
+        return out
+
     def reverse_line_lookup(self, linenum) -> FlattenLine:
         '''
         Given a line number in the flattend source code, returns the file path and the line number this line is from
         '''
         return self.flatten_result()[linenum]
 
+def _flatten_one(file_path: str, include_paths: List[str], file_cache: SourceFileCache) -> FlattenSolidity:
+    fs = FlattenSolidity(file_path, include_paths=list(include_paths), file_cache=file_cache)
+    fs.flatten_result()
+    return fs
+
+
+def flatten_many(file_paths: Iterable[str], include_paths: Optional[List[str]] = None,
+                 max_workers: Optional[int] = None, file_cache: Optional[SourceFileCache] = None) -> List[FlattenSolidity]:
+    '''
+    Flatten many entry files with a thread pool of `max_workers` threads, sharing one `SourceFileCache` so that
+    common dependencies are only resolved and read once. Returns flattened `FlattenSolidity` objects in the input order.
+    '''
+    file_cache = file_cache or SourceFileCache()
+    include_paths = include_paths or []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda p: _flatten_one(p, include_paths, file_cache), file_paths))
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--path', type=str, help='The main contract to be flattened', required=True)
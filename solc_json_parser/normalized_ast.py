@@ -0,0 +1,154 @@
+# Version independent representation of solc ASTs.
+#
+# Legacy ASTs (solc v4 - v7 combined json) keep node attributes in `attributes` and child nodes in an ordered
+# `children` list, while v8 / standard json ASTs keep both in the node itself, with child nodes under named keys.
+# `normalize_ast` converts either dialect into `AstNode`s once, so that queries do not need to check the
+# dialect or split `src` strings again:
+#
+# - `node_type`: `nodeType` (v8) or `name` (legacy) of the node
+# - `src`: pre-parsed `(start, length, source index)` tuple
+# - `attributes`: non-node values of the node, with a few dialect differences normalized:
+#   - `type`: `typeDescriptions.typeString` (v8) or `attributes.type` (legacy)
+#   - `hexValue` and `token` of `Literal` nodes, from `hexvalue` / `token` (legacy) or `hexValue` / `kind` (v8)
+#   - `abstract` of legacy `ContractDefinition` nodes, computed from `fullyImplemented`
+#   - `baseContracts` of `ContractDefinition` nodes, as a list of referenced contract ids
+#   - `modifier` of `ModifierInvocation` nodes, the name of the invoked modifier
+# - `children`: child nodes in the order they appear in the json
+# - `raw`: the original json node
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+Src = Tuple[int, int, int]
+
+
+def parse_src(src: Optional[str]) -> Optional[Src]:
+    '''Parse `start:length:source_index` to a tuple of integers'''
+    if not src:
+        return None
+    start, length, fidx = src.split(':')[:3]
+    return int(start), int(length), int(fidx)
+
+
+class AstNode():
+    __slots__ = ('node_type', 'id', 'src', 'attributes', 'children', 'raw')
+
+    def __init__(self, node_type: str, node_id: Optional[int], src: Optional[Src], attributes: Dict[str, Any], raw: dict):
+        self.node_type = node_type
+        self.id = node_id
+        self.src = src
+        self.attributes = attributes
+        self.children: List['AstNode'] = []
+        self.raw = raw
+
+    def __repr__(self):
+        return f'AstNode({self.node_type}, id={self.id}, src={self.src})'
+
+    def get(self, key: str, default: Any = None) -> Any:
+        '''Get a normalized attribute'''
+        return self.attributes.get(key, default)
+
+    def children_by_type(self, node_type: str) -> List['AstNode']:
+        return [c for c in self.children if c.node_type == node_type]
+
+    def walk(self) -> Iterator['AstNode']:
+        '''Iterate over this node and all its descendants, breadth first'''
+        to_visit = [self]
+        i = 0
+        while i < len(to_visit):
+            node = to_visit[i]
+            i += 1
+            yield node
+            to_visit.extend(node.children)
+
+    def contains(self, begin: int, end: int, fidx: Optional[int] = None) -> bool:
+        '''Whether the source range of this node contains `[begin, end]`'''
+        if self.src is None:
+            return False
+        start, length, node_fidx = self.src
+        return start <= begin and start + length >= end and (fidx is None or fidx == node_fidx)
+
+
+def _is_node(value: Any, name_key: str) -> bool:
+    return isinstance(value, dict) and name_key in value
+
+
+def _base_contract_ids(base_contracts: list) -> List[int]:
+    # `[null]` is used in json when there is no base contract
+    return [bc['baseName']['referencedDeclaration'] for bc in base_contracts if bc is not None]
+
+
+def _v8_attributes(raw: dict) -> Dict[str, Any]:
+    attributes = {}
+    for k, v in raw.items():
+        if isinstance(v, dict):
+            if 'nodeType' not in v:
+                attributes[k] = v
+        elif isinstance(v, list):
+            if not any(_is_node(c, 'nodeType') for c in v):
+                attributes[k] = v
+        else:
+            attributes[k] = v
+
+    type_descriptions = raw.get('typeDescriptions')
+    if type_descriptions:
+        attributes['type'] = type_descriptions.get('typeString')
+
+    node_type = raw['nodeType']
+    if node_type == 'Literal':
+        attributes['token'] = raw.get('kind')
+    elif node_type == 'ContractDefinition' and raw.get('baseContracts') is not None:
+        attributes['baseContracts'] = _base_contract_ids(raw['baseContracts'])
+    elif node_type == 'ModifierInvocation':
+        attributes['modifier'] = (raw.get('modifierName') or {}).get('name')
+    return attributes
+
+
+def _legacy_attributes(raw: dict) -> Dict[str, Any]:
+    attributes = dict(raw.get('attributes') or {})
+    node_type = raw['name']
+    if node_type == 'Literal':
+        attributes['hexValue'] = attributes.pop('hexvalue', None)
+    elif node_type == 'ContractDefinition':
+        attributes['abstract'] = not attributes.get('fullyImplemented')
+        if attributes.get('baseContracts') is not None:
+            attributes['baseContracts'] = _base_contract_ids(attributes['baseContracts'])
+    elif node_type == 'ModifierInvocation':
+        # base constructor calls are ModifierInvocation nodes too, only keep real modifiers
+        name_node = (raw.get('children') or [{}])[0] or {}
+        name_attributes = name_node.get('attributes') or {}
+        if name_attributes.get('type') == 'modifier ()':
+            attributes['modifier'] = name_attributes.get('value')
+    return attributes
+
+
+def normalize_ast(root: dict, v8: bool) -> AstNode:
+    '''Convert a legacy or v8 AST into `AstNode`s in one iterative pass'''
+    name_key = 'nodeType' if v8 else 'name'
+    get_attributes = _v8_attributes if v8 else _legacy_attributes
+
+    out = None
+    to_visit: List[Tuple[dict, Optional[AstNode]]] = [(root, None)]
+    while to_visit:
+        raw, parent = to_visit.pop()
+        node = AstNode(raw[name_key], raw.get('id'), parse_src(raw.get('src')), get_attributes(raw), raw)
+        if parent is None:
+            out = node
+        else:
+            parent.children.append(node)
+
+        if v8:
+            children = []
+            for v in raw.values():
+                if isinstance(v, dict):
+                    if 'nodeType' in v:
+                        children.append(v)
+                elif isinstance(v, list):
+                    children.extend(c for c in v if _is_node(c, 'nodeType'))
+        else:
+            children = [c for c in raw.get('children') or [] if _is_node(c, 'name')]
+
+        # pushed in reverse order so that children are appended in json order
+        to_visit.extend((c, node) for c in reversed(children))
+
+    assert out is not None
+    return out
@@ -1,4 +1,6 @@
-from typing import Dict
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 name_to_byte: Dict[str, int] = dict(
     #
@@ -203,30 +205,348 @@ name_to_byte: Dict[str, int] = dict(
 
 byte_to_name: Dict[int, str] = {v : k for k, v in name_to_byte.items()}
 
-# convert and print 0x60606040526000357c010 to human readable opcodes
-def decode_and_print(binary_hex):
-    if binary_hex[:2].lower() == '0x':
-        binary_hex = binary_hex[2:]
+# number of immediate data bytes following each of the 256 byte values, 0 for non-push and unknown opcodes
+push_width: bytes = bytes(int(byte_to_name[b][4:]) if byte_to_name.get(b, '').startswith('PUSH') else 0 for b in range(256))
+
+# keys of the CBOR map appended by solc to the end of the runtime code
+METADATA_KEYS = (b'ipfs', b'bzzr0', b'bzzr1', b'solc', b'experimental')
+# the metadata trailer length is stored in 2 bytes, so it always starts within the last 0xffff + 2 bytes
+MAX_METADATA_SIZE = 0xffff + 2
+
+
+def hex_to_bytes(binary: Union[str, bytes]) -> bytes:
+    '''Convert a hex string, with or without 0x, to bytes. Raw bytes are returned as is'''
+    if isinstance(binary, (bytes, bytearray, memoryview)):
+        return bytes(binary)
+    binary = binary.strip()
+    if binary[:2].lower() == '0x':
+        binary = binary[2:]
+    # a trailing half byte is ignored
+    return bytes.fromhex(binary[:len(binary) & ~1])
+
+
+def metadata_start(code: bytes) -> int:
+    '''
+    Get the offset of the CBOR metadata trailer of a runtime code, or `len(code)` if there is none.
+    The trailer is a CBOR map followed by its length as a 2-byte big endian integer.
+    '''
+    if len(code) < 2:
+        return len(code)
+    start = len(code) - 2 - int.from_bytes(code[-2:], 'big')
+    # a map header, followed by a text string key
+    if start < 0 or not 0xa1 <= code[start] <= 0xb7 or start + 1 >= len(code) or not 0x60 <= code[start + 1] <= 0x77:
+        return len(code)
+    key_length = code[start + 1] - 0x60
+    if bytes(code[start + 2: start + 2 + key_length]) not in METADATA_KEYS:
+        return len(code)
+    return start
+
+
+@dataclass
+class Disassembly:
+    '''
+    Instructions of a code as parallel arrays: instruction `i` is at `pcs[i]`, its opcode is `opcodes[i]`
+    and its operand is the `operand_lengths[i]` bytes following the opcode.
+    `code` holds the bytes of these instructions, starting from `base_pc`.
+    '''
+    pcs: array = field(default_factory=lambda: array('I'))
+    opcodes: bytearray = field(default_factory=bytearray)
+    operand_lengths: bytearray = field(default_factory=bytearray)
+    code: bytes = b''
+    base_pc: int = 0
+    metadata: bytes = b''
+
+    def __len__(self):
+        return len(self.pcs)
+
+    def operand(self, i: int) -> bytes:
+        start = self.pcs[i] + 1 - self.base_pc
+        return self.code[start: start + self.operand_lengths[i]]
+
+    def __iter__(self) -> Iterator[Tuple[int, int, bytes]]:
+        '''Iterate over `(pc, opcode, operand)` of instructions'''
+        for i in range(len(self.pcs)):
+            yield self.pcs[i], self.opcodes[i], self.operand(i)
+
+
+def _disassemble_range(code: bytes, start: int, end: int, limit: int, base_pc: int, out: Disassembly) -> int:
+    # decode instructions starting in [start, end), operands are cut at `limit`
+    # returns the offset of the first instruction not decoded
+    pcs, ops, operand_lengths = out.pcs, out.opcodes, out.operand_lengths
+    widths = push_width
+    i = start
+    while i < end:
+        op = code[i]
+        width = widths[op]
+        pcs.append(base_pc + i)
+        ops.append(op)
+        if width and i + 1 + width > limit:
+            width = limit - i - 1
+        operand_lengths.append(width)
+        i += 1 + width
+    return i
+
+
+def disassemble(code: bytes, split_metadata: bool = True) -> Disassembly:
+    '''
+    Disassemble a code into parallel arrays of pcs, opcodes and operand lengths.
+    When `split_metadata` is set, the CBOR metadata trailer is not disassembled but returned in `metadata`.
+    '''
+    code = bytes(code)
+    end = metadata_start(code) if split_metadata else len(code)
+    out = Disassembly(code=code[:end], metadata=code[end:])
+    _disassemble_range(code, 0, end, end, 0, out)
+    return out
+
+
+def disassemble_stream(chunks: Iterable[bytes], split_metadata: bool = True) -> Iterator[Disassembly]:
+    '''
+    Disassemble a code given as consecutive chunks, yields one `Disassembly` per chunk with absolute pcs.
+    Up to `MAX_METADATA_SIZE` bytes are held back, so the metadata trailer is only known in the last block.
+    '''
+    holdback = MAX_METADATA_SIZE + 33 if split_metadata else 33
+    buffer = b''
+    base_pc = 0
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) <= holdback:
+            continue
+        out = Disassembly(base_pc=base_pc)
+        # no operand can reach into the held back bytes
+        consumed = _disassemble_range(buffer, 0, len(buffer) - holdback, len(buffer), base_pc, out)
+        out.code = buffer[:consumed]
+        buffer = buffer[consumed:]
+        base_pc += consumed
+        if len(out):
+            yield out
+
+    end = metadata_start(buffer) if split_metadata else len(buffer)
+    out = Disassembly(code=buffer[:end], base_pc=base_pc, metadata=buffer[end:])
+    _disassemble_range(buffer, 0, end, end, base_pc, out)
+    yield out
+
+
+@dataclass
+class CodeBitmap:
+    '''
+    Bitmaps over the byte offsets of a code, bit `i` is `bitmap[i >> 3] >> (i & 7) & 1`:
+    - `instruction_starts`: offsets where an instruction starts, i.e. not inside PUSH data
+    - `jumpdests`: offsets of valid jump destinations, i.e. JUMPDEST instructions
+    '''
+    size: int
+    instruction_starts: bytearray
+    jumpdests: bytearray
+
+    def is_instruction_start(self, offset: int) -> bool:
+        return 0 <= offset < self.size and bool(self.instruction_starts[offset >> 3] >> (offset & 7) & 1)
+
+    def is_jumpdest(self, offset: int) -> bool:
+        return 0 <= offset < self.size and bool(self.jumpdests[offset >> 3] >> (offset & 7) & 1)
+
+    def instruction_start(self, offset: int) -> int:
+        '''Start of the instruction containing a byte offset'''
+        if not 0 <= offset < self.size:
+            raise ValueError(f'Offset {offset} is outside the code of size {self.size}')
+        # PUSH data is at most 32 bytes
+        while not self.is_instruction_start(offset):
+            offset -= 1
+        return offset
+
+
+def code_bitmap(code: bytes) -> CodeBitmap:
+    '''Build instruction start and JUMPDEST bitmaps of a code in one linear scan'''
+    size = len(code)
+    starts = bytearray((size + 7) >> 3)
+    jumpdests = bytearray((size + 7) >> 3)
+    widths = push_width
+    jumpdest = name_to_byte['JUMPDEST']
     i = 0
-    while i < len(binary_hex):
-        offset = i + 2
-        opcode = int(binary_hex[i:i+2], 16)
-        opcode_name = byte_to_name.get(opcode)
-        if opcode_name is None:
-            # raise ValueError(f"Unknown opcode: {opcode:02x}, from: {opcodes[i:]}")
-            print(f"0x{opcode:02x}".upper())
+    while i < size:
+        op = code[i]
+        starts[i >> 3] |= 1 << (i & 7)
+        if op == jumpdest:
+            jumpdests[i >> 3] |= 1 << (i & 7)
+        i += 1 + widths[op]
+    return CodeBitmap(size, starts, jumpdests)
+
+
+def format_instruction(opcode: int, operand: bytes) -> str:
+    opcode_name = byte_to_name.get(opcode)
+    if opcode_name is None:
+        return f"0x{opcode:02x}".upper()
+    if push_width[opcode]:
+        return f"{opcode_name} 0x{operand.hex()}"
+    return opcode_name
+
+
+# convert and print 0x60606040526000357c010 to human readable opcodes
+def decode_and_print(binary_hex, split_metadata=True):
+    dis = disassemble(hex_to_bytes(binary_hex), split_metadata)
+    lines = [format_instruction(op, operand) for _, op, operand in dis]
+    if dis.metadata:
+        lines.append(f"METADATA 0x{dis.metadata.hex()}")
+    print('\n'.join(lines))
+
+
+# an instruction to assemble: `"PUSH1 0x80"`, `"loop:"`, an opcode name or byte, or an `(opcode, operand)` tuple
+# where the operand is an int, bytes, a hex or decimal string or a label name
+Instruction = Union[str, int, Tuple[Union[str, int], Union[None, int, bytes, str]]]
+Operand = Union[None, int, bytes, str]
+
+
+def _opcode_byte(name: Union[str, int]) -> int:
+    if isinstance(name, int):
+        if not 0 <= name <= 0xff:
+            raise ValueError(f"Invalid opcode: {name}")
+        return name
+    op = name_to_byte.get(name.upper())
+    if op is None:
+        # unknown opcodes are printed as their hex value by `format_instruction`
+        if name[:2].lower() == '0x' and len(name) == 4:
+            return int(name, 16)
+        raise ValueError(f"Unknown opcode: {name}")
+    return op
+
+
+def _parse_operand(operand: Operand) -> Operand:
+    if isinstance(operand, str) and operand[:2].lower() == '0x':
+        return bytes.fromhex(operand[2:])
+    if isinstance(operand, str) and operand.isdigit():
+        return int(operand)
+    return operand
+
+
+def _parse_instructions(instructions: Iterable[Instruction]) -> List[Tuple[str, Optional[int], Operand]]:
+    # normalize to (kind, opcode, operand) with kind in op / push / label / raw, opcode is None for
+    # a PUSH whose width is chosen from the operand
+    items = []
+    for ins in instructions:
+        if isinstance(ins, str):
+            parts = ins.split()
+            if not parts:
+                continue
+            if len(parts) == 1 and parts[0].endswith(':'):
+                items.append(('label', None, parts[0][:-1]))
+                continue
+            if parts[0] == 'METADATA':
+                items.append(('raw', None, bytes.fromhex(parts[1][2:])))
+                continue
+            name, operand = parts[0], _parse_operand(parts[1]) if len(parts) > 1 else None
+        elif isinstance(ins, int):
+            name, operand = ins, None
+        else:
+            name, operand = ins[0], _parse_operand(ins[1])
+
+        if isinstance(name, str) and name.upper() == 'PUSH':
+            items.append(('push', None, operand))
+            continue
+        op = _opcode_byte(name)
+        if push_width[op]:
+            items.append(('push', op, operand))
+        elif operand is not None and operand != b'':
+            raise ValueError(f"Unexpected operand for {name}: {operand}")
         else:
-            if opcode_name.startswith('PUSH'):
-                length = int(opcode_name[4:])
-                offset += length*2
-                if length > 0:
-                    print(f"{opcode_name} 0x{binary_hex[i+2:offset]}")
-                else:
-                    print(opcode_name)
+            items.append(('op', op, None))
+    return items
+
+
+def _int_width(value: int) -> int:
+    return max(1, (value.bit_length() + 7) // 8)
+
+
+def assemble(instructions: Iterable[Instruction]) -> bytes:
+    '''
+    Assemble instructions into bytes.
+    - `"name:"` defines a label at the current offset, label names can be used as PUSH operands.
+    - a PUSH without width (`"PUSH"`) uses the smallest width for its operand; for labels it is resolved
+      iteratively, as growing a push moves the labels after it.
+    - shorter bytes operands are emitted as is, as the truncated last PUSH of a code. They are only allowed for
+      the last instruction, as offsets after a PUSH are computed from its full width.
+    '''
+    items = _parse_instructions(instructions)
+    widths = []
+    for i, (kind, op, operand) in enumerate(items):
+        if kind == 'push':
+            if op is not None:
+                if isinstance(operand, bytes) and len(operand) < push_width[op] and i != len(items) - 1:
+                    raise ValueError(f"Operand of {byte_to_name[op]} is shorter than its width and it is not the last instruction: {operand}")
+                widths.append(push_width[op])
+            elif isinstance(operand, int):
+                widths.append(_int_width(operand))
+            elif isinstance(operand, bytes):
+                widths.append(len(operand))
+            else:
+                widths.append(1)
+        elif kind == 'raw':
+            widths.append(len(operand) - 1)
+        else:
+            widths.append(0)
+
+    # widths of label pushes only grow, so this terminates
+    while True:
+        labels: Dict[str, int] = {}
+        offset = 0
+        for (kind, op, operand), width in zip(items, widths):
+            if kind == 'label':
+                if operand in labels:
+                    raise ValueError(f"Duplicated label: {operand}")
+                labels[operand] = offset
             else:
-                print(opcode_name)
-        i = offset
+                offset += 1 + width
+        changed = False
+        for i, (kind, op, operand) in enumerate(items):
+            if kind == 'push' and op is None and isinstance(operand, str):
+                if operand not in labels:
+                    raise ValueError(f"Unknown label: {operand}")
+                width = _int_width(labels[operand])
+                if width > widths[i]:
+                    widths[i] = width
+                    changed = True
+        if not changed:
+            break
+
+    out = bytearray()
+    for (kind, op, operand), width in zip(items, widths):
+        if kind == 'op':
+            out.append(op)
+        elif kind == 'raw':
+            out += operand
+        elif kind == 'push':
+            if isinstance(operand, str):
+                if operand not in labels:
+                    raise ValueError(f"Unknown label: {operand}")
+                operand = labels[operand]
+            if isinstance(operand, int):
+                if operand < 0 or _int_width(operand) > width:
+                    raise ValueError(f"Operand {operand} does not fit in PUSH{width}")
+                operand = operand.to_bytes(width, 'big')
+            elif operand is None or len(operand) > width:
+                raise ValueError(f"Invalid operand for PUSH{width}: {operand}")
+            out.append(name_to_byte[f'PUSH{width}'] if op is None else op)
+            out += operand
+    return bytes(out)
+
+
+def assemble_arrays(opcodes: Sequence[int], operands: Sequence[bytes]) -> bytes:
+    '''
+    Encode parallel arrays of opcodes and operands, e.g. from a patched `Disassembly`, without validation.
+    '''
+    out = bytearray()
+    for op, operand in zip(opcodes, operands):
+        out.append(op)
+        out += operand
+    return bytes(out)
+
+
+def reassemble(dis: Disassembly) -> bytes:
+    '''Encode a (possibly patched) `Disassembly` back to code, including its metadata trailer'''
+    base, code, lengths = dis.base_pc - 1, dis.code, dis.operand_lengths
+    operands = [code[pc - base: pc - base + n] for pc, n in zip(dis.pcs, lengths)]
+    return assemble_arrays(dis.opcodes, operands) + dis.metadata
+
 
 # convert opcodes to binary hex and print
 def encode_and_print(opcodes):
-    pass
+    if isinstance(opcodes, str):
+        opcodes = opcodes.splitlines()
+    print('0x' + assemble(opcodes).hex())
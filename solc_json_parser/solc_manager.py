@@ -0,0 +1,194 @@
+# Download, verify and locate solc binaries.
+#
+# Builds are described by a solc-bin `list.json` (see `solc.json` in this repo), with the sha256 and keccak256 of each
+# binary. Binaries are installed as `<install_dir>/solc-v<version>`, the layout `ast_shared.solc_bin` expects, so a
+# `SolcManager` and `solc_bin` share installed binaries.
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import Dict, Iterable, Optional, Union
+
+from Crypto.Hash import keccak
+
+DEFAULT_BASE_URL = 'https://binaries.soliditylang.org/linux-amd64'
+DEFAULT_INSTALL_DIR = '~/.solcx'
+CHUNK_SIZE = 1 << 20
+
+
+class SolcChecksumError(ValueError):
+    pass
+
+
+def _file_digests(path: str):
+    sha256 = hashlib.sha256()
+    keccak256 = keccak.new(digest_bits=256)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+            keccak256.update(chunk)
+    return '0x' + sha256.hexdigest(), '0x' + keccak256.hexdigest()
+
+
+def _make_executable(path: str):
+    st = os.stat(path)
+    os.chmod(path, st.st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+
+
+class SolcManager():
+    '''
+    Installs solc binaries concurrently from `base_url` or a local `mirror_dir` holding `list.json` and the binaries.
+    Downloads go to a `.part` file next to the target, are resumed if interrupted, checked against the sha256 and
+    keccak256 of `list.json` and moved into place atomically.
+
+    An instance can be used as `solc_bin_resolver` of the parsers, it returns the binary path of a version and
+    installs missing versions if `install_missing` is set.
+    '''
+    def __init__(self, install_dir: str = DEFAULT_INSTALL_DIR, base_url: str = DEFAULT_BASE_URL, mirror_dir: Optional[str] = None,
+                 list_json: Union[str, dict, None] = None, max_workers: int = 8, timeout: float = 60, install_missing: bool = True):
+        self.install_dir = os.path.expanduser(install_dir)
+        self.base_url = base_url.rstrip('/')
+        self.mirror_dir = mirror_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.install_missing = install_missing
+        self._list_json = list_json
+        self._paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._version_locks: Dict[str, threading.Lock] = {}
+
+    @cached_property
+    def builds(self) -> Dict[str, dict]:
+        '''Release builds of `list.json` by version'''
+        data = self._list_json
+        if data is None:
+            if self.mirror_dir:
+                data = os.path.join(self.mirror_dir, 'list.json')
+            else:
+                with urllib.request.urlopen(f'{self.base_url}/list.json', timeout=self.timeout) as resp:
+                    data = json.load(resp)
+        if isinstance(data, str):
+            with open(data, 'r') as f:
+                data = json.load(f)
+        return {b['version']: b for b in data['builds'] if not b.get('prerelease')}
+
+    def bin_path(self, version: str) -> str:
+        return os.path.join(self.install_dir, f'solc-v{version}')
+
+    def is_installed(self, version: str) -> bool:
+        return os.path.isfile(self.bin_path(version))
+
+    def verify(self, version: str, path: Optional[str] = None):
+        '''Raise `SolcChecksumError` if a binary does not match the checksums of its build'''
+        build = self.builds[version]
+        path = path or self.bin_path(version)
+        sha256, keccak256 = _file_digests(path)
+        if build.get('sha256') and sha256 != build['sha256']:
+            raise SolcChecksumError(f'sha256 mismatch of solc {version}: {sha256} != {build["sha256"]}')
+        if build.get('keccak256') and keccak256 != build['keccak256']:
+            raise SolcChecksumError(f'keccak256 mismatch of solc {version}: {keccak256} != {build["keccak256"]}')
+
+    def _is_verified(self, version: str, path: str) -> bool:
+        '''Whether a file exists and matches the checksums, e.g. a download completed before it was moved into place'''
+        if not os.path.isfile(path):
+            return False
+        try:
+            self.verify(version, path)
+            return True
+        except SolcChecksumError:
+            return False
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _download(self, build: dict, part: str):
+        '''Download a build to `part`, continuing from its current size'''
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        if self.mirror_dir:
+            with open(os.path.join(self.mirror_dir, build['path']), 'rb') as src, open(part, 'ab') as dst:
+                src.seek(offset)
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            return
+
+        request = urllib.request.Request(f'{self.base_url}/{build["path"]}')
+        if offset:
+            request.add_header('Range', f'bytes={offset}-')
+        with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+            # servers ignoring the range send the whole file
+            mode = 'ab' if offset and resp.status == 206 else 'wb'
+            with open(part, mode) as dst:
+                shutil.copyfileobj(resp, dst, CHUNK_SIZE)
+
+    def install(self, version: str, force: bool = False) -> str:
+        '''Install a version if it is not installed yet, returns the binary path'''
+        path = self.bin_path(version)
+        with self._lock:
+            version_lock = self._version_locks.setdefault(version, threading.Lock())
+
+        with version_lock:
+            if os.path.isfile(path) and not force:
+                return path
+            build = self.builds.get(version)
+            if build is None:
+                raise ValueError(f'Unknown solc version: {version}')
+
+            os.makedirs(self.install_dir, exist_ok=True)
+            part = f'{path}.part'
+            if not self._is_verified(version, part):
+                resumed = os.path.exists(part)
+                try:
+                    self._download(build, part)
+                    self.verify(version, part)
+                except (SolcChecksumError, OSError) as e:
+                    # an interrupted download is kept to be resumed later
+                    if resumed or isinstance(e, SolcChecksumError):
+                        self._remove(part)
+                    if not resumed:
+                        raise
+                    # the partial download may be of another file, or rejected by the server, e.g. HTTP 416
+                    # for a range past its end, start over
+                    try:
+                        self._download(build, part)
+                        self.verify(version, part)
+                    except SolcChecksumError:
+                        self._remove(part)
+                        raise
+            _make_executable(part)
+            os.replace(part, path)
+            return path
+
+    def install_many(self, versions: Optional[Iterable[str]] = None, max_workers: Optional[int] = None) -> Dict[str, Union[str, Exception]]:
+        '''
+        Install many versions concurrently, all release builds by default.
+        Returns the binary path of each version, or the exception raised while installing it.
+        '''
+        versions = list(self.builds) if versions is None else list(versions)
+
+        def install_one(version: str):
+            try:
+                return self.install(version)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            return dict(zip(versions, executor.map(install_one, versions)))
+
+    def __call__(self, version: str) -> str:
+        '''Binary path of a version, for use as `solc_bin_resolver`'''
+        path = self._paths.get(version)
+        if path is not None:
+            return path
+        path = self.install(version) if self.install_missing else self.bin_path(version)
+        if os.path.isfile(path):
+            self._paths[version] = path
+        return path
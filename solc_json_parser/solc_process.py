@@ -0,0 +1,137 @@
+# Run solc as a child process with a wall-clock timeout and resource limits.
+#
+# solc runs in its own process group, so that it is killed with everything it started when a limit is hit.
+# Address space and CPU time limits are set with `setrlimit` in the child before solc is executed, so they apply from
+# its first instruction. They are ignored on platforms without the `resource` module.
+
+import errno
+import os
+import signal
+import subprocess
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from .ast_shared import SolidityAstError
+
+try:
+    import resource
+except ImportError:  # pragma: no cover, windows
+    resource = None  # type: ignore
+
+# seconds to wait for the process group to exit after SIGTERM before sending SIGKILL
+KILL_GRACE_SECONDS = 1
+
+
+@dataclass
+class SolcLimits:
+    timeout:         Optional[float] = None  # wall-clock seconds
+    max_memory:      Optional[int] = None    # bytes of address space, RLIMIT_AS
+    max_cpu_seconds: Optional[int] = None    # RLIMIT_CPU
+
+
+class SolcLimitError(SolidityAstError):
+    '''solc was stopped by a limit, `reason` is one of `timeout`, `memory` or `cpu`'''
+    def __init__(self, reason: str, message: str, stderr: Optional[str] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.stderr = stderr
+
+
+def _rlimits(limits: SolcLimits) -> List[tuple]:
+    out = []
+    if resource is None:
+        return out
+    if limits.max_memory:
+        out.append((resource.RLIMIT_AS, (limits.max_memory, limits.max_memory)))
+    if limits.max_cpu_seconds:
+        # the soft limit sends SIGXCPU, the hard limit one second later SIGKILL
+        out.append((resource.RLIMIT_CPU, (limits.max_cpu_seconds, limits.max_cpu_seconds + 1)))
+    return out
+
+
+def _out_of_memory(stderr: str) -> bool:
+    '''std::bad_alloc or ENOMEM in the error output'''
+    return 'bad_alloc' in stderr or os.strerror(errno.ENOMEM) in stderr
+
+
+def _kill_group(proc: subprocess.Popen):
+    for sig, wait in ((signal.SIGTERM, KILL_GRACE_SECONDS), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            proc.wait(timeout=wait)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _flag_value(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ','.join(str(v) for v in value)
+    return str(value)
+
+
+def solc_command(solc_binary: str, source_files: Optional[List[str]] = None,
+                 import_remappings: Union[Dict[str, str], List[str], str, None] = None, **flags) -> List[str]:
+    '''
+    Command line of a solc call, with keyword arguments converted to flags the same way as py-solc-x:
+    `evm_version='london'` becomes `--evm-version london`, True a flag without value, None and False are skipped
+    and lists are joined with `,`. Without source files the source is read from stdin.
+    '''
+    command = [solc_binary] + list(source_files or [])
+    if import_remappings is not None:
+        if isinstance(import_remappings, str):
+            command.append(import_remappings)
+        elif isinstance(import_remappings, dict):
+            command.extend(f'{k}={v}' for k, v in import_remappings.items())
+        else:
+            command.extend(import_remappings)
+
+    for key, value in flags.items():
+        if value is None or value is False:
+            continue
+        flag = f"--{key.replace('_', '-')}"
+        command.extend([flag] if value is True else [flag, _flag_value(value)])
+
+    if not source_files and 'standard_json' not in flags:
+        command.append('-')
+    return command
+
+
+def run_solc(args: List[str], input: Optional[str] = None, cwd: Optional[str] = None, limits: Optional[SolcLimits] = None) -> str:
+    '''
+    Run a solc command and return its stdout like `subprocess.check_output(..., text=True)`.
+    Raises `SolcLimitError` if a limit of `limits` is hit, `subprocess.CalledProcessError` for other failures,
+    including signals not explained by a limit, e.g. SIGABRT of an internal compiler error.
+    '''
+    limits = limits or SolcLimits()
+    rlimits = _rlimits(limits)
+
+    # Limits set with `prlimit` after the start would leave solc unlimited until then, and solc compiling files
+    # does not wait for its input. `preexec` runs between fork and exec and only calls `setrlimit` of the already
+    # imported `resource` module, no imports or I/O which could deadlock on locks held by other threads.
+    def preexec():
+        for kind, value in rlimits:
+            resource.setrlimit(kind, value)
+
+    proc = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=cwd,
+                            start_new_session=True, preexec_fn=preexec if rlimits else None)
+    try:
+        stdout, stderr = proc.communicate(input=input, timeout=limits.timeout)
+    except subprocess.TimeoutExpired:
+        _kill_group(proc)
+        proc.communicate()
+        raise SolcLimitError('timeout', f'solc did not finish in {limits.timeout} seconds: {" ".join(args)}')
+    except BaseException:
+        _kill_group(proc)
+        raise
+
+    if proc.returncode != 0:
+        if limits.max_cpu_seconds and proc.returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+            raise SolcLimitError('cpu', f'solc exceeded {limits.max_cpu_seconds} CPU seconds', stderr)
+        if limits.max_memory and _out_of_memory(stderr):
+            raise SolcLimitError('memory', f'solc exceeded {limits.max_memory} bytes of memory', stderr)
+        raise subprocess.CalledProcessError(proc.returncode, args, output=stdout, stderr=stderr)
+    return stdout
@@ -1,6 +1,8 @@
-import subprocess
 import json
 import os
+import re
+import bisect
+import copy
 from typing import Tuple, Callable, List, Union, Optional, Dict
 from functools import cached_property, cache
 
@@ -9,7 +11,11 @@ from .version_cfg import v_keys
 from . import ast_shared as s
 from .ast_shared import SolidityAstError, solc_bin
 from .base_parser import BaseParser
-from .fields import Function
+from .normalized_ast import normalize_ast
+from .fields import Function, SourceMap
+from .solc_process import SolcLimits, run_solc
+from . import opcodes as op
+from array import array
 import sys
 
 def node_contains(src_str: str, pc_source: dict) -> bool:
@@ -21,13 +27,15 @@ def node_contains(src_str: str, pc_source: dict) -> bool:
     offset, length, _fidx = list(map(int, src_str.split(':')))
     return offset <= pc_source['begin'] and offset + length >= pc_source['end']
 
-def compile_standard(version: str, input_json: dict, solc_bin_resolver: Callable[[str], str] = solc_bin, cwd: Optional[str]=None):
+def compile_standard(version: str, input_json: dict, solc_bin_resolver: Callable[[str], str] = solc_bin, cwd: Optional[str]=None,
+                     limits: Optional[SolcLimits]=None):
     '''
     Compile standard input json and parse output as json.
     Parameters:
         version: solc version. Example: 0.8.13
         input_json: standard json input
         solc_bin_resolver: a function takes a solc version string and returns a full path to solc executable
+        limits: timeout and resource limits of the solc process, `SolcLimitError` is raised when one is hit
     '''
     print(f'Compiling with solc version: {version}')
     solc = solc_bin_resolver(version)
@@ -36,13 +44,7 @@ def compile_standard(version: str, input_json: dict, solc_bin_resolver: Callable
         raise Exception(f'solc not found at: {solc}, please download all solc binaries first or provide your `solc_bin_resolver` function')
 
 
-    solc_output = subprocess.check_output(
-        [solc, "--standard-json",],
-        input=json.dumps(input_json),
-        text=True,
-        stderr=subprocess.PIPE,
-        cwd=cwd
-    )
+    solc_output = run_solc([solc, "--standard-json",], input=json.dumps(input_json), cwd=cwd, limits=limits)
     return json.loads(solc_output)
 
 def build_pc2idx(evm: dict, deploy: bool = False) -> Tuple[list, dict, dict]:
@@ -102,6 +104,25 @@ def build_pc2idx(evm: dict, deploy: bool = False) -> Tuple[list, dict, dict]:
     pc2idx = {v: k for k, v in idx2pc.items()}
     return code, pc2idx, pc2opcode
 
+def build_pc2src(evm: dict, deploy: bool = False) -> Tuple[array, SourceMap, dict]:
+    '''
+    Build a PC index from the bytecode object and the source map of one evm dictionary, without `legacyAssembly`.
+    Returns a tuple: (pcs, source map, pc2opcode), where `pcs[i]` is the pc of the instruction of source map entry `i`.
+    Opcode names in pc2opcode are the ones of the `opcodes` module, e.g. `PUSH1` rather than `PUSH`.
+    '''
+    evm_key = 'bytecode' if deploy else 'deployedBytecode'
+    bytecode = evm[evm_key]
+    srcmap = s.decode_src_mapping(bytecode.get('sourceMap'))
+    code = op.hex_to_bytes(s.LINK_PLACEHOLDER_RE.sub('0' * 40, bytecode.get('object') or ''))
+    dis = op.disassemble(code, split_metadata=False)
+
+    # the source map only covers instructions, not data and metadata appended to the code
+    n = min(len(dis), len(srcmap))
+    pcs = dis.pcs[:n]
+    byte_to_name = op.byte_to_name
+    pc2opcode = {pc: byte_to_name.get(opcode, 'INVALID') for pc, opcode in zip(pcs, dis.opcodes)}
+    return pcs, srcmap, pc2opcode
+
 def source_content_by_file_key(input_json: dict, filename: str):
     '''
     Get source code content by unique filename
@@ -117,6 +138,20 @@ def filename_by_fid(output_json: dict, fid: int) -> str:
 
     return filename
 
+def tag_source_id(ast: dict, source_id: str):
+    """
+    Set `source_id` to top level nodes and child nodes of contracts in a v8 AST, the same way as it is done by parsing
+    """
+    for node in ast.get('nodes') or []:
+        node['source_id'] = source_id
+        if node.get('nodeType') != 'ContractDefinition':
+            continue
+        for v in node.values():
+            children = v if isinstance(v, list) else [v]
+            for child in children:
+                if isinstance(child, dict) and 'nodeType' in child:
+                    child['source_id'] = source_id
+
 def source_content_by_fid(input_json: dict, output_json: dict, fid: int):
     filename = filename_by_fid(output_json, fid)
     return source_content_by_file_key(input_json, filename)
@@ -137,6 +172,23 @@ def source_by_pc(code, pc2idx, input_json: dict, output_json: dict, pc: int, res
     if block is None:
         return None
 
+    return source_by_block(block, input_json, output_json, pc, resolve_yul_block)
+
+
+def source_by_pc_from_srcmap(pcs: array, srcmap: SourceMap, input_json: dict, output_json: dict, pc: int, resolve_yul_block: Optional[Callable]=None):
+    '''Same as `source_by_pc`, using an index built by `build_pc2src`'''
+    i = bisect.bisect_right(pcs, pc) - 1
+    if i < 0:
+        return None
+    start, length, fid, *_ = srcmap[i]
+    block = {'begin': start, 'end': start + length}
+    # compiler generated code has no source index, handled like `legacyAssembly` blocks without `source`
+    if fid != -1:
+        block['source'] = fid
+    return source_by_block(block, input_json, output_json, pc, resolve_yul_block)
+
+
+def source_by_block(block: dict, input_json: dict, output_json: dict, pc: int, resolve_yul_block: Optional[Callable]=None):
     fid = block.get('source', 0) # some times there is no `source` field.
     begin = block.get('begin')
     end = block.get('end')
@@ -184,16 +236,31 @@ def has_compilation_error(output_json: dict) -> bool:
     return False
 
 
-def override_settings(input_json):
+# output selections by profile:
+# - `full`: all outputs
+# - `sourcemap`: no `legacyAssembly` and other large outputs, PCs are mapped to sources with bytecode and source maps
+OUTPUT_SELECTIONS = {
+    'full': {'*': {'*': [ '*' ], '': ['ast']}},
+    'sourcemap': {'*': {'*': ['abi', 'storageLayout', 'evm.methodIdentifiers',
+                              'evm.bytecode.object', 'evm.bytecode.sourceMap', 'evm.bytecode.linkReferences',
+                              'evm.bytecode.generatedSources',
+                              'evm.deployedBytecode.object', 'evm.deployedBytecode.sourceMap', 'evm.deployedBytecode.linkReferences',
+                              'evm.deployedBytecode.immutableReferences', 'evm.deployedBytecode.generatedSources'],
+                        '': ['ast']}},
+}
+
+def override_settings(input_json, output_profile: str = 'full'):
     """
     Override settings:
     - Disable optimization which could confuse source mapping
-    - Mark all fields to be generated in the outputs for analysis
+    - Mark all fields of the output profile to be generated in the outputs for analysis, see `OUTPUT_SELECTIONS`
 
     https://docs.soliditylang.org/en/latest/using-the-compiler.html#input-description
     """
+    if output_profile not in OUTPUT_SELECTIONS:
+        raise ValueError(f'Unknown output profile: {output_profile}, available profiles: {list(OUTPUT_SELECTIONS)}')
     s.assoc_in(input_json, ['settings', 'optimizer', 'enabled'], False)
-    s.assoc_in(input_json, ['settings', 'outputSelection'], {'*': {'*': [ '*' ], '': ['ast']}})
+    s.assoc_in(input_json, ['settings', 'outputSelection'], copy.deepcopy(OUTPUT_SELECTIONS[output_profile]))
     s.assoc_in(input_json, ['settings', 'metadata'], {'bytecodeHash': 'none'}) # equiv. of solc --metadata=none
 
     input_json['language']= input_json.get('language', 'Solidity')
@@ -204,7 +271,9 @@ class StandardJsonParser(BaseParser):
     def __init__(self, input_json: Union[dict, str], version: str, solc_bin_resolver: Callable[[str], str] = solc_bin, cwd: Optional[str] = None,
                  retry_num: Optional[int]=0,
                  try_install_solc: Optional[bool]=False,
-                 solc_options: Optional[Dict] = {}):
+                 solc_options: Optional[Dict] = {},
+                 output_profile: str = 'full',
+                 solc_limits: Optional[SolcLimits] = None):
         if retry_num is not None and retry_num > 0:
             raise Exception('StandardJsonParser does not support retry')
 
@@ -217,6 +286,13 @@ class StandardJsonParser(BaseParser):
         super().__init__()
         self.file_path = None
         self.solc_version: str = version
+        self.solc_bin_resolver = solc_bin_resolver
+        self._fid_to_filename: Dict[int, str] = {}
+        self._line_indexes: Dict[str, Tuple[List[int], Optional[str]]] = {} # filename -> (byte offsets of line starts, content)
+        # (filename, contract name, deploy) -> (code, pc2idx, pc2opcode) or (pcs, source map, pc2opcode), see `__pc_index`
+        self._pc_indexes: Dict[Tuple[str, str, bool], tuple] = {}
+        self.output_profile = output_profile
+        self.solc_limits = solc_limits
         try:
             # try parse as json
             self.input_json: dict = input_json if isinstance(input_json, dict) else json.loads(input_json)
@@ -225,7 +301,7 @@ class StandardJsonParser(BaseParser):
             self.input_json = StandardJsonParser.__prepare_standard_input(input_json)
 
 
-        self.input_json = override_settings(self.input_json)
+        self.input_json = override_settings(self.input_json, output_profile)
         # https://soliditylang.org/blog/2023/02/01/solidity-0.8.18-release-announcement
         support_cbor =  Version(version) >= Version('0.8.18')
         if support_cbor:
@@ -236,7 +312,7 @@ class StandardJsonParser(BaseParser):
         self.pre_configure_compatible_fields()
         self.cwd = cwd
 
-        self.output_json = compile_standard(version, self.input_json, solc_bin_resolver, cwd)
+        self.output_json = compile_standard(version, self.input_json, solc_bin_resolver, cwd, solc_limits)
 
         if has_compilation_error(self.output_json):
             raise SolidityAstError(f"Compile failed: {self.output_json.get('errors')}" )
@@ -294,38 +370,28 @@ class StandardJsonParser(BaseParser):
         return ast_dict
 
 
+    def __line_index(self, filename: Optional[str]) -> Tuple[List[int], Optional[str]]:
+        """
+        Returns byte offsets of all line starts and the content of a source file, cached per file
+        """
+        index = self._line_indexes.get(filename)
+        if index is None:
+            content = source_content_by_file_key(self.input_json, filename) if filename else None
+            line_starts = [0]
+            if content:
+                line_starts += [m.end() for m in re.finditer(b'\n', content.encode())]
+            index = (line_starts, content)
+            self._line_indexes[filename] = index
+        return index
+
     def get_line_number_range_and_source(self, slf):
         start, length, fid = slf
-        content = source_content_by_fid(self.input_json, self.output_json, fid)
+        line_starts, content = self.__line_index(self._fid_to_filename.get(fid))
         if not content:
             return (0, 0), ""
-        source_code_bytes = content.encode()
-        start_line = source_code_bytes[:start].decode().count('\n') + 1
-        end_line = start_line + source_code_bytes[start:start + length].decode().count('\n')
-        return (start_line, end_line), source_code_bytes.decode()
-
-
-    def _get_contract_meta_data(self, node: Dict) -> tuple:
-        # line number range is the same for all versions
-        line_number_range_raw = list(map(int, node.get('src').split(':')))
-        line_number_range, _ = self.get_line_number_range_and_source(line_number_range_raw)
-        contract_id = node.get('id')
-
-        # assert node.get('name') is not None
-        # assert node.get('abstract') is not None
-        # assert node.get('baseContracts') is not None
-
-        contract_kind = node.get('contractKind')
-
-        is_abstract = node.get('abstract')
-
-        if node.get('baseContracts') is not None:
-            base_contracts = self._get_base_contracts(node.get('baseContracts'))
-        else:
-            base_contracts = node.get('contractDependencies')
-        contract_name = node.get('name')
-
-        return contract_id, contract_kind, is_abstract, contract_name, base_contracts, line_number_range
+        start_line = bisect.bisect_right(line_starts, start)
+        end_line = bisect.bisect_right(line_starts, start + length)
+        return (start_line, end_line), content
 
 
     @cached_property
@@ -337,8 +403,65 @@ class StandardJsonParser(BaseParser):
         """
         Configure the fields to maintain backward compatibility with the CombinedJsonParser, called after compilation
         """
+        self._fid_to_filename = {source['id']: filename for filename, source in self.output_json.get('sources').items()}
         self.solc_json_ast = self.__build_ast()
         self.contracts_dict = self._parse()
+        self._build_indexes()
+
+    def update_sources(self, sources: Dict[str, str], removed: Optional[List[str]] = None) -> 'StandardJsonParser':
+        """
+        Recompile after some of the sources changed. Parsed contracts, normalized ASTs, line indexes and PC indexes
+        are reused for the source units and contracts which are not affected by the change.
+        - `sources`: changed or added sources, a dict from filename to source content
+        - `removed`: filenames to be removed from the input
+        Raises `SolidityAstError` and keeps the current state if the compilation fails.
+        """
+        old_input, old_output = self.input_json, self.output_json
+        new_sources = dict(old_input['sources'])
+        for filename in removed or []:
+            new_sources.pop(filename, None)
+        for filename, content in sources.items():
+            new_sources[filename] = {'content': content}
+        input_json = dict(old_input, sources=new_sources)
+
+        output_json = compile_standard(self.solc_version, input_json, self.solc_bin_resolver, self.cwd, self.solc_limits)
+        if has_compilation_error(output_json):
+            raise SolidityAstError(f"Compile failed: {output_json.get('errors')}" )
+
+        # a source unit is reused when its content and its AST (including node ids and references) are unchanged
+        unchanged_files = {filename for filename, source in new_sources.items()
+                           if old_input['sources'].get(filename, {}).get('content') == source.get('content')}
+        reusable_units = set()
+        for filename, source in output_json['sources'].items():
+            old_source = old_output['sources'].get(filename)
+            if old_source is None or filename not in unchanged_files:
+                continue
+            tag_source_id(source['ast'], filename.split(':')[0])
+            if old_source == source:
+                output_json['sources'][filename] = old_source
+                reusable_units.add(filename)
+
+        old_asts = self.normalized_asts
+        for key in list(self._pc_indexes):
+            filename, contract_name, deploy = key
+            evm_key = 'bytecode' if deploy else 'deployedBytecode'
+            old_bytecode = s.get_in(old_output, 'contracts', filename, contract_name, 'evm', evm_key) or {}
+            new_bytecode = s.get_in(output_json, 'contracts', filename, contract_name, 'evm', evm_key) or {}
+            if (old_bytecode.get('object'), old_bytecode.get('sourceMap')) != (new_bytecode.get('object'), new_bytecode.get('sourceMap')):
+                del self._pc_indexes[key]
+        for filename in list(self._line_indexes):
+            if filename not in unchanged_files:
+                del self._line_indexes[filename]
+
+        self.input_json, self.output_json = input_json, output_json
+        self._reset_derived_caches()
+        self.normalized_asts = {filename: old_asts[filename] if filename in reusable_units else normalize_ast(source['ast'], self.v8)
+                                for filename, source in output_json['sources'].items() if source.get('ast')}
+        self._fid_to_filename = {source['id']: filename for filename, source in output_json.get('sources').items()}
+        self.solc_json_ast = self.__build_ast()
+        self.contracts_dict = self._parse({filename.split(':')[0] for filename in reusable_units})
+        self._build_indexes()
+        return self
 
     def source_by_yul_block(self, block: Dict):
         """
@@ -370,9 +493,13 @@ class StandardJsonParser(BaseParser):
         - `deploy`: set to True if the PC is from the deployment code instead of runtime code. Default is False
         """
         evms = evms_by_contract_name(self.output_json, contract_name)
-        for _, evm in evms:
-            code, pc2idx, *_ = self.__build_pc2idx(evm, deploy)
-            result = source_by_pc(code, pc2idx, self.input_json, self.output_json, pc, resolve_yul_block=self.source_by_yul_block)
+        for filename, evm in evms:
+            if self.__use_srcmap(evm):
+                pcs, srcmap, _ = self.__pc_index(filename, contract_name, evm, deploy)
+                result = source_by_pc_from_srcmap(pcs, srcmap, self.input_json, self.output_json, pc, resolve_yul_block=self.source_by_yul_block)
+            else:
+                code, pc2idx, _ = self.__pc_index(filename, contract_name, evm, deploy)
+                result = source_by_pc(code, pc2idx, self.input_json, self.output_json, pc, resolve_yul_block=self.source_by_yul_block)
             if result:
                 return result
         return None
@@ -411,8 +538,18 @@ class StandardJsonParser(BaseParser):
         pc_source = self.source_by_pc(contract_name, pc, deploy)
         if not pc_source:
             return []
-        pred = lambda node: node and (node_type is None or node.get('nodeType') == node_type) and node_contains(node.get('src'), pc_source)
-        return self.extract_node(pred, self.output_json['sources'][pc_source['fid']]['ast'], first_only=first_only)
+        root = self.normalized_asts.get(pc_source['fid'])
+        if root is None:
+            return []
+
+        found = []
+        begin, end = pc_source['begin'], pc_source['end']
+        for node in root.walk():
+            if (node_type is None or node.node_type == node_type) and node.contains(begin, end):
+                found.append(node.raw)
+                if first_only:
+                    break
+        return found
 
     def function_unit_by_pc(self, contract_name: str, pc: int, deploy=False) -> Optional[Dict]:
         """
@@ -435,26 +572,48 @@ class StandardJsonParser(BaseParser):
         """
         return list(self.pc2opcode_by_contract(contract, deploy).keys())
 
-    def __build_pc2idx(self, evm: dict, deploy: bool = False) -> Tuple[list, dict, dict]:
+    def __use_srcmap(self, evm: dict) -> bool:
+        return self.output_profile == 'sourcemap' or not evm.get('legacyAssembly')
+
+    def __pc_index(self, filename: str, contract_name: str, evm: dict, deploy: bool = False) -> tuple:
         """
-        Returns a tuple: (code, pc2idx, pc2opcode)
+        Returns a tuple, cached per contract:
+        - (pcs, source map, pc2opcode) built by `build_pc2src` for the `sourcemap` output profile or without `legacyAssembly`
+        - (code, pc2idx, pc2opcode) built by `build_pc2idx` otherwise
         """
-        return build_pc2idx(evm, deploy)
+        key = (filename, contract_name, deploy)
+        index = self._pc_indexes.get(key)
+        if index is None:
+            index = build_pc2src(evm, deploy) if self.__use_srcmap(evm) else build_pc2idx(evm, deploy)
+            self._pc_indexes[key] = index
+        return index
 
-    @cache
     def pc2opcode_by_contract(self, contract_name: str, deploy: bool) -> Dict[int, str]:
         evms = evms_by_contract_name(self.output_json, contract_name)
-        for _, evm in evms: # if same contract existsin in multiple files, there could be a problem
-            _, _, pc2opcode = self.__build_pc2idx(evm, deploy)
+        for filename, evm in evms: # if same contract existsin in multiple files, there could be a problem
+            _, _, pc2opcode = self.__pc_index(filename, contract_name, evm, deploy)
             return pc2opcode
         return {}
 
-    def function_by_name(self, contract_name: str, function_name: str) -> Function:
-        """Return a function for a given contract name and function name"""
-        contract = self.contract_by_name(contract_name)
-        funcs    = self.functions_in_contract(contract)
-        return next(fn for fn in funcs if fn.name == function_name)
+    def _raw_storage_layout(self, contract_name: str) -> Optional[dict]:
+        for m_contract in self.output_json.get('contracts', {}).values():
+            contract = m_contract.get(contract_name)
+            if contract is not None: # if same contract exists in multiple files, the first one is used
+                return contract.get('storageLayout')
+        return None
 
+    def _raw_source_map(self, contract_name: str, deploy: bool) -> Optional[str]:
+        evm_key = 'bytecode' if deploy else 'deployedBytecode'
+        for m_contract in self.output_json.get('contracts', {}).values():
+            contract = m_contract.get(contract_name)
+            if contract is not None: # if same contract exists in multiple files, the first one is used
+                return s.get_in(contract, 'evm', evm_key, 'sourceMap')
+        return None
+
+    def _raw_binary(self, contract_name: str, deploy: bool) -> Optional[str]:
+        for _filename, evm in evms_by_contract_name(self.output_json, contract_name):
+            return s.get_in(evm, 'bytecode' if deploy else 'deployedBytecode', 'object')
+        return None
 
     def __get_binary(self, contract_name: str, filename: Optional[str], deploy=False) -> List[Tuple[str, str, str]]:
         """
@@ -481,15 +640,31 @@ class StandardJsonParser(BaseParser):
         """
         return self.__get_binary(contract_name, None, deploy=True)
 
+    @cached_property
+    def placeholder_index(self) -> Dict[str, Tuple[str, str]]:
+        '''34 character hash of fully qualified names -> (filename, contract_name), for all contracts'''
+        index = {}
+        for filename, m_contract in self.output_json.get('contracts').items():
+            for contract_name in m_contract:
+                index.setdefault(s.placeholder_hash(f'{filename}:{contract_name}'), (filename, contract_name))
+        return index
+
     def qualified_name_from_hash(self, hsh: str)->Optional[Tuple[str, str]]:
         '''Get fully qualified contract name from 34 character hash'''
-        for filename, m_contract in self.output_json.get('contracts').items():
-            for contract_name, contract in m_contract.items():
-                full_name = f'{filename}:{contract_name}'
-                if hsh == s.keccak256(full_name)[:34]:
-                    return (filename, contract_name)
+        return self.placeholder_index.get(hsh)
 
-        return None
+    def link_binary(self, contract_name: str, libraries: Dict[str, str], deploy=True) -> List[Tuple[str, str, str]]:
+        """
+        Link the deployment (or runtime) binary of a contract with `libraries`, a dict from fully qualified library
+        name (`path/to/file.sol:Lib`) to address. Returns a list of tuples: `(filename, contract_name, binary)`
+        """
+        bins = []
+        bytecode_key = 'bytecode' if deploy else 'deployedBytecode'
+        for filename, evm in evms_by_contract_name(self.output_json, contract_name):
+            bytecode = evm.get(bytecode_key, {})
+            if bytecode.get('object'):
+                bins.append((filename, contract_name, s.link_bytecode(bytecode['object'], libraries, bytecode.get('linkReferences'))))
+        return bins
 
     def get_deploy_bin_by_hash(self, hsh: str) -> Optional[str]:
         '''Get deployment binary by hash of fully qualified contract / library name'''
@@ -500,32 +675,6 @@ class StandardJsonParser(BaseParser):
         return self.__get_binary(contract_name, filename, deploy=True)[0][2]
 
 
-    def get_literals(self, contract_name: str, only_value=False) -> dict:
-        """
-        Get all literals(number, address, string, other) in the contract.
-        for 'other' type, if only_value is True, return the string value
-        - `contract_name`: contract_name in string
-        - `only_value`: set to true to get only values, otherwise get all literal objects
-        """
-
-        literals_nodes = set()
-        contract_node = None
-        for filename, unit in self.solc_json_ast.items():
-            root_node = unit.get('ast')
-            for i, node in enumerate(root_node[self.keys.children]):
-                if node[self.keys.name] == "ContractDefinition":
-                    info_node = node if self.v8 else node.get('attributes')
-                    if info_node['name'] == contract_name:
-                        contract_node = node
-                        break
-
-        # traverse the dictionary and get all the literals recursively
-        self._traverse_nodes(contract_node, literals_nodes)
-
-        literals = s.process_literal_node(literals_nodes, only_value)
-
-        return literals
-
     def source_path_by_contract(self, contract_name: str) -> str:
         """
         Get source path by contract name.
@@ -533,17 +682,15 @@ class StandardJsonParser(BaseParser):
         - May throw exception if no source file contains the contract.
         - May return unexpected result when the contract appears in multiple source files.
         """
-        pred = lambda node: node and node.get('nodeType') == 'ContractDefinition' and node.get('name') == contract_name
-        contract = self.extract_node(pred, self.output_json['sources'], first_only=True)[0]
-        return contract['source_id']
+        return self.all_source_path_by_contract(contract_name)[0]
 
     def all_source_path_by_contract(self, contract_name: str) -> Optional[List[str]]:
         """
         Get source path by contract name.
         """
-        pred = lambda node: node and node.get('nodeType') == 'ContractDefinition' and node.get('name') == contract_name
-        contracts = self.extract_node(pred, self.output_json['sources'], first_only=False)
-        return [c['source_id'] for c in contracts] if contracts else []
+        return [filename.split(':')[0] for filename, root in self.normalized_asts.items()
+                for node in root.children
+                if node.node_type == 'ContractDefinition' and node.get('name') == contract_name]
 
     def source_by_lines(self, contract_name: str, line_start: int, line_end: int) -> str:
         """
@@ -0,0 +1,148 @@
+# Index and decoder for the `storageLayout` (standard json) / `storage-layout` (combined json) output of solc.
+#
+# The layout is available for solc >= 0.6.5. All variables are indexed by slot once, with a precomputed
+# decoder for each of them, so that a raw storage dump can be decoded with one dictionary lookup per slot.
+#
+# See https://docs.soliditylang.org/en/latest/internals/layout_in_storage.html
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .fields import StorageVariable
+
+# static arrays longer than this are not expanded into elements
+MAX_EXPANDED_ARRAY_LENGTH = 256
+
+SlotValue = Union[int, str, bytes]
+
+_STATIC_ARRAY_LENGTH_PATTERN = re.compile(r'\)(\d+)_storage$')
+
+
+def to_int(value: Optional[SlotValue]) -> int:
+    '''Convert a slot key or a slot value to integer, hex strings with or without `0x` prefix are accepted'''
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (bytes, bytearray)):
+        return int.from_bytes(value, 'big')
+    value = value[2:] if value[:2].lower() == '0x' else value
+    return int(value, 16) if value else 0
+
+
+def _signed(bits: int) -> Callable[[int], int]:
+    sign_bit = 1 << (bits - 1)
+    return lambda v: v - (1 << bits) if v & sign_bit else v
+
+
+def _fixed_bytes(size: int) -> Callable[[int], str]:
+    return lambda v: '0x' + v.to_bytes(size, 'big').hex()
+
+
+def _short_bytes(as_string: bool) -> Callable[[int], Union[str, int]]:
+    def decode(v: int) -> Union[str, int]:
+        if v & 1:
+            # long value stored out of place, only the length is known from this slot
+            return (v - 1) // 2
+        length = (v & 0xff) // 2
+        data = v.to_bytes(32, 'big')[:length]
+        return data.decode('utf-8', errors='replace') if as_string else '0x' + data.hex()
+    return decode
+
+
+def value_decoder(type_label: str, encoding: str, size: int) -> Callable[[int], Any]:
+    '''Build a decoder converting the integer value of a variable to a python value'''
+    if encoding == 'dynamic_array':
+        return int  # the length of the array
+    if encoding == 'bytes':
+        return _short_bytes(type_label == 'string')
+    if type_label == 'bool':
+        return bool
+    if type_label.startswith('address') or type_label.startswith('contract ') or type_label.startswith('interface '):
+        return lambda v: f'0x{v:040x}'
+    if type_label.startswith('int'):
+        return _signed(size * 8)
+    if type_label.startswith('bytes'):
+        return _fixed_bytes(size)
+    # uint, enum, user defined value types and others are returned as is
+    return int
+
+
+class StorageLayout():
+    '''
+    Storage layout of one contract, indexed by slot.
+    - `variables`: all variables with members of structs and elements of small static arrays expanded
+    - `slots`: slot -> variables stored in the slot
+    '''
+    def __init__(self, layout: Union[dict, str]):
+        layout = json.loads(layout) if isinstance(layout, str) else (layout or {})
+        self.types: Dict[str, dict] = layout.get('types') or {}
+        self.variables: List[StorageVariable] = []
+        self.slots: Dict[int, List[StorageVariable]] = {}
+        # slot -> [(label, shift, mask, decoder)]
+        self._decoders: Dict[int, List[Tuple[str, int, int, Callable[[int], Any]]]] = {}
+
+        for entry in layout.get('storage') or []:
+            self.__add(entry['label'], int(entry['slot']), int(entry['offset']), entry['type'], entry.get('contract'))
+
+    def __add(self, label: str, slot: int, offset: int, type_id: str, contract: Optional[str]):
+        t = self.types.get(type_id, {})
+        encoding = t.get('encoding', 'inplace')
+        size = int(t.get('numberOfBytes', 32))
+        type_label = t.get('label', type_id)
+
+        if encoding == 'inplace' and t.get('members') is not None:
+            for m in t['members']:
+                self.__add(f"{label}.{m['label']}", slot + int(m['slot']), int(m['offset']), m['type'], contract)
+            return
+
+        if encoding == 'inplace' and t.get('base') is not None:
+            match = _STATIC_ARRAY_LENGTH_PATTERN.search(type_id)
+            length = int(match.group(1)) if match else 0
+            if 0 < length <= MAX_EXPANDED_ARRAY_LENGTH:
+                base = t['base']
+                base_size = int(self.types.get(base, {}).get('numberOfBytes', 32))
+                if base_size <= 16:
+                    per_slot = 32 // base_size
+                    for i in range(length):
+                        self.__add(f'{label}[{i}]', slot + i // per_slot, (i % per_slot) * base_size, base, contract)
+                else:
+                    slots_per_item = (base_size + 31) // 32
+                    for i in range(length):
+                        self.__add(f'{label}[{i}]', slot + i * slots_per_item, 0, base, contract)
+                return
+
+        var = StorageVariable(label=label, slot=slot, offset=offset, size=size, type=type_label, encoding=encoding, contract=contract)
+        self.variables.append(var)
+        self.slots.setdefault(slot, []).append(var)
+
+        if encoding == 'mapping':
+            return  # nothing stored in the slot itself
+        mask = (1 << (min(size, 32) * 8)) - 1
+        self._decoders.setdefault(slot, []).append((label, offset * 8, mask, value_decoder(type_label, encoding, size)))
+
+    def variables_by_slot(self, slot: SlotValue) -> List[StorageVariable]:
+        return self.slots.get(to_int(slot), [])
+
+    def decode_slot(self, slot: SlotValue, value: SlotValue) -> Dict[str, Any]:
+        '''Decode all variables stored in one slot'''
+        v = to_int(value)
+        return {label: decode((v >> shift) & mask) for label, shift, mask, decode in self._decoders.get(to_int(slot), ())}
+
+    def decode(self, storage: Dict[SlotValue, SlotValue]) -> Dict[str, Any]:
+        '''
+        Decode a raw storage dump `{slot: value}` to `{variable label: value}`.
+        Slots which do not belong to any variable, e.g. mapping entries, are ignored.
+        Values of dynamic arrays are their lengths, and so are `bytes` / `string` values stored out of place.
+        '''
+        out = {}
+        decoders = self._decoders
+        for slot, value in storage.items():
+            slot_decoders = decoders.get(to_int(slot))
+            if not slot_decoders:
+                continue
+            v = to_int(value)
+            for label, shift, mask, decode in slot_decoders:
+                out[label] = decode((v >> shift) & mask)
+        return out
@@ -1,6 +1,8 @@
 import unittest
 import json
-from solc_json_parser.abi import abi_from_binary
+from concurrent.futures import ThreadPoolExecutor
+from solc_json_parser import abi, opcodes
+from solc_json_parser.abi import abi_from_binary, abi_from_binaries, dispatch_table
 
 class TestAbiFromBinary(unittest.TestCase):
     def test_abi_from_binary(self):
@@ -29,3 +31,65 @@ class TestAbiFromBinary(unittest.TestCase):
             print(f'  {hsh}: {expected_fn_by_sig.get(hsh)}')
 
         self.assertEqual(sigs, set(expected_sigs.values()))
+
+    def test_abi_from_binaries(self):
+        with open('./tests/test_contracts/rubic.bin', 'r') as f:
+            binary = f.read()
+
+        expected = abi_from_binary(binary)
+        self.assertEqual(abi_from_binary(bytes.fromhex(binary)), expected)
+        self.assertEqual(abi_from_binary('0x' + binary), expected)
+
+        results = abi_from_binaries([binary, bytes.fromhex(binary), '6080'] * 30, max_workers=2)
+        self.assertEqual(results, [expected, expected, set()] * 30)
+
+    def test_dispatch_table(self):
+        with open('./tests/test_contracts/rubic.bin', 'r') as f:
+            binary = f.read()
+        with open('tests/test_contracts/rubic.hashes.json', 'r') as f:
+            expected_sigs = json.loads(f.read())
+
+        # rubic.bin is a deployment binary, dispatcher jump targets are relative to the runtime code
+        runtime = binary[binary.find('6080604052', 1):]
+        table = dispatch_table(runtime)
+        self.assertEqual(set(table.keys()), set(expected_sigs.values()))
+        self.assertEqual(table['01ffc9a7'], 0x228)
+        # comparisons in the binary search branches of the dispatcher, selector > 0x75829def
+        self.assertEqual(table['9e369235'], 0x6e2)
+        self.assertEqual(table['ec87621c'], 0x837)
+
+    def test_dispatch_table_ignores_function_bodies(self):
+        code = opcodes.assemble([
+            ('PUSH1', 4), 'CALLDATASIZE', 'LT', 'PUSH fallback', 'JUMPI',
+            ('PUSH1', 0), 'CALLDATALOAD', ('PUSH1', 0xe0), 'SHR',
+            'DUP1', ('PUSH4', 0x80000000), 'GT', 'PUSH high', 'JUMPI',
+            'DUP1', ('PUSH4', 0x01ffc9a7), 'EQ', 'PUSH supports_interface', 'JUMPI',
+            'PUSH fallback', 'JUMP',
+            'high:', 'JUMPDEST',
+            'DUP1', ('PUSH4', 0xa9059cbb), 'EQ', 'PUSH transfer', 'JUMPI',
+            'fallback:', 'JUMPDEST', ('PUSH1', 0), 'DUP1', 'REVERT',
+            # the body compares the interface id argument with a 4-byte constant
+            'supports_interface:', 'JUMPDEST', ('PUSH1', 4), 'CALLDATALOAD', ('PUSH1', 0xe0), 'SHR',
+            'DUP1', ('PUSH4', 0x36372b07), 'EQ', 'PUSH yes', 'JUMPI', 'STOP',
+            'yes:', 'JUMPDEST', 'STOP',
+            'transfer:', 'JUMPDEST', 'STOP',
+        ])
+        table = dispatch_table(code)
+        self.assertEqual(set(table), {'01ffc9a7', 'a9059cbb'})
+        self.assertEqual(code[table['a9059cbb']], opcodes.name_to_byte['JUMPDEST'])
+
+    def test_dispatch_table_cache_threads(self):
+        with open('./tests/test_contracts/rubic.bin', 'r') as f:
+            binary = f.read()
+        runtime = binary[binary.find('6080604052', 1):]
+        expected = dispatch_table(runtime)
+        # distinct codes, more than the cache holds, so that threads evict each other's entries
+        codes = [runtime + f'{i:04x}' for i in range(64)] * 4
+        cache_size = abi.DISPATCH_CACHE_SIZE
+        abi.DISPATCH_CACHE_SIZE = 8
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                tables = list(executor.map(dispatch_table, codes))
+        finally:
+            abi.DISPATCH_CACHE_SIZE = cache_size
+        self.assertTrue(all(table == expected for table in tables))
@@ -0,0 +1,65 @@
+import copy
+import json
+import unittest
+from solc_json_parser.corpus import DedupCompiler, input_key
+from solc_json_parser.solc_process import SolcLimitError
+
+
+class Parser():
+    def __init__(self, input, version, **kwargs):
+        if 'error' in str(input):
+            raise ValueError('compilation failed')
+        self.input = input
+        self.version = version
+
+
+class TestDedupCompiler(unittest.TestCase):
+    def test_input_key(self):
+        with open('./contracts/standard_json/75b8.standard-input.json') as f:
+            input_json = json.load(f)
+        reordered = copy.deepcopy(input_json)
+        reordered['sources'] = dict(reversed(list(input_json['sources'].items())))
+        reordered['settings']['optimizer'] = {'enabled': True, 'runs': 1}
+        self.assertEqual(input_key(input_json, '0.8.4', {}), input_key(reordered, '0.8.4', {}))
+        self.assertEqual(input_key(input_json, '0.8.4', {}), input_key(json.dumps(reordered), '0.8.4', {}))
+        self.assertNotEqual(input_key(input_json, '0.8.4', {}), input_key(input_json, '0.8.5', {}))
+        self.assertNotEqual(input_key(input_json, '0.8.4', {}), input_key(input_json, '0.8.4', {'output_profile': 'sourcemap'}))
+
+        source = './contracts/standard_json/a.sol'
+        with open(source) as f:
+            content = f.read()
+        self.assertNotEqual(input_key(content, '0.8.4', {}), input_key(content.replace('\n', '\r\n'), '0.8.4', {}))
+
+    def test_parse_many(self):
+        compiler = DedupCompiler(parser_factory=Parser, max_workers=4)
+        inputs = [({'sources': {'A.sol': {'content': 'contract A {}'}}}, '0.8.4'),
+                  ({'sources': {'A.sol': {'content': 'contract A {}'}}, 'settings': {'optimizer': {'enabled': True}}}, '0.8.4'),
+                  ({'sources': {'A.sol': {'content': 'contract A {}'}}}, '0.8.5'),
+                  ('contract error {}\n', '0.8.4'),
+                  ('contract error {}\n', '0.8.4')]
+        results = compiler.parse_many(inputs)
+        self.assertIs(results[0], results[1])
+        self.assertIsNot(results[0], results[2])
+        self.assertIsInstance(results[3], ValueError)
+        self.assertIs(results[3], results[4])
+        self.assertEqual((compiler.stats.inputs, compiler.stats.unique, compiler.stats.duplicates, compiler.stats.failed), (5, 3, 2, 1))
+        self.assertIn('2 duplicates', compiler.stats.report())
+
+    def test_transient_errors_are_retried(self):
+        calls = []
+
+        def parser_factory(input, version, **kwargs):
+            calls.append(input)
+            if len(calls) == 1:
+                raise SolcLimitError('timeout', 'solc did not finish in 1 seconds')
+            return Parser(input, version)
+
+        compiler = DedupCompiler(parser_factory=parser_factory)
+        input = {'sources': {'A.sol': {'content': 'contract A {}'}}}
+        with self.assertRaises(SolcLimitError):
+            compiler(input, '0.8.4')
+        parser = compiler(input, '0.8.4')
+        self.assertIsInstance(parser, Parser)
+        self.assertIs(compiler(input, '0.8.4'), parser)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((compiler.stats.inputs, compiler.stats.unique, compiler.stats.duplicates, compiler.stats.failed), (3, 1, 1, 0))
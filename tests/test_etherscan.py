@@ -0,0 +1,49 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from solc_json_parser.etherscan import compile_etherscan_contracts, iter_etherscan_dir, parse_etherscan_file, parse_etherscan_response
+
+
+class TestEtherscan(unittest.TestCase):
+    def test_standard_json_response(self):
+        path = './contracts/standard_json/0x8252Df1d8b29057d1Afe3062bf5a64D503152BC8.etherscan.json'
+        contract = parse_etherscan_file(path)
+        self.assertEqual(contract.contract_name, 'DirectLoanFixedOfferRedeploy')
+        self.assertEqual(contract.version, '0.8.4')
+        self.assertEqual(len(contract.input_json['sources']), 37)
+
+        with open(path) as f:
+            response = {'status': '1', 'message': 'OK', 'result': [json.load(f)]}
+        self.assertEqual(parse_etherscan_response(response).input_json, contract.input_json)
+
+    def test_single_and_multi_file_responses(self):
+        record = {'SourceCode': 'pragma solidity ^0.4.24;\ncontract Token {}\n', 'ContractName': 'Token',
+                  'CompilerVersion': 'v0.4.24+commit.e67f0147', 'OptimizationUsed': '1', 'Runs': '200',
+                  'EVMVersion': 'Default', 'Library': ''}
+        contract = parse_etherscan_response(json.dumps(record))
+        self.assertEqual(contract.version, '0.4.24')
+        self.assertEqual(contract.input_json['sources'], {'Token.sol': {'content': record['SourceCode']}})
+        self.assertEqual(contract.input_json['settings'], {'optimizer': {'enabled': True, 'runs': 200}})
+
+        sources = {'Main.sol': {'content': 'import "./Lib.sol";\ncontract Main {}\n'},
+                   'Lib.sol': {'content': 'library Math {}\n'}}
+        record.update(SourceCode=json.dumps(sources), EVMVersion='Istanbul', Library='Math:5a0b54d5dc17e0aadc383d2db43b0a0d3e029c4c')
+        contract = parse_etherscan_response(record)
+        self.assertEqual(contract.input_json['sources'], sources)
+        self.assertEqual(contract.input_json['settings']['evmVersion'], 'istanbul')
+        self.assertEqual(contract.input_json['settings']['libraries'], {'Lib.sol': {'Math': '0x5a0b54d5dc17e0aadc383d2db43b0a0d3e029c4c'}})
+
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.mkdir(os.path.join(d, 'sub'))
+            for name in ('0x8252Df1d8b29057d1Afe3062bf5a64D503152BC8', '0xef021df619298c2c9dd1b829820b8d762b0c8977'):
+                shutil.copy(f'./contracts/standard_json/{name}.etherscan.json', os.path.join(d, 'sub', f'{name}.json'))
+            with open(os.path.join(d, 'other.json'), 'w') as f:
+                f.write('{}')
+
+            factory = lambda input_json, version: (version, len(input_json['sources']))
+            results = list(compile_etherscan_contracts(iter_etherscan_dir(d), parser_factory=factory, max_workers=1))
+            self.assertEqual([(c.contract_name, r) for c, r in results],
+                             [('DirectLoanFixedOfferRedeploy', ('0.8.4', 37)), ('BTWT', ('0.8.17', 5))])
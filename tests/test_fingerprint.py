@@ -0,0 +1,58 @@
+import unittest
+import json
+import os
+import tempfile
+from solc_json_parser.fingerprint import FingerprintIndex
+from solc_json_parser import opcodes
+
+output_path = './contracts/standard_json/v4/TetherToken_solc_output.json'
+
+class TestFingerprintIndex(unittest.TestCase):
+    def setUp(self):
+        with open(output_path, 'r') as f:
+            self.output_json = json.load(f)
+        self.index = FingerprintIndex()
+        self.index.add_standard_output(self.output_json, source=output_path)
+        self.code = self.output_json['contracts']['TetherToken.sol']['TetherToken']['evm']['deployedBytecode']['object']
+
+    def test_resolve(self):
+        fp = self.index.resolve(self.code)
+        self.assertEqual((fp.filename, fp.contract_name, fp.source), ('TetherToken.sol', 'TetherToken', output_path))
+
+        # on-chain code has a different metadata trailer
+        code = bytes.fromhex(self.code)
+        live = code[:opcodes.metadata_start(code)] + bytes.fromhex('a165627a7a72305820') + bytes(32) + bytes.fromhex('0029')
+        self.assertEqual(self.index.resolve(live).contract_name, 'TetherToken')
+        self.assertIsNone(self.index.resolve(bytes.fromhex('6080604052')))
+
+    def test_masks(self):
+        # PUSH32 <immutable> POP PUSH32 <constant> POP
+        compiled = bytes([0x7f]) + bytes(32) + bytes([0x50, 0x7f]) + b'\x01' * 32 + bytes([0x50])
+        index = FingerprintIndex()
+        index.add(compiled, 'WithImmutable', masks=[(1, 32)])
+
+        live = bytes([0x7f]) + b'\x02' * 32 + compiled[33:]
+        self.assertEqual(index.resolve(live).contract_name, 'WithImmutable')
+
+        live_other_constant = compiled[:35] + b'\x03' * 32 + compiled[67:]
+        self.assertIsNone(index.resolve(live_other_constant))
+
+    def test_combined_output_linked_library(self):
+        # PUSH20 <library address> POP PUSH1 0x01
+        placeholder = '__$' + 'ab' * 17 + '$__'
+        output = {'contracts/A.sol:A': {'bin-runtime': f'73{placeholder}506001'}}
+        index = FingerprintIndex()
+        index.add_combined_output(output)
+
+        live = '73' + '11' * 20 + '506001'
+        fp = index.resolve(live)
+        self.assertEqual((fp.filename, fp.contract_name, fp.masks), ('contracts/A.sol', 'A', [(1, 20)]))
+        self.assertIsNone(index.resolve('73' + '11' * 20 + '506002'))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'fingerprints.json')
+            self.index.save(path)
+            loaded = FingerprintIndex.load(path)
+        self.assertEqual(len(loaded), len(self.index))
+        self.assertEqual(loaded.resolve(self.code), self.index.resolve(self.code))
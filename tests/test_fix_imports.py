@@ -0,0 +1,33 @@
+import os
+import tempfile
+import unittest
+from solc_json_parser.fix_imports import build_filename_index, fix_projects
+
+
+class TestFixImports(unittest.TestCase):
+    def test_filename_index(self):
+        index = build_filename_index(['root/01_02_Token.sol', 'root/101_155_ERC20.sol', 'root/Plain.sol', 'root/02_02_Token.sol'])
+        self.assertEqual(index['Token.sol'], '01_02_Token.sol')
+        self.assertEqual(index['ERC20.sol'], '101_155_ERC20.sol')
+        self.assertEqual(index['Plain.sol'], 'Plain.sol')
+        self.assertEqual(index['02_02_Token.sol'], '02_02_Token.sol')
+
+    def test_fix_projects_dry_run(self):
+        with tempfile.TemporaryDirectory() as d:
+            files = {
+                '01_02_Main.sol': 'import "@openzeppelin/contracts/token/ERC20.sol";\ncontract Main {}\n',
+                '02_02_ERC20.sol': 'contract ERC20 {}\n',
+            }
+            for name, content in files.items():
+                with open(os.path.join(d, name), 'w') as f:
+                    f.write(content)
+
+            main = os.path.join(d, '01_02_Main.sol')
+            result = fix_projects([d], dry_run=True)
+            self.assertEqual(result, {d: {main: 'import "./02_02_ERC20.sol";\ncontract Main {}\n'}})
+            with open(main) as f:
+                self.assertEqual(f.read(), files['01_02_Main.sol'])
+
+            fix_projects([d])
+            with open(main) as f:
+                self.assertEqual(f.read(), result[d][main])
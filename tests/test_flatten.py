@@ -1,6 +1,8 @@
 from dataclasses import dataclass
+import os
+import tempfile
 import unittest
-from solc_json_parser.flatten import FlattenLine, FlattenSolidity
+from solc_json_parser.flatten import FlattenLine, FlattenSolidity, SourceFileCache, build_import_graph, flatten_many
 
 class ExpectedMapping():
     def __init__(self, path: str, expected_line_mappings = [FlattenLine]):
@@ -75,3 +77,67 @@ class TestSourceByPc(unittest.TestCase):
                 FlattenLine('path_ignored', '04_20_BridgeBase.sol', 355, 'function setMaxTokenAmount(address _token, uint256 _maxTokenAmount) external onlyManagerOrAdmin {', 2182, 'function setMaxTokenAmount(address _token, uint256 _maxTokenAmount) external onlyManagerOrAdmin {'),
 
             ]))
+
+    def test_flatten_many_with_shared_cache(self):
+        paths = ['./tests/test_contracts/flatten/01/01_13_INSURToken.sol', './tests/test_contracts/flatten/C.sol',
+                 './tests/test_contracts/flatten/D.sol']
+        cache = SourceFileCache()
+        results = flatten_many(paths, file_cache=cache, max_workers=2)
+        for path, result in zip(paths, results):
+            self.assertEqual(result.flatten_source(), FlattenSolidity(path).flatten_source())
+
+    def test_file_cache_invalidation(self):
+        cache = SourceFileCache()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'A.sol')
+            with open(path, 'w') as f:
+                f.write('contract A {}')
+            self.assertEqual(cache.lines(path), ['contract A {}'])
+            with open(path, 'w') as f:
+                f.write('contract A {}\ncontract B {}\n')
+            self.assertEqual(cache.lines(path), ['contract A {}\n', 'contract B {}\n'])
+
+    def test_offset_map(self):
+        f = FlattenSolidity('./tests/test_contracts/flatten/B.sol')
+        source = f.flatten_source()
+        offset_map = f.offset_map()
+
+        begin = source.index('contract A{')
+        path, offset, linenum = offset_map.translate(begin)
+        self.assertEqual(os.path.basename(path), 'A.sol')
+        with open(path) as fa:
+            self.assertTrue(fa.read()[offset:].startswith('contract A{'))
+        self.assertEqual(linenum, 3)
+
+        begin = source.index('contract B{')
+        result = {'pc': 0, 'begin': begin, 'end': begin + len('contract B{\n\n}'), 'linenums': [12, 14],
+                  'fragment': 'contract B{\n\n}', 'source_path': 'B_flattened.sol'}
+        [translated, missing] = offset_map.translate_results([result, None])
+        self.assertIsNone(missing)
+        self.assertEqual(os.path.basename(translated['source_path']), 'B.sol')
+        self.assertEqual(translated['linenums'], [6, 8])
+        with open(translated['source_path'], 'rb') as fb:
+            self.assertEqual(fb.read()[translated['begin']:translated['end']].decode(), result['fragment'])
+
+    def test_import_graph(self):
+        graph = build_import_graph('./tests/test_contracts/flatten/C.sol')
+        order = [os.path.basename(p) for p in graph.topological_order()]
+        self.assertEqual(order, ['A.sol', 'B.sol', 'C.sol'])
+        a = os.path.abspath('./tests/test_contracts/flatten/A.sol')
+        self.assertEqual(graph.dependents([a]), set(graph.imports))
+        self.assertEqual(graph.changed_files(), [])
+
+    def test_flatten_same_file_names(self):
+        with tempfile.TemporaryDirectory() as d:
+            os.mkdir(os.path.join(d, 'lib'))
+            files = {
+                'Main.sol': 'import "./Token.sol";\nimport "./lib/Token.sol";\ncontract Main {}\n',
+                'Token.sol': 'contract Token {}\n',
+                'lib/Token.sol': 'contract LibToken {}\n',
+            }
+            for name, content in files.items():
+                with open(os.path.join(d, name), 'w') as f:
+                    f.write(content)
+            source = FlattenSolidity(os.path.join(d, 'Main.sol')).flatten_source()
+            self.assertIn('contract Token {}', source)
+            self.assertIn('contract LibToken {}', source)
@@ -0,0 +1,29 @@
+import unittest
+from solc_json_parser import ast_shared as s
+
+lib_name = 'contracts/Lib.sol:Lib'
+other_name = 'contracts/Other.sol:Other'
+address = '0x' + 'ab' * 20
+
+class TestLinkBytecode(unittest.TestCase):
+    def setUp(self):
+        self.placeholder = f'__${s.placeholder_hash(lib_name)}$__'
+        other = f'__${s.placeholder_hash(other_name)}$__'
+        # PUSH20 <Lib> PUSH20 <Other> PUSH20 <Lib>
+        self.bytecode = f'73{self.placeholder}73{other}73{self.placeholder}'
+        self.expected = f'73{"ab" * 20}73{other}73{"ab" * 20}'
+
+    def test_link_by_placeholder(self):
+        self.assertEqual(s.link_bytecode(self.bytecode, {lib_name: address}), self.expected)
+
+    def test_link_by_references(self):
+        refs = {'contracts/Lib.sol': {'Lib': [{'start': 1, 'length': 20}, {'start': 43, 'length': 20}]}}
+        self.assertEqual(s.link_bytecode(self.bytecode, {lib_name: address}, refs), self.expected)
+
+    def test_link_legacy_placeholder(self):
+        bytecode = '73__contracts/Lib.sol:Lib_________________'
+        self.assertEqual(s.link_bytecode(bytecode, {lib_name: address}), f'73{"ab" * 20}')
+
+    def test_invalid_address(self):
+        with self.assertRaises(ValueError):
+            s.link_bytecode(self.bytecode, {lib_name: '0x1234'})
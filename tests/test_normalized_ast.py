@@ -0,0 +1,47 @@
+import unittest
+from solc_json_parser.normalized_ast import normalize_ast
+
+# `function f(uint a) public onlyOwner {}` in both AST dialects
+V8_FUNCTION = {
+    'nodeType': 'FunctionDefinition', 'id': 10, 'src': '20:40:1', 'name': 'f', 'kind': 'function', 'visibility': 'public',
+    'body': {'nodeType': 'Block', 'id': 9, 'src': '58:2:1', 'statements': []},
+    'modifiers': [{'nodeType': 'ModifierInvocation', 'id': 8, 'src': '48:9:1',
+                   'modifierName': {'nodeType': 'IdentifierPath', 'id': 7, 'name': 'onlyOwner', 'src': '48:9:1'}}],
+    'parameters': {'nodeType': 'ParameterList', 'id': 5, 'src': '30:8:1', 'parameters': [
+        {'nodeType': 'VariableDeclaration', 'id': 4, 'src': '31:6:1', 'name': 'a',
+         'typeDescriptions': {'typeIdentifier': 't_uint256', 'typeString': 'uint256'}}]},
+    'returnParameters': {'nodeType': 'ParameterList', 'id': 6, 'src': '46:0:1', 'parameters': []},
+}
+
+LEGACY_FUNCTION = {
+    'name': 'FunctionDefinition', 'id': 10, 'src': '20:40:1',
+    'attributes': {'name': 'f', 'visibility': 'public', 'isConstructor': False},
+    'children': [
+        {'name': 'ParameterList', 'id': 5, 'src': '30:8:1', 'children': [
+            {'name': 'VariableDeclaration', 'id': 4, 'src': '31:6:1', 'attributes': {'name': 'a', 'type': 'uint256'}}]},
+        {'name': 'ParameterList', 'id': 6, 'src': '46:0:1', 'attributes': {'parameters': [None]}, 'children': []},
+        {'name': 'ModifierInvocation', 'id': 8, 'src': '48:9:1', 'children': [
+            {'name': 'Identifier', 'id': 7, 'src': '48:9:1', 'attributes': {'type': 'modifier ()', 'value': 'onlyOwner'}}]},
+        {'name': 'Block', 'id': 9, 'src': '58:2:1', 'children': []},
+    ]
+}
+
+
+class TestNormalizedAst(unittest.TestCase):
+    def test_both_dialects_are_normalized(self):
+        for raw, v8 in [(V8_FUNCTION, True), (LEGACY_FUNCTION, False)]:
+            node = normalize_ast(raw, v8)
+            self.assertEqual('FunctionDefinition', node.node_type)
+            self.assertEqual((20, 40, 1), node.src)
+            self.assertEqual('f', node.get('name'))
+            self.assertIs(raw, node.raw)
+
+            parameters, returns = node.children_by_type('ParameterList')
+            self.assertEqual(['uint256'], [p.get('type') for p in parameters.children])
+            self.assertEqual([], returns.children)
+            self.assertEqual(['onlyOwner'], [m.get('modifier') for m in node.children_by_type('ModifierInvocation')])
+
+    def test_walk_and_contains(self):
+        node = normalize_ast(V8_FUNCTION, True)
+        containing = [n.id for n in node.walk() if n.contains(49, 50)]
+        self.assertEqual([10, 8, 7], containing)
@@ -0,0 +1,64 @@
+import unittest
+from solc_json_parser import opcodes
+
+code_hex = '60806040525f80fdfea26469706673582212200466fd4ed0d73499199c39545f7019da158defa354cc0051afe02754ec8e32b464736f6c63430008180033'
+
+class TestDisassemble(unittest.TestCase):
+    def test_disassemble(self):
+        code = bytes.fromhex(code_hex)
+        dis = opcodes.disassemble(code)
+        self.assertEqual(list(dis.pcs), [0, 2, 4, 5, 6, 7, 8])
+        self.assertEqual([opcodes.byte_to_name[op] for op in dis.opcodes],
+                         ['PUSH1', 'PUSH1', 'MSTORE', 'PUSH0', 'DUP1', 'REVERT', 'INVALID'])
+        self.assertEqual(dis.operand(1), b'\x40')
+        self.assertEqual(dis.metadata, code[9:])
+
+        dis = opcodes.disassemble(code, split_metadata=False)
+        self.assertEqual(dis.metadata, b'')
+        self.assertEqual(opcodes.byte_to_name[dis.opcodes[7]], 'LOG2')
+
+    def test_disassemble_stream(self):
+        code = bytes.fromhex(code_hex) * 3000
+        chunks = [code[i:i + 1000] for i in range(0, len(code), 1000)]
+        blocks = list(opcodes.disassemble_stream(chunks))
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual([i for b in blocks for i in b], list(opcodes.disassemble(code)))
+        self.assertEqual(blocks[-1].metadata, bytes.fromhex(code_hex)[9:])
+
+
+class TestAssemble(unittest.TestCase):
+    def test_round_trip(self):
+        code = bytes.fromhex(code_hex)
+        dis = opcodes.disassemble(code)
+        self.assertEqual(opcodes.reassemble(dis), code)
+
+        lines = [opcodes.format_instruction(op, operand) for _, op, operand in dis]
+        self.assertEqual(opcodes.assemble(lines), code[:len(dis.code)])
+
+    def test_labels(self):
+        code = opcodes.assemble(['PUSH end', 'JUMP'] + ['STOP'] * 300 + ['end:', 'JUMPDEST', ('PUSH1', 1)])
+        self.assertEqual(code[:3], bytes([opcodes.name_to_byte['PUSH2'], 0x01, 0x30]))
+        self.assertEqual(code[0x130:], bytes([opcodes.name_to_byte['JUMPDEST'], opcodes.name_to_byte['PUSH1'], 1]))
+
+        with self.assertRaises(ValueError):
+            opcodes.assemble([('PUSH1', 'missing')])
+
+    def test_truncated_push(self):
+        self.assertEqual(opcodes.assemble(['STOP', ('PUSH4', '0x0102')]), bytes.fromhex('00630102'))
+        # offsets after a truncated PUSH would be wrong
+        with self.assertRaises(ValueError):
+            opcodes.assemble([('PUSH4', '0x0102'), 'end:', 'JUMPDEST'])
+        with self.assertRaises(ValueError):
+            opcodes.assemble([('PUSH4', '0x0102'), 'STOP'])
+
+
+class TestCodeBitmap(unittest.TestCase):
+    def test_code_bitmap(self):
+        # PUSH1 0x5b JUMPDEST PUSH2 0x5b5b JUMPDEST STOP
+        code = bytes.fromhex('605b5b615b5b5b00')
+        bitmap = opcodes.code_bitmap(code)
+        self.assertIsInstance(bitmap.jumpdests, bytearray)
+        self.assertEqual([i for i in range(len(code)) if bitmap.is_instruction_start(i)], [0, 2, 3, 6, 7])
+        self.assertEqual([i for i in range(len(code)) if bitmap.is_jumpdest(i)], [2, 6])
+        self.assertEqual(bitmap.instruction_start(5), 3)
+        self.assertFalse(bitmap.is_jumpdest(8))
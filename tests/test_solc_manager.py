@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import http.server
+import json
+import os
+import re
+import tempfile
+import threading
+import unittest
+from Crypto.Hash import keccak
+from solc_json_parser.solc_manager import SolcChecksumError, SolcManager
+
+
+def build_of(version: str, content: bytes) -> dict:
+    k = keccak.new(digest_bits=256)
+    k.update(content)
+    return {'path': f'solc-linux-amd64-v{version}+commit.00000000', 'version': version, 'build': 'commit.00000000',
+            'sha256': '0x' + hashlib.sha256(content).hexdigest(), 'keccak256': '0x' + k.hexdigest()}
+
+
+class RangeHandler(http.server.SimpleHTTPRequestHandler):
+    '''Serves a directory, answers `Range: bytes=<start>-` with 206, or 416 past the end of the file'''
+    requests: list = []
+    ranges = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('Range')))
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range') or '')
+        path = self.translate_path(self.path)
+        if not self.ranges or not match or not os.path.isfile(path):
+            return super().do_GET()
+        with open(path, 'rb') as f:
+            content = f.read()
+        start = int(match.group(1))
+        if start >= len(content):
+            self.send_response(416)
+            self.send_header('Content-Range', f'bytes */{len(content)}')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{len(content) - 1}/{len(content)}')
+        self.send_header('Content-Length', str(len(content) - start))
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+
+class TestSolcManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mirror = os.path.join(self.tmp.name, 'mirror')
+        self.install_dir = os.path.join(self.tmp.name, 'bin')
+        os.mkdir(self.mirror)
+        self.contents = {'0.8.1': b'solc 0.8.1' * 1000, '0.8.2': b'solc 0.8.2' * 1000, '0.8.3': b'solc 0.8.3'}
+        builds = [build_of(v, c) for v, c in self.contents.items()]
+        for b in builds:
+            with open(os.path.join(self.mirror, b['path']), 'wb') as f:
+                f.write(self.contents[b['version']])
+        # corrupted binary in the mirror
+        with open(os.path.join(self.mirror, builds[2]['path']), 'wb') as f:
+            f.write(b'corrupted')
+        with open(os.path.join(self.mirror, 'list.json'), 'w') as f:
+            json.dump({'builds': builds}, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_install_many(self):
+        manager = SolcManager(install_dir=self.install_dir, mirror_dir=self.mirror)
+        # an interrupted download is resumed
+        os.makedirs(self.install_dir)
+        with open(manager.bin_path('0.8.2') + '.part', 'wb') as f:
+            f.write(self.contents['0.8.2'][:100])
+
+        results = manager.install_many()
+        for version in ('0.8.1', '0.8.2'):
+            self.assertEqual(results[version], manager.bin_path(version))
+            with open(results[version], 'rb') as f:
+                self.assertEqual(f.read(), self.contents[version])
+            self.assertTrue(os.access(results[version], os.X_OK))
+        self.assertIsInstance(results['0.8.3'], SolcChecksumError)
+        self.assertFalse(os.path.exists(manager.bin_path('0.8.3')))
+        self.assertFalse(os.path.exists(manager.bin_path('0.8.3') + '.part'))
+
+    def test_solc_bin_resolver(self):
+        manager = SolcManager(install_dir=self.install_dir, mirror_dir=self.mirror)
+        path = manager('0.8.1')
+        self.assertTrue(os.path.isfile(path))
+        os.remove(os.path.join(self.mirror, build_of('0.8.1', self.contents['0.8.1'])['path']))
+        self.assertEqual(manager('0.8.1'), path)
+
+        offline = SolcManager(install_dir=self.install_dir, mirror_dir=self.mirror, install_missing=False)
+        self.assertFalse(os.path.exists(offline('0.8.2')))
+
+    def serve_mirror(self, ranges: bool = True) -> str:
+        handler = type('Handler', (RangeHandler,), {'requests': [], 'ranges': ranges})
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(handler, directory=self.mirror))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.handler = handler
+        return f'http://127.0.0.1:{server.server_address[1]}'
+
+    def write_part(self, manager: SolcManager, version: str, content: bytes):
+        os.makedirs(self.install_dir, exist_ok=True)
+        with open(manager.bin_path(version) + '.part', 'wb') as f:
+            f.write(content)
+
+    def installed(self, manager: SolcManager, version: str) -> bytes:
+        with open(manager.install(version), 'rb') as f:
+            return f.read()
+
+    def test_install_over_http(self):
+        manager = SolcManager(install_dir=self.install_dir, base_url=self.serve_mirror())
+        # resumed with a range request, answered by 206
+        self.write_part(manager, '0.8.1', self.contents['0.8.1'][:100])
+        self.assertEqual(self.installed(manager, '0.8.1'), self.contents['0.8.1'])
+        self.assertIn('bytes=100-', [r for _, r in self.handler.requests])
+
+        # a complete download which was not moved into place is not downloaded again
+        self.write_part(manager, '0.8.2', self.contents['0.8.2'])
+        requests = len(self.handler.requests)
+        self.assertEqual(self.installed(manager, '0.8.2'), self.contents['0.8.2'])
+        self.assertEqual(len(self.handler.requests), requests)
+
+    def test_resume_rejected_by_server(self):
+        manager = SolcManager(install_dir=self.install_dir, base_url=self.serve_mirror())
+        # longer than the binary, the server answers the range with 416 and the download starts over
+        self.write_part(manager, '0.8.1', self.contents['0.8.1'] + b'garbage')
+        self.assertEqual(self.installed(manager, '0.8.1'), self.contents['0.8.1'])
+        ranges = [r for path, r in self.handler.requests if path != '/list.json']
+        self.assertEqual(ranges, [f'bytes={len(self.contents["0.8.1"]) + 7}-', None])
+        self.assertFalse(os.path.exists(manager.bin_path('0.8.1') + '.part'))
+
+    def test_server_ignoring_ranges(self):
+        manager = SolcManager(install_dir=self.install_dir, base_url=self.serve_mirror(ranges=False))
+        self.write_part(manager, '0.8.1', self.contents['0.8.1'][:100])
+        self.assertEqual(self.installed(manager, '0.8.1'), self.contents['0.8.1'])
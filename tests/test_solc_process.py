@@ -0,0 +1,137 @@
+import os
+import signal
+import stat
+import subprocess
+import tempfile
+import time
+import unittest
+import json
+from concurrent.futures import ThreadPoolExecutor
+from solc_json_parser.combined_json_parser import CombinedJsonParser
+from solc_json_parser.solc_process import SolcLimitError, SolcLimits, run_solc, solc_command
+from solc_json_parser.standard_json_parser import compile_standard
+
+
+def is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # killed orphans stay zombies until reaped by init
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return True
+
+
+class TestSolcProcess(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def script(self, name: str, body: str) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as f:
+            f.write(f'#!/bin/sh\n{body}\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def test_output(self):
+        solc = self.script('solc', 'cat')
+        self.assertEqual(run_solc([solc], input='{"sources": {}}', limits=SolcLimits(timeout=10)), '{"sources": {}}')
+        self.assertEqual(compile_standard('0.8.4', {'sources': {}}, lambda _: solc, limits=SolcLimits(timeout=10)), {'sources': {}})
+
+        failing = self.script('failing', 'echo error >&2; exit 1')
+        with self.assertRaises(subprocess.CalledProcessError):
+            run_solc([failing], input='')
+
+    def test_timeout_kills_process_group(self):
+        pid_file = os.path.join(self.tmp.name, 'child.pid')
+        solc = self.script('solc', f'sleep 30 & echo $! > {pid_file}; wait')
+        start = time.time()
+        with self.assertRaises(SolcLimitError) as ctx:
+            run_solc([solc], input='', limits=SolcLimits(timeout=0.5))
+        self.assertEqual(ctx.exception.reason, 'timeout')
+        self.assertLess(time.time() - start, 10)
+
+        with open(pid_file) as f:
+            child = int(f.read())
+        self.assertFalse(is_running(child))
+
+    def test_cpu_limit(self):
+        solc = self.script('solc', 'while :; do :; done')
+        with self.assertRaises(SolcLimitError) as ctx:
+            run_solc([solc], input='', limits=SolcLimits(timeout=30, max_cpu_seconds=1))
+        self.assertEqual(ctx.exception.reason, 'cpu')
+
+    def test_limits_apply_from_start(self):
+        # solc compiling files does not read its input, the limit is already set when it starts
+        solc = self.script('solc', "grep 'Max address space' /proc/$$/limits")
+        output = run_solc([solc], limits=SolcLimits(timeout=10, max_memory=1 << 30))
+        self.assertEqual(output.split()[3:5], [str(1 << 30)] * 2)
+
+    def test_memory_and_signals(self):
+        bad_alloc = self.script('bad_alloc', "echo \"terminate called after throwing an instance of 'std::bad_alloc'\" >&2; kill -ABRT $$")
+        with self.assertRaises(SolcLimitError) as ctx:
+            run_solc([bad_alloc], input='', limits=SolcLimits(max_memory=1 << 30))
+        self.assertEqual(ctx.exception.reason, 'memory')
+
+        # an internal compiler error is not reported as running out of memory
+        assertion = self.script('assertion', 'echo "Internal compiler error" >&2; kill -ABRT $$')
+        with self.assertRaises(subprocess.CalledProcessError) as ctx:
+            run_solc([assertion], input='', limits=SolcLimits(max_memory=1 << 30))
+        self.assertNotIsInstance(ctx.exception, SolcLimitError)
+        self.assertEqual(ctx.exception.returncode, -signal.SIGABRT)
+
+    def test_compiler_crash_tries_next_version(self):
+        output = {'contracts': {'<stdin>:A': {'abi': '[]'}}, 'sources': {}}
+        solcs = {'0.8.4': self.script('solc-v0.8.4', 'echo "Internal compiler error" >&2; kill -ABRT $$'),
+                 '0.7.0': self.script('solc-v0.7.0', f"echo '{json.dumps(output)}'")}
+        source = 'pragma solidity >=0.7.0 <0.9.0;\ncontract A {}\n'
+        parser = CombinedJsonParser(source, version='0.8.4', retry_num=1, lazy=True,
+                                    solc_bin_resolver=lambda v: solcs[v], solc_limits=SolcLimits(timeout=10))
+        parser.compile()
+        self.assertEqual(parser.exact_version, '0.7.0')
+        self.assertEqual(parser.solc_json_ast['A']['abi'], [])
+
+    def test_solc_command(self):
+        command = solc_command('solc', None, {'@oz': 'node_modules/@oz'}, combined_json=['abi', 'ast'], optimize=True,
+                               base_path=None, evm_version='london', optimize_runs=200)
+        self.assertEqual(command, ['solc', '@oz=node_modules/@oz', '--combined-json', 'abi,ast', '--optimize',
+                                   '--evm-version', 'london', '--optimize-runs', '200', '-'])
+        self.assertEqual(solc_command('solc', ['a.sol']), ['solc', 'a.sol'])
+
+    def test_combined_json_compile_in_threads(self):
+        # records the working directory and the binary running the compilation
+        output = {'contracts': {'<stdin>:A': {'abi': '[]'}}, 'sources': {}}
+        solcs = {}
+        for version in ('0.7.6', '0.8.4'):
+            solcs[version] = self.script(f'solc-v{version}', f'echo {version} > compiled_with; echo \'{json.dumps(output)}\'')
+
+        projects = []
+        for i, version in enumerate(['0.7.6', '0.8.4'] * 4):
+            root = os.path.join(self.tmp.name, f'project{i}')
+            os.mkdir(root)
+            path = os.path.join(root, 'A.sol')
+            with open(path, 'w') as f:
+                f.write(f'pragma solidity {version};\ncontract A {{}}\n')
+            projects.append((path, version))
+
+        cwd = os.getcwd()
+        def compile(project):
+            path, version = project
+            parser = CombinedJsonParser(path, version=version, lazy=True, solc_bin_resolver=lambda v: solcs[v])
+            parser.compile()
+            return parser
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            parsers = list(executor.map(compile, projects))
+        self.assertEqual(os.getcwd(), cwd)
+        for parser, (path, version) in zip(parsers, projects):
+            self.assertEqual(parser.root_path, os.path.dirname(path))
+            self.assertEqual(parser.solc_json_ast['A']['abi'], [])
+            with open(os.path.join(parser.root_path, 'compiled_with')) as f:
+                self.assertEqual(f.read().strip(), version)
@@ -0,0 +1,20 @@
+import unittest
+from solc_json_parser import ast_shared as s
+
+class TestSourceMap(unittest.TestCase):
+    def test_decode_src_mapping(self):
+        srcmap = '1:2:1;:9;2:1:2;;3::0:i:1;;:5:-1:o'
+        sm = s.decode_src_mapping(srcmap)
+        self.assertEqual(len(sm), 7)
+        self.assertEqual([sm[i] for i in range(len(sm))], [
+            (1, 2, 1, '-', 0),
+            (1, 9, 1, '-', 0),
+            (2, 1, 2, '-', 0),
+            (2, 1, 2, '-', 0),
+            (3, 1, 0, 'i', 1),
+            (3, 1, 0, 'i', 1),
+            (3, 5, -1, 'o', 1),
+        ])
+        self.assertEqual([sm[i] for i in range(len(sm))], list(s.iter_src_mapping(srcmap)))
+        self.assertEqual(s.parse_src_mapping(srcmap)[1], {'s': 1, 'l': 9, 'f': 1})
+        self.assertEqual(len(s.decode_src_mapping('')), 0)
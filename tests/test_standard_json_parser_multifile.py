@@ -90,3 +90,55 @@ class TestStandardJsonParser(unittest.TestCase):
         expected_numbers = {10}
         expected_strings = {"myFunction(uint)"}
         self.assertEqual(literals['string'], expected_strings)
+
+    def test_literals_with_base_contracts(self):
+        literals = self.parser.get_literals('Main', only_value=True)
+        self.assertEqual(literals['number'], set())
+
+        literals = self.parser.get_literals('Main', only_value=True, with_base_contracts=True)
+        expected_numbers = {1, 2, 256, 100, 10 * 10**18, 10}
+        expected_strings = {"myFunction(uint)"}
+        self.assertEqual(literals['number'], expected_numbers)
+        self.assertEqual(literals['string'], expected_strings)
+
+        all_literals = self.parser.all_literals(only_value=True)
+        self.assertEqual({'A', 'B', 'Main'}, set(all_literals.keys()))
+        self.assertEqual(all_literals['B']['string'], expected_strings)
+
+    def test_update_sources(self):
+        with open(contracts_root + 'b.sol', 'r') as f:
+            b_source = f.read()
+        parser = self.parser
+        main_pc_key = ('main.sol', 'Main', False)
+        parser.pc2opcode_by_contract('Main', False)
+        a_ast, a_contracts = parser.normalized_asts['a.sol'], parser._own_contracts['a.sol']
+        b_ast, b_contracts = parser.normalized_asts['b.sol'], parser._own_contracts['b.sol']
+        self.assertIn(main_pc_key, parser._pc_indexes)
+
+        parser.update_sources({'b.sol': b_source.replace('10', '20')})
+        literals = parser.get_literals('B', only_value=True)
+        self.assertIn(20, literals['number'])
+        self.assertNotIn(10, literals['number'])
+        self.assertEqual({'A', 'B', 'Main'}, set(parser.all_contract_names))
+
+        # a.sol is unchanged and reused, b.sol and the code of Main inheriting from B are rebuilt
+        self.assertIs(parser.normalized_asts['a.sol'], a_ast)
+        self.assertIs(parser._own_contracts['a.sol'], a_contracts)
+        self.assertIsNot(parser.normalized_asts['b.sol'], b_ast)
+        self.assertIsNot(parser._own_contracts['b.sol'], b_contracts)
+        self.assertNotIn(main_pc_key, parser._pc_indexes)
+
+    def test_update_sources_keeps_unaffected_pc_indexes(self):
+        with open(contracts_root + 'b.sol', 'r') as f:
+            b_source = f.read()
+        parser = self.parser
+        main_pc_key = ('main.sol', 'Main', False)
+        parser.pc2opcode_by_contract('Main', False)
+        main_pc_index = parser._pc_indexes[main_pc_key]
+        main_ast, b_ast = parser.normalized_asts['main.sol'], parser.normalized_asts['b.sol']
+
+        # a comment after the last contract changes neither the code nor the source map of Main
+        parser.update_sources({'b.sol': b_source + '// comment\n'})
+        self.assertIs(parser._pc_indexes[main_pc_key], main_pc_index)
+        self.assertIs(parser.normalized_asts['main.sol'], main_ast)
+        self.assertIsNot(parser.normalized_asts['b.sol'], b_ast)
@@ -1,6 +1,7 @@
 import unittest
 import json
 from solc_json_parser.ast_shared import get_in
+from solc_json_parser.fields import Event, PcAttribution
 from solc_json_parser.standard_json_parser import StandardJsonParser
 
 
@@ -34,3 +35,69 @@ class TestV4Contract(unittest.TestCase):
             else:
                 result = self.parser.source_by_pc(self.main_contract, fname_or_pc) or {}
                 assert lines ==  tuple(result.get('linenums')), 'Start and end line numbers of the function setRule is not correct'
+
+    def test_selector_index_matches_method_identifiers(self):
+        for contract_name in self.parser.all_contract_names:
+            contract = self.parser.contract_by_name(contract_name)
+            method_ids = get_in(self.parser.output_json, 'contracts', 'TetherToken.sol', contract_name, 'evm', 'methodIdentifiers')
+            selectors = set(method_ids.values())
+            index = self.parser.contract_index(contract_name).functions_by_selector
+            # no constructors, internal library functions or fallback functions
+            self.assertTrue(set(index) <= selectors, contract_name)
+            for selector, fn in index.items():
+                self.assertEqual(method_ids[fn.signature.replace(', ', ',')], selector)
+            # the selectors not indexed are getters of public state variables
+            getters = {f.name for f in contract.fields if f.visibility == 'public'}
+            self.assertEqual({sig.split('(')[0] for sig, sel in method_ids.items() if sel not in index} - getters, set(), contract_name)
+        self.assertIsNone(self.parser.function_by_selector('Ownable', '8afc3605'))
+        self.assertIsNone(self.parser.function_by_selector('TetherToken', '88d723ac'))
+        self.assertIsNone(self.parser.function_by_selector('SafeMath', '771602f7'))
+
+    def test_filtered_views_are_copies(self):
+        contract = self.parser.contract_by_name(self.main_contract)
+        functions = self.parser.functions_in_contract(contract, name_only=True)
+        fields = self.parser.fields_in_contract(contract, name_only=True)
+        expected_functions, expected_fields = list(functions), list(fields)
+        functions.append('mutated')
+        fields.clear()
+        self.assertEqual(self.parser.functions_in_contract(contract, name_only=True), expected_functions)
+        self.assertEqual(self.parser.fields_in_contract(contract, name_only=True), expected_fields)
+
+    def test_event_by_topic(self):
+        transfer_topic = 'ddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+        self.assertEqual(self.parser.event_by_topic('ERC20Basic', '0x' + transfer_topic).name, 'Transfer')
+
+        # an anonymous event with the same signature is found by name, but not by topic
+        contract = self.parser.contract_by_name('ERC20Basic')
+        contract.events = [Event(name='Transfer', signature='Transfer(address, address, uint256)', anonymous=True,
+                                 source_id=None, line_num=(0, 0), raw='')]
+        self.parser._build_indexes()
+        self.assertEqual(len(self.parser.contract_index('ERC20Basic').events_by_name['Transfer']), 1)
+        self.assertIsNone(self.parser.event_by_topic('ERC20Basic', transfer_topic))
+
+    def test_dispatch_table(self):
+        table = {e.selector: e for e in self.parser.dispatch_table(self.main_contract)}
+        self.assertEqual(len(table), 32)
+        self.assertEqual(table['095ea7b3'].function.name, 'approve')
+        self.assertEqual(self.parser.function_unit_by_pc(self.main_contract, table['095ea7b3'].entry_pc)['name'], 'approve')
+
+    def test_pc_attribution(self):
+        attribution = self.parser.pc_attribution(self.main_contract)
+        table = {e.selector: e for e in self.parser.dispatch_table(self.main_contract)}
+        function_id = attribution.function_id(table['095ea7b3'].entry_pc)
+        self.assertEqual(attribution.definitions[function_id]['name'], 'approve')
+        self.assertEqual(self.parser.function_unit_id_by_pc(self.main_contract, 0), PcAttribution.CONTRACT)
+        for pc in attribution.pcs:
+            unit = self.parser.function_unit_by_pc(self.main_contract, pc)
+            if unit is not None:
+                self.assertEqual(attribution.function_id(pc), unit['id'])
+
+    def test_source_by_pc_with_sourcemap_profile(self):
+        with open('./contracts/standard_json/v4/Tethertoken.solc.0.4.26.input.json', 'r') as f:
+            input_json = json.load(f)
+        parser = StandardJsonParser(input_json, '0.4.26', output_profile='sourcemap')
+        evm = get_in(parser.output_json, 'contracts', 'TetherToken.sol', self.main_contract, 'evm')
+        self.assertNotIn('legacyAssembly', evm)
+
+        for pc in (11283, 11096, 6197, 427, 6200):
+            self.assertEqual(parser.source_by_pc(self.main_contract, pc), self.parser.source_by_pc(self.main_contract, pc))
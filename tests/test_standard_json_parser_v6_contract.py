@@ -38,6 +38,15 @@ class TestV6Contract(unittest.TestCase):
             func = self.parser.function_by_name(self.main_contract, fname)
             assert lines ==  tuple(func.line_num), 'Start and end line numbers of the function setRule is not correct'
 
+    def test_function_by_selector(self):
+        tests = [
+            ('095ea7b3', 'approve'),
+            ('0xa9059cbb', 'transfer'),
+        ]
+
+        for (selector, fname) in tests:
+            func = self.parser.function_by_selector(self.main_contract, selector)
+            assert func is not None and fname == func.name, f'Function with selector {selector} should be {fname}'
 
     def test_function_ast_unit_by_pc(self):
         tests = [
@@ -0,0 +1,71 @@
+import unittest
+from solc_json_parser.storage_layout import StorageLayout
+
+def entry(label, slot, type_id, offset=0):
+    return {'astId': 0, 'contract': 'a.sol:A', 'label': label, 'offset': offset, 'slot': str(slot), 'type': type_id}
+
+LAYOUT = {
+    'storage': [
+        entry('x', 0, 't_uint128'),
+        entry('y', 0, 't_int8', offset=16),
+        entry('ok', 0, 't_bool', offset=17),
+        entry('owner', 1, 't_address'),
+        entry('balances', 2, 't_mapping(t_address,t_uint256)'),
+        entry('s', 3, 't_struct(S)10_storage'),
+        entry('name', 5, 't_string_storage'),
+        entry('arr', 6, 't_array(t_uint64)3_storage'),
+        entry('dyn', 7, 't_array(t_uint256)dyn_storage'),
+    ],
+    'types': {
+        't_uint128': {'encoding': 'inplace', 'label': 'uint128', 'numberOfBytes': '16'},
+        't_int8': {'encoding': 'inplace', 'label': 'int8', 'numberOfBytes': '1'},
+        't_bool': {'encoding': 'inplace', 'label': 'bool', 'numberOfBytes': '1'},
+        't_address': {'encoding': 'inplace', 'label': 'address', 'numberOfBytes': '20'},
+        't_uint256': {'encoding': 'inplace', 'label': 'uint256', 'numberOfBytes': '32'},
+        't_uint64': {'encoding': 'inplace', 'label': 'uint64', 'numberOfBytes': '8'},
+        't_mapping(t_address,t_uint256)': {'encoding': 'mapping', 'key': 't_address', 'label': 'mapping(address => uint256)',
+                                           'numberOfBytes': '32', 'value': 't_uint256'},
+        't_struct(S)10_storage': {'encoding': 'inplace', 'label': 'struct A.S', 'numberOfBytes': '64',
+                                  'members': [entry('a', 0, 't_uint256'), entry('b', 1, 't_address')]},
+        't_string_storage': {'encoding': 'bytes', 'label': 'string', 'numberOfBytes': '32'},
+        't_array(t_uint64)3_storage': {'base': 't_uint64', 'encoding': 'inplace', 'label': 'uint64[3]', 'numberOfBytes': '32'},
+        't_array(t_uint256)dyn_storage': {'base': 't_uint256', 'encoding': 'dynamic_array', 'label': 'uint256[]', 'numberOfBytes': '32'},
+    }
+}
+
+
+class TestStorageLayout(unittest.TestCase):
+    def setUp(self):
+        self.layout = StorageLayout(LAYOUT)
+
+    def test_slot_index(self):
+        self.assertEqual(['x', 'y', 'ok'], [v.label for v in self.layout.variables_by_slot(0)])
+        self.assertEqual(['s.b'], [v.label for v in self.layout.variables_by_slot('0x4')])
+        self.assertEqual(['arr[0]', 'arr[1]', 'arr[2]'], [v.label for v in self.layout.variables_by_slot(6)])
+        self.assertEqual([(16, 1)], [(v.offset, v.size) for v in self.layout.variables_by_slot(0) if v.label == 'y'])
+
+    def test_decode(self):
+        short_string = int.from_bytes(b'hi'.ljust(31, b'\0') + bytes([4]), 'big')
+        storage = {
+            '0x0': hex((1 << 136) | (0xff << 128) | 5),
+            1: '0x' + 'ab' * 20,
+            '0x2': '0x1',  # mapping slot is always ignored
+            3: 7,
+            '0x4': 0x1234,
+            5: short_string,
+            6: (3 << 128) | (2 << 64) | 1,
+            7: 2,
+            99: 1,
+        }
+        expected = {
+            'x': 5, 'y': -1, 'ok': True,
+            'owner': '0x' + 'ab' * 20,
+            's.a': 7, 's.b': '0x' + '0' * 36 + '1234',
+            'name': 'hi',
+            'arr[0]': 1, 'arr[1]': 2, 'arr[2]': 3,
+            'dyn': 2,
+        }
+        self.assertEqual(expected, self.layout.decode(storage))
+
+    def test_decode_long_string_returns_length(self):
+        self.assertEqual({'name': 40}, self.layout.decode_slot(5, 40 * 2 + 1))
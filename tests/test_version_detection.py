@@ -0,0 +1,31 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from solc_json_parser import ast_shared as s
+
+
+class TestVersionDetection(unittest.TestCase):
+    def test_flattened_source_pragmas(self):
+        source = '// SPDX-License-Identifier: MIT\npragma solidity ^0.7.0;\ncontract A {}\n\n  pragma solidity >=0.6.0 <0.7.5;\ncontract B {}\n'
+        self.assertEqual(s.version_str_from_source(source), '>=0.6.0 <0.7.5 ^0.7.0')
+        self.assertEqual(s.get_solc_candidates(source), ['0.7.0', '0.7.1', '0.7.2', '0.7.3', '0.7.4'])
+        self.assertEqual(s.detect_solc_version(source), '0.7.4')
+
+    def test_group_by_solc_version(self):
+        files = ['./tests/test_contracts/flatten/A.sol', './tests/test_contracts/flatten/B.sol']
+        sources = files + ['contract NoPragma {}\n']
+        groups = s.group_by_solc_version(sources)
+        self.assertEqual(groups[None], ['contract NoPragma {}\n'])
+        self.assertEqual(sum(len(v) for v in groups.values()), 3)
+        self.assertEqual(groups[s.detect_solc_version(files[0])][0], files[0])
+
+    def test_version_cache_threads(self):
+        # more distinct sources than the cache holds, so that threads evict each other's entries
+        sources = [f'pragma solidity ^0.8.{i % 20};\ncontract C{i} {{}}\n' for i in range(200)] * 4
+        cache_size = s.VERSION_CACHE_SIZE
+        s.VERSION_CACHE_SIZE = 8
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                versions = list(executor.map(s.version_str_from_source, sources))
+        finally:
+            s.VERSION_CACHE_SIZE = cache_size
+        self.assertEqual(versions, [f'^0.8.{i % 20}' for i in range(200)] * 4)